@@ -0,0 +1,253 @@
+"""Concurrency stress test for spot allocation.
+
+Fires bookings from many threads at once through the booking route and checks
+that no spot is ever handed out twice and none is lost:
+
+    python benchmarks/allocation_stress.py --spots 500 --bookings 2000 --threads 16
+
+Two phases run against a throwaway SQLite database:
+
+- ``claim``: more bookings than spots hit one lot. Every spot must be booked
+  exactly once, and the bookings left over must be told the lot is full.
+- ``churn``: threads book, park and vacate in a loop on a lot with fewer spots
+  than threads. A spot returned to a second booking while the first still holds
+  it counts as a double allocation.
+
+After each phase the lot's spots, open reservations, occupancy counters and the
+in-memory free-spot index are checked against each other. Prints the results as
+JSON and exits with status 1 when any check fails.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+
+# Same as src/main.py: make the repository root importable when run as a script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def seed(app, users):
+    """Create the users and return an access header per user."""
+    from flask_jwt_extended import create_access_token
+    from sqlalchemy import insert, select
+    from werkzeug.security import generate_password_hash
+
+    from src.extensions import db
+    from src.models.models import User
+    from src.utils.identity import identity_claims
+    from src.utils.migrations import init_database
+
+    with app.app_context():
+        init_database("admin", "stress-password")
+        password_hash = generate_password_hash("stress-password")
+        db.session.execute(insert(User), [
+            {"username": f"stress_user_{i}", "password_hash": password_hash, "role": "user"} for i in range(users)
+        ])
+        db.session.commit()
+        return [
+            {"Authorization": "Bearer " + create_access_token(identity=user.username, additional_claims=identity_claims(user))}
+            for user in db.session.execute(select(User.id, User.username, User.role).where(User.role == "user").order_by(User.id))
+        ]
+
+
+def create_lot(app, spots):
+    from src.extensions import db
+    from src.models.models import ParkingLot
+    from src.utils.provisioning import insert_spot_range
+
+    with app.app_context():
+        lot = ParkingLot(prime_location_name="Stress Lot", price=10, address="x", pin_code="0",
+                         number_of_spots=spots, available_count=spots, occupied_count=0)
+        db.session.add(lot)
+        db.session.flush()
+        insert_spot_range(lot.id, 1, spots)
+        db.session.commit()
+        return lot.id
+
+
+def check_lot(app, lot_id):
+    """Return the inconsistencies between a lot's spots, open reservations, counters and free-spot index."""
+    from sqlalchemy import func, select
+
+    from src.extensions import db
+    from src.models.models import ParkingLot, ParkingSpot, Reservation
+    from src.utils.spot_allocator import spot_allocator
+
+    problems = []
+    with app.app_context():
+        spots = dict(db.session.execute(select(ParkingSpot.id, ParkingSpot.status).where(ParkingSpot.lot_id == lot_id)).all())
+        holders = dict(db.session.execute(
+            select(Reservation.spot_id, func.count(Reservation.id))
+            .where(Reservation.spot_id.in_(spots), Reservation.leaving_timestamp.is_(None))
+            .group_by(Reservation.spot_id)
+        ).all())
+        doubled = sorted(spot_id for spot_id, count in holders.items() if count > 1)
+        if doubled:
+            problems.append(f"{len(doubled)} spot(s) with several open reservations, e.g. {doubled[:5]}")
+        lost = sorted(spot_id for spot_id, status in spots.items() if status == "O" and spot_id not in holders)
+        if lost:
+            problems.append(f"{len(lost)} occupied spot(s) without an open reservation, e.g. {lost[:5]}")
+        unclaimed = sorted(spot_id for spot_id in holders if spots[spot_id] != "O")
+        if unclaimed:
+            problems.append(f"{len(unclaimed)} available spot(s) with an open reservation, e.g. {unclaimed[:5]}")
+
+        lot = db.session.get(ParkingLot, lot_id)
+        available = sum(1 for status in spots.values() if status == "A")
+        if (lot.available_count, lot.occupied_count) != (available, len(spots) - available):
+            problems.append(f"counters say {lot.available_count} available / {lot.occupied_count} occupied, spots say {available} / {len(spots) - available}")
+        drift = spot_allocator.reconcile(lot_id)
+        if drift:
+            problems.append(f"free-spot index had drifted by {drift} spot(s)")
+        db.session.remove()
+    return problems, available
+
+
+def _run_threads(threads, target):
+    workers = [threading.Thread(target=target, args=(index,)) for index in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - started
+
+
+def claim_phase(app, headers, spots, bookings, threads):
+    lot_id = create_lot(app, spots)
+    statuses = {}
+    booked = []  # spot ids handed out, in any order
+    errors = []
+    lock = threading.Lock()
+
+    def worker(index):
+        client = app.test_client()
+        for n in range(index, bookings, threads):
+            response = client.post("/api/user/reservations", json={"lot_id": lot_id}, headers=headers[n % len(headers)])
+            with lock:
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                if response.status_code == 201:
+                    booked.append(response.get_json()["spot_id"])
+                elif response.status_code != 404:
+                    errors.append(response.get_data(as_text=True)[:200])
+
+    seconds = _run_threads(threads, worker)
+    problems, available = check_lot(app, lot_id)
+    if len(booked) != len(set(booked)):
+        problems.append(f"{len(booked) - len(set(booked))} spot(s) handed out twice")
+    expected = min(spots, bookings)
+    if len(booked) != expected:
+        problems.append(f"{len(booked)} booking(s) succeeded, expected {expected}")
+    if available != spots - expected:
+        problems.append(f"{available} spot(s) left available, expected {spots - expected}")
+    problems += [f"unexpected response: {error}" for error in errors[:5]]
+    return {"lot_id": lot_id, "seconds": round(seconds, 2), "status_codes": {str(code): count for code, count in sorted(statuses.items())}, "problems": problems}
+
+
+def churn_phase(app, headers, spots, rounds, threads):
+    lot_id = create_lot(app, spots)
+    held = set()  # Spots booked and not yet given back
+    counts = {"booked": 0, "full": 0, "double_allocations": 0, "failed": 0}
+    errors = []
+    lock = threading.Lock()
+
+    def worker(index):
+        client = app.test_client()
+        user = headers[index % len(headers)]
+        for _ in range(rounds):
+            response = client.post("/api/user/reservations", json={"lot_id": lot_id}, headers=user)
+            if response.status_code == 404:
+                with lock:
+                    counts["full"] += 1
+                continue
+            if response.status_code != 201:
+                with lock:
+                    counts["failed"] += 1
+                    errors.append(response.get_data(as_text=True)[:200])
+                continue
+            booking = response.get_json()
+            with lock:
+                counts["booked"] += 1
+                if booking["spot_id"] in held:
+                    counts["double_allocations"] += 1
+                held.add(booking["spot_id"])
+            reservation = f"/api/user/reservations/{booking['reservation_id']}"
+            parked = client.put(reservation + "/park", headers=user)
+            with lock:
+                # Given back before the vacate, so a re-booking racing its commit is not miscounted
+                held.discard(booking["spot_id"])
+            vacated = client.put(reservation + "/vacate", headers=user)
+            if parked.status_code != 200 or vacated.status_code != 200:
+                with lock:
+                    counts["failed"] += 1
+                    errors.append(f"park {parked.status_code}, vacate {vacated.status_code}")
+
+    seconds = _run_threads(threads, worker)
+    problems, available = check_lot(app, lot_id)
+    if counts["double_allocations"]:
+        problems.append(f"{counts['double_allocations']} spot(s) handed out while still held")
+    if available != spots:
+        problems.append(f"{spots - available} spot(s) not available after every reservation was vacated")
+    problems += [f"unexpected response: {error}" for error in errors[:5]]
+    return {"lot_id": lot_id, "seconds": round(seconds, 2), **counts, "problems": problems}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--spots", type=int, default=500, help="Spots of the lot booked in the claim phase.")
+    parser.add_argument("--bookings", type=int, default=2000, help="Bookings fired in the claim phase.")
+    parser.add_argument("--churn-spots", type=int, default=4, help="Spots of the lot used in the churn phase.")
+    parser.add_argument("--rounds", type=int, default=50, help="Book/park/vacate rounds per thread in the churn phase.")
+    parser.add_argument("--threads", type=int, default=16, help="Concurrent client threads.")
+    parser.add_argument("--users", type=int, default=50, help="Users the bookings are spread over.")
+    parser.add_argument("--write-queue", action="store_true", help="Apply transitions through the group-commit writer.")
+    parser.add_argument("--output", help="Write the JSON results here instead of stdout.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    workdir = tempfile.mkdtemp(prefix="vp-stress-")
+    # The app reads its configuration from the environment when it is created
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'stress.db')}"
+    os.environ["WRITE_QUEUE_ENABLED"] = "true" if args.write_queue else "false"
+    os.environ["RESERVATION_HOLD_TTL_SECONDS"] = "0"  # Holds must not lapse in the middle of a phase
+    os.environ.setdefault("CACHE_BACKEND", "memory")
+    os.environ.setdefault("AVAILABILITY_BACKEND", "none")
+
+    from src.main import create_app
+    app = create_app()
+    app.logger.setLevel(logging.ERROR)
+    headers = seed(app, args.users)
+
+    results = {
+        "meta": {
+            "spots": args.spots, "bookings": args.bookings, "churn_spots": args.churn_spots, "rounds": args.rounds,
+            "threads": args.threads, "users": args.users, "write_queue": args.write_queue, "python": platform.python_version()
+        },
+        "claim": claim_phase(app, headers, args.spots, args.bookings, args.threads),
+        "churn": churn_phase(app, headers, args.churn_spots, args.rounds, args.threads)
+    }
+    failed = False
+    for phase in ("claim", "churn"):
+        problems = results[phase]["problems"]
+        print(f"{phase}: {'ok' if not problems else 'FAILED'} in {results[phase]['seconds']} s", file=sys.stderr)
+        for problem in problems:
+            print(f"  {problem}", file=sys.stderr)
+        failed = failed or bool(problems)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump(results, output_file, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
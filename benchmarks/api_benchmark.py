@@ -0,0 +1,573 @@
+"""Load test for every auth, admin and user API endpoint.
+
+Seeds a throwaway SQLite database with N lots x M spots, K users and R closed
+reservations, then drives each endpoint either through the Flask test client or
+over real HTTP against a threaded werkzeug server. Prints throughput and
+p50/p99 latency per endpoint as JSON and can compare them with a saved baseline:
+
+    python benchmarks/api_benchmark.py --lots 50 --spots 200 --users 500 \\
+        --reservations 50000 --requests 200 --threads 8 --output baseline.json
+    python benchmarks/api_benchmark.py ... --baseline baseline.json --fail-on-regression
+
+Requests that need state of their own (parking a booked reservation, deleting
+an empty lot, ...) get it prepared before the timed run; only the request under
+test is measured.
+"""
+import argparse
+import datetime
+import http.client
+import json
+import logging
+import math
+import os
+import platform
+import queue
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+# Same as src/main.py: make the repository root importable when run as a script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BENCH_PASSWORD = "bench-password"
+
+
+class RequestSpec:
+    __slots__ = ("method", "path", "headers", "json", "data", "content_type")
+
+    def __init__(self, method, path, headers=None, json=None, data=None, content_type=None):
+        self.method = method
+        self.path = path
+        self.headers = headers or {}
+        self.json = json
+        self.data = data
+        self.content_type = content_type
+
+    def body(self):
+        """Encoded body and content type, as sent over HTTP."""
+        if self.json is not None:
+            return json.dumps(self.json).encode(), "application/json"
+        if self.data is not None:
+            return self.data, self.content_type or "application/octet-stream"
+        return None, None
+
+
+class Scenario:
+    """One endpoint: how to build ``n`` requests for it and which statuses count as success."""
+
+    def __init__(self, name, build, expected=(200,)):
+        self.name = name
+        self.build = build
+        self.expected = set(expected)
+
+
+class BenchContext:
+    """Seeded ids and ready-made tokens shared by the scenarios."""
+
+    def __init__(self, app, rng):
+        self.app = app
+        self.rng = rng
+        self.client = app.test_client()  # Untimed set-up requests
+        self.admin_headers = {}
+        self.users = []  # (user_id, username, access headers, refresh headers)
+        self.lot_ids = []
+        self.spot_id_range = (1, 1)
+        self._next_lot = 0
+        self._lock = threading.Lock()
+
+    def user(self, index):
+        return self.users[index % len(self.users)]
+
+    def next_lot_id(self):
+        with self._lock:
+            lot_id = self.lot_ids[self._next_lot % len(self.lot_ids)]
+            self._next_lot += 1
+        return lot_id
+
+    def setup_request(self, method, path, headers, expected=(200, 201), **kwargs):
+        response = self.client.open(path, method=method, headers=headers, **kwargs)
+        if response.status_code not in expected:
+            raise RuntimeError(f"Set-up request {method} {path} failed: {response.status_code} {response.get_data(as_text=True)[:200]}")
+        return response.get_json(silent=True)
+
+    def book(self, user_index):
+        _, _, headers, _ = self.user(user_index)
+        booking = self.setup_request("POST", "/api/user/reservations", headers, json={"lot_id": self.next_lot_id()})
+        return booking["reservation_id"]
+
+
+# --- Seeding -----------------------------------------------------------------
+
+def seed(app, lots, spots, users, reservations, rng):
+    """Bulk-insert the benchmark data set and return the context for the scenarios."""
+    from flask_jwt_extended import create_access_token, create_refresh_token
+    from sqlalchemy import func, insert, select
+    from werkzeug.security import generate_password_hash
+
+    from src.extensions import db
+    from src.models.models import ParkingLot, ParkingSpot, Reservation, User
+    from src.utils.analytics import rollup_occupancy
+    from src.utils.cache import cache
+    from src.utils.identity import identity_claims
+    from src.utils.migrations import init_database
+    from src.utils.provisioning import insert_spot_range
+    from src.utils.spot_allocator import spot_allocator
+    from src.utils.user_stats import rebuild_user_stats
+
+    ctx = BenchContext(app, rng)
+    with app.app_context():
+        init_database("admin", BENCH_PASSWORD)
+        # Hashing is deliberately slow, so every seeded user shares one hash
+        password_hash = generate_password_hash(BENCH_PASSWORD)
+        db.session.execute(insert(User), [
+            {"username": f"bench_user_{i}", "password_hash": password_hash, "role": "user"} for i in range(users)
+        ])
+        lot_ids = db.session.execute(
+            insert(ParkingLot).returning(ParkingLot.id, sort_by_parameter_order=True),
+            [{
+                "prime_location_name": f"Bench Lot {i}", "price": float(rng.randint(10, 100)), "address": f"{i} Bench Street",
+                "pin_code": f"{560000 + i}", "number_of_spots": spots, "available_count": spots, "occupied_count": 0
+            } for i in range(lots)]
+        ).scalars().all()
+        for lot_id in lot_ids:
+            insert_spot_range(lot_id, 1, spots)
+        db.session.commit()
+
+        user_rows = db.session.execute(select(User.id, User.username, User.role).where(User.role == "user").order_by(User.id)).all()
+        first_spot, last_spot = db.session.execute(select(func.min(ParkingSpot.id), func.max(ParkingSpot.id))).one()
+        now = datetime.datetime.utcnow()
+        batch = []
+        for _ in range(reservations):
+            parked = now - datetime.timedelta(minutes=rng.randint(60, 90 * 24 * 60))
+            hours = rng.randint(10, 600) / 60
+            batch.append({
+                "spot_id": rng.randint(first_spot, last_spot),
+                "user_id": rng.choice(user_rows).id,
+                "parking_timestamp": parked,
+                "leaving_timestamp": parked + datetime.timedelta(hours=hours),
+                "parking_cost": round(hours * 50, 2)
+            })
+            if len(batch) == 5000:
+                db.session.execute(insert(Reservation), batch)
+                batch = []
+        if batch:
+            db.session.execute(insert(Reservation), batch)
+        db.session.commit()
+        rebuild_user_stats()
+        rollup_occupancy(lag_seconds=0)
+
+        admin = User.query.filter_by(role="admin").first()
+        ctx.admin_headers = {"Authorization": "Bearer " + create_access_token(identity=admin.username, additional_claims=identity_claims(admin))}
+        for user in user_rows:
+            claims = identity_claims(user)
+            ctx.users.append((
+                user.id,
+                user.username,
+                {"Authorization": "Bearer " + create_access_token(identity=user.username, additional_claims=claims)},
+                {"Authorization": "Bearer " + create_refresh_token(identity=user.username, additional_claims=claims)}
+            ))
+        ctx.lot_ids = list(lot_ids)
+        ctx.spot_id_range = (first_spot, last_spot)
+        spot_allocator.rebuild()
+        cache.clear()
+    return ctx
+
+
+# --- Scenarios ---------------------------------------------------------------
+
+def _fresh_access_tokens(ctx, n):
+    from flask_jwt_extended import create_access_token
+    with ctx.app.app_context():
+        return [
+            {"Authorization": "Bearer " + create_access_token(identity=ctx.user(i)[1], additional_claims={"role": "user", "user_id": ctx.user(i)[0]})}
+            for i in range(n)
+        ]
+
+
+def _empty_lots(ctx, n, spots=5):
+    return [
+        ctx.setup_request("POST", "/api/admin/parking_lots", ctx.admin_headers, json={
+            "prime_location_name": f"Disposable {i}", "price": 10, "address": "x", "pin_code": "0", "number_of_spots": spots
+        })["lot_id"]
+        for i in range(n)
+    ]
+
+
+def _free_spot_ids(ctx, n):
+    from src.extensions import db
+    from src.models.models import ParkingSpot
+    lot_id = _empty_lots(ctx, 1, spots=n)[0]
+    with ctx.app.app_context():
+        return [spot_id for (spot_id,) in db.session.query(ParkingSpot.id).filter_by(lot_id=lot_id).all()]
+
+
+def _exports(ctx, n):
+    """Finished export files for the first users, as (headers, job_id)."""
+    from src.celery_app import get_celery
+    from src.tasks.exports import export_reservations_csv_task
+    get_celery(ctx.app)
+    jobs = []
+    with ctx.app.app_context():
+        for i in range(min(n, len(ctx.users))):
+            job_id = str(uuid.uuid4())
+            export_reservations_csv_task.apply(args=(ctx.user(i)[0],), task_id=job_id)
+            jobs.append((ctx.user(i)[2], job_id))
+    return jobs
+
+
+def _revalidating(ctx, n, path, headers):
+    """Requests repeating ``If-None-Match`` with the ETag of a fresh ``path`` response."""
+    etag = ctx.client.get(path, headers=headers).headers["ETag"]
+    return [RequestSpec("GET", path, {**headers, "If-None-Match": etag}) for _ in range(n)]
+
+
+def _import_payload(rows):
+    lines = ["prime_location_name,price,address,pin_code,number_of_spots"]
+    lines += [f"Imported {i},25,Import Road,400001,10" for i in range(rows)]
+    return ("\n".join(lines) + "\n").encode()
+
+
+def scenarios():
+    """Every auth, admin_bp and user_routes_bp endpoint, in the order they are run."""
+    def each(n, spec):
+        return [spec(i) for i in range(n)]
+
+    def park_specs(ctx, n):
+        reservations = [(i, ctx.book(i)) for i in range(n)]
+        return [RequestSpec("PUT", f"/api/user/reservations/{rid}/park", ctx.user(i)[2]) for i, rid in reservations]
+
+    def vacate_specs(ctx, n):
+        specs = []
+        for i in range(n):
+            reservation_id = ctx.book(i)
+            ctx.setup_request("PUT", f"/api/user/reservations/{reservation_id}/park", ctx.user(i)[2])
+            specs.append(RequestSpec("PUT", f"/api/user/reservations/{reservation_id}/vacate", ctx.user(i)[2]))
+        return specs
+
+    def gate_batch_specs(ctx, n, size=20):
+        # Each batch parks freshly booked reservations, as a gate controller replaying its buffer would
+        specs = []
+        for i in range(n):
+            events = [
+                {"idempotency_key": str(uuid.uuid4()), "action": "park", "reservation_id": ctx.book(i * size + j)}
+                for j in range(size)
+            ]
+            specs.append(RequestSpec("POST", "/api/admin/reservations/batch", ctx.admin_headers, json={"events": events}))
+        return specs
+
+    import_body = _import_payload(20)
+    return [
+        Scenario("auth.register", lambda ctx, n: each(n, lambda i: RequestSpec("POST", "/auth/register", json={"username": f"bench_new_{uuid.uuid4().hex}", "password": BENCH_PASSWORD})), (201,)),
+        Scenario("auth.login", lambda ctx, n: each(n, lambda i: RequestSpec("POST", "/auth/login", json={"username": ctx.user(i)[1], "password": BENCH_PASSWORD}))),
+        Scenario("auth.refresh", lambda ctx, n: each(n, lambda i: RequestSpec("POST", "/auth/refresh", ctx.user(i)[3]))),
+        Scenario("auth.logout", lambda ctx, n: [RequestSpec("POST", "/auth/logout", headers) for headers in _fresh_access_tokens(ctx, n)]),
+
+        Scenario("admin.create_parking_lot", lambda ctx, n: each(n, lambda i: RequestSpec("POST", "/api/admin/parking_lots", ctx.admin_headers, json={
+            "prime_location_name": f"Created {i}", "price": 30, "address": "x", "pin_code": "1", "number_of_spots": 100
+        })), (201,)),
+        Scenario("admin.import_parking_lots", lambda ctx, n: each(n, lambda i: RequestSpec(
+            "POST", "/api/admin/parking_lots/import?format=csv", ctx.admin_headers, data=import_body, content_type="text/csv"
+        ))),
+        Scenario("admin.get_parking_lots", lambda ctx, n: each(n, lambda i: RequestSpec("GET", "/api/admin/parking_lots?limit=50", ctx.admin_headers))),
+        Scenario("admin.get_parking_lots_summary", lambda ctx, n: each(n, lambda i: RequestSpec("GET", "/api/admin/parking_lots?limit=500&include_spots=false", ctx.admin_headers))),
+        Scenario("admin.get_parking_lots_revalidate", lambda ctx, n: _revalidating(ctx, n, "/api/admin/parking_lots?limit=50", ctx.admin_headers), (200, 304)),
+        Scenario("admin.get_parking_lots_gzip", lambda ctx, n: each(n, lambda i: RequestSpec("GET", "/api/admin/parking_lots?limit=50", {**ctx.admin_headers, "Accept-Encoding": "gzip"}))),
+        Scenario("admin.get_parking_lots_fields", lambda ctx, n: each(n, lambda i: RequestSpec("GET", "/api/admin/parking_lots?limit=500&fields=id,available_spots", ctx.admin_headers))),
+        Scenario("admin.get_parking_lots_rle", lambda ctx, n: each(n, lambda i: RequestSpec("GET", "/api/admin/parking_lots?limit=50&spot_format=rle", ctx.admin_headers))),
+        Scenario("admin.spot_map", lambda ctx, n: each(n, lambda i: RequestSpec("GET", f"/api/admin/parking_lots/{ctx.lot_ids[i % len(ctx.lot_ids)]}/spot_map", ctx.admin_headers))),
+        Scenario("admin.update_parking_lot", lambda ctx, n: each(n, lambda i: RequestSpec("PUT", f"/api/admin/parking_lots/{ctx.lot_ids[i % len(ctx.lot_ids)]}", ctx.admin_headers, json={"price": 20 + i % 50}))),
+        Scenario("admin.delete_parking_lot", lambda ctx, n: [RequestSpec("DELETE", f"/api/admin/parking_lots/{lot_id}", ctx.admin_headers) for lot_id in _empty_lots(ctx, n)]),
+        Scenario("admin.get_parking_spot", lambda ctx, n: each(n, lambda i: RequestSpec("GET", f"/api/admin/parking_spots/{ctx.rng.randint(*ctx.spot_id_range)}", ctx.admin_headers))),
+        Scenario("admin.delete_parking_spot", lambda ctx, n: [RequestSpec("DELETE", f"/api/admin/parking_spots/{spot_id}", ctx.admin_headers) for spot_id in _free_spot_ids(ctx, n)]),
+        Scenario("admin.get_all_users", lambda ctx, n: each(n, lambda i: RequestSpec("GET", "/api/admin/users", ctx.admin_headers))),
+        Scenario("admin.get_users_page", lambda ctx, n: each(n, lambda i: RequestSpec("GET", f"/api/admin/users?limit=100&cursor={ctx.user(i)[0]}", ctx.admin_headers))),
+        Scenario("admin.dashboard_summary", lambda ctx, n: each(n, lambda i: RequestSpec("GET", "/api/admin/dashboard/summary", ctx.admin_headers))),
+        Scenario("admin.occupancy_hourly", lambda ctx, n: each(n, lambda i: RequestSpec("GET", f"/api/admin/analytics/occupancy?lot_id={ctx.lot_ids[i % len(ctx.lot_ids)]}", ctx.admin_headers))),
+        Scenario("admin.occupancy_daily", lambda ctx, n: each(n, lambda i: RequestSpec("GET", f"/api/admin/analytics/occupancy?granularity=day&from={(datetime.date.today() - datetime.timedelta(days=90)).isoformat()}", ctx.admin_headers))),
+        Scenario("admin.gate_batch", gate_batch_specs),
+        Scenario("admin.cache_stats", lambda ctx, n: each(n, lambda i: RequestSpec("GET", "/api/admin/cache/stats", ctx.admin_headers))),
+        Scenario("admin.toggle_metrics", lambda ctx, n: each(n, lambda i: RequestSpec("PUT", "/api/admin/metrics", ctx.admin_headers, json={"enabled": True}))),
+        Scenario("admin.slow_requests", lambda ctx, n: each(n, lambda i: RequestSpec("GET", "/api/admin/metrics/slow_requests", ctx.admin_headers))),
+        Scenario("metrics.prometheus", lambda ctx, n: each(n, lambda i: RequestSpec("GET", "/metrics", {"Authorization": "Bearer " + os.environ["METRICS_TOKEN"]}))),
+
+        Scenario("user.get_parking_lots", lambda ctx, n: each(n, lambda i: RequestSpec("GET", "/api/user/parking_lots", ctx.user(i)[2]))),
+        Scenario("user.get_parking_lots_revalidate", lambda ctx, n: _revalidating(ctx, n, "/api/user/parking_lots", ctx.user(0)[2]), (200, 304)),
+        Scenario("user.book_parking_spot", lambda ctx, n: each(n, lambda i: RequestSpec("POST", "/api/user/reservations", ctx.user(i)[2], json={"lot_id": ctx.next_lot_id()})), (201,)),
+        Scenario("user.park", park_specs),
+        Scenario("user.vacate", vacate_specs),
+        Scenario("user.reservation_history", lambda ctx, n: each(n, lambda i: RequestSpec("GET", "/api/user/reservations?limit=50", ctx.user(i)[2]))),
+        Scenario("user.reservation_history_filtered", lambda ctx, n: each(n, lambda i: RequestSpec("GET", "/api/user/reservations?limit=50&status=completed&from=2000-01-01", ctx.user(i)[2]))),
+        Scenario("user.dashboard_summary", lambda ctx, n: each(n, lambda i: RequestSpec("GET", "/api/user/dashboard/summary", ctx.user(i)[2]))),
+        Scenario("user.export_reservations_csv", lambda ctx, n: each(n, lambda i: RequestSpec("GET", "/api/user/export_reservations_csv", ctx.user(i)[2])), (200, 404)),
+        Scenario("user.export_status", lambda ctx, n: [RequestSpec("GET", f"/api/user/exports/{job_id}", headers) for headers, job_id in _exports(ctx, n)]),
+        Scenario("user.export_download", lambda ctx, n: [RequestSpec("GET", f"/api/user/exports/{job_id}/download", headers) for headers, job_id in _exports(ctx, n)]),
+    ]
+
+
+# --- Drivers -----------------------------------------------------------------
+
+class TestClientDriver:
+    """Calls the WSGI app in-process; one test client per worker thread."""
+
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def send(self, spec):
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        body, content_type = spec.body()
+        started = time.perf_counter()
+        response = client.open(spec.path, method=spec.method, headers=spec.headers, data=body, content_type=content_type)
+        response.get_data()  # Drain streamed bodies
+        elapsed = time.perf_counter() - started
+        response.close()
+        return response.status_code, elapsed
+
+    def close(self):
+        pass
+
+
+class HttpDriver:
+    """Serves the app with a threaded werkzeug server and calls it over keep-alive HTTP/1.1."""
+
+    def __init__(self, app):
+        from werkzeug.serving import WSGIRequestHandler, make_server
+
+        class KeepAliveHandler(WSGIRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_request(self, *args, **kwargs):
+                pass
+
+        self.server = make_server("127.0.0.1", 0, app, threaded=True, request_handler=KeepAliveHandler)
+        self.port = self.server.server_port
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        self._local = threading.local()
+
+    def _connection(self, fresh=False):
+        connection = getattr(self._local, "connection", None)
+        if connection is None or fresh:
+            if connection is not None:
+                connection.close()
+            connection = self._local.connection = http.client.HTTPConnection("127.0.0.1", self.port, timeout=60)
+        return connection
+
+    def send(self, spec):
+        body, content_type = spec.body()
+        headers = dict(spec.headers)
+        if content_type:
+            headers["Content-Type"] = content_type
+        for attempt in range(2):
+            connection = self._connection(fresh=attempt > 0)
+            started = time.perf_counter()
+            try:
+                connection.request(spec.method, spec.path, body=body, headers=headers)
+                response = connection.getresponse()
+                response.read()
+            except (http.client.HTTPException, ConnectionError):
+                if attempt:
+                    raise
+                continue
+            elapsed = time.perf_counter() - started
+            if response.will_close:
+                self._local.connection = None
+            return response.status, elapsed
+
+    def close(self):
+        self.server.shutdown()
+
+
+# --- Running and reporting ---------------------------------------------------
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, min(len(sorted_values) - 1, math.ceil(q * len(sorted_values)) - 1))]
+
+
+def run_scenario(scenario, ctx, driver, requests, threads):
+    specs = scenario.build(ctx, requests)
+    work = queue.Queue()
+    for spec in specs:
+        work.put(spec)
+    latencies = []
+    statuses = {}
+    failures = []
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            try:
+                spec = work.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                status, elapsed = driver.send(spec)
+            except Exception as e:
+                with lock:
+                    failures.append(str(e))
+                continue
+            with lock:
+                latencies.append(elapsed)
+                statuses[status] = statuses.get(status, 0) + 1
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    errors = len(failures) + sum(count for status, count in statuses.items() if status not in scenario.expected)
+    return {
+        "requests": len(specs),
+        "errors": errors,
+        "status_codes": {str(status): count for status, count in sorted(statuses.items())},
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+        "max_ms": round(latencies[-1] * 1000, 3) if latencies else 0.0
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Relative change per endpoint against a baseline run; flags anything worse than ``tolerance``."""
+    comparison = {}
+    for name, current in results["endpoints"].items():
+        previous = baseline.get("endpoints", {}).get(name)
+        if previous is None:
+            continue
+        change = {}
+        for metric in ("p50_ms", "p99_ms", "throughput_rps"):
+            before, after = previous[metric], current[metric]
+            change[metric] = round((after - before) / before, 4) if before else 0.0
+        regressed = [
+            metric for metric in ("p50_ms", "p99_ms") if change[metric] > tolerance
+        ] + (["throughput_rps"] if change["throughput_rps"] < -tolerance else [])
+        comparison[name] = {"change": change, "regressed": regressed}
+    return comparison
+
+
+def print_table(results, comparison, stream):
+    header = f"{'endpoint':34} {'rps':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}"
+    if comparison:
+        header += f" {'p50 Δ':>8} {'p99 Δ':>8} {'rps Δ':>8}"
+    print(header, file=stream)
+    for name, stats in results["endpoints"].items():
+        line = f"{name:34} {stats['throughput_rps']:9.1f} {stats['p50_ms']:9.2f} {stats['p99_ms']:9.2f} {stats['errors']:7d}"
+        delta = comparison.get(name)
+        if delta:
+            line += "".join(f" {delta['change'][metric]:+8.1%}" for metric in ("p50_ms", "p99_ms", "throughput_rps"))
+            if delta["regressed"]:
+                line += "  REGRESSION"
+        print(line, file=stream)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--lots", type=int, default=20, help="Seeded parking lots (N).")
+    parser.add_argument("--spots", type=int, default=200, help="Spots per seeded lot (M).")
+    parser.add_argument("--users", type=int, default=200, help="Seeded users (K).")
+    parser.add_argument("--reservations", type=int, default=20000, help="Seeded closed reservations (R).")
+    parser.add_argument("--requests", type=int, default=100, help="Timed requests per endpoint.")
+    parser.add_argument("--threads", type=int, default=4, help="Concurrent client threads.")
+    parser.add_argument("--mode", choices=("client", "http"), default="client", help="Flask test client or real HTTP.")
+    parser.add_argument("--endpoints", help="Comma-separated endpoint name prefixes to run (default: all).")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed for the data set.")
+    parser.add_argument("--output", help="Write the JSON results here instead of stdout.")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Relative slowdown counted as a regression.")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit with status 1 on a regression.")
+    parser.add_argument("--list", action="store_true", help="List endpoint names and exit.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    selected = scenarios()
+    if args.list:
+        print("\n".join(scenario.name for scenario in selected))
+        return 0
+    if args.endpoints:
+        prefixes = tuple(prefix.strip() for prefix in args.endpoints.split(","))
+        selected = [scenario for scenario in selected if scenario.name.startswith(prefixes)]
+
+    workdir = tempfile.mkdtemp(prefix="vp-bench-")
+    # The app reads its configuration from the environment when it is imported
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["EXPORT_DIR"] = os.path.join(workdir, "exports")
+    os.environ["CSV_EXPORT_INLINE_LIMIT"] = str(max(args.reservations, 1) * 10)
+    os.environ.setdefault("CELERY_BROKER_URL", "memory://")
+    os.environ.setdefault("CELERY_RESULT_BACKEND", "cache+memory://")
+    os.environ.setdefault("JWT_BLOCKLIST_BACKEND", "database")
+    os.environ.setdefault("CACHE_BACKEND", "memory")
+    os.environ.setdefault("METRICS_TOKEN", "bench-metrics-token")
+
+    from src.main import create_app
+    app = create_app()
+    app.logger.setLevel(logging.ERROR)
+
+    started = time.perf_counter()
+    ctx = seed(app, args.lots, args.spots, args.users, args.reservations, random.Random(args.seed))
+    seed_seconds = time.perf_counter() - started
+
+    driver = HttpDriver(app) if args.mode == "http" else TestClientDriver(app)
+    results = {
+        "meta": {
+            "mode": args.mode,
+            "threads": args.threads,
+            "requests_per_endpoint": args.requests,
+            "scale": {"lots": args.lots, "spots_per_lot": args.spots, "users": args.users, "reservations": args.reservations},
+            "seed": args.seed,
+            "seed_seconds": round(seed_seconds, 2),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "started_at": datetime.datetime.utcnow().isoformat()
+        },
+        "endpoints": {}
+    }
+    try:
+        for scenario in selected:
+            results["endpoints"][scenario.name] = run_scenario(scenario, ctx, driver, args.requests, args.threads)
+            print(f"{scenario.name}: done", file=sys.stderr)
+    finally:
+        driver.close()
+
+    comparison = {}
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)
+        for key in ("mode", "threads", "requests_per_endpoint", "scale"):
+            if baseline.get("meta", {}).get(key) != results["meta"][key]:
+                print(f"Warning: baseline was run with a different {key}: {baseline.get('meta', {}).get(key)}", file=sys.stderr)
+        comparison = compare(results, baseline, args.tolerance)
+        results["comparison"] = comparison
+    print_table(results, comparison, sys.stderr)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump(results, output_file, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+    regressions = [name for name, delta in comparison.items() if delta["regressed"]]
+    if regressions and args.fail_on_regression:
+        print(f"Regressions: {', '.join(regressions)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
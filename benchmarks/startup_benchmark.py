@@ -0,0 +1,168 @@
+"""Cold-start benchmark: how long a fresh worker takes to serve its first request.
+
+Initializes a throwaway SQLite database with N lots x M spots once, then starts
+fresh interpreters that import the app and serve one authenticated request,
+first one after another and then several at the same time (as a pre-forking
+server starting its workers would). Prints per-phase timings as JSON:
+
+    python benchmarks/startup_benchmark.py --lots 50 --spots 2000 --runs 10 --workers 8
+
+Phases: ``interpreter`` (process start until the script runs), ``app`` (import
+and build the app), ``first_request`` and ``total`` (wall time of the process).
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SETUP_SCRIPT = """
+import sys
+from src.main import app
+from src.extensions import db
+from src.models.models import ParkingLot
+from src.utils.migrations import init_database
+from src.utils.provisioning import insert_spot_range
+
+lots, spots = int(sys.argv[1]), int(sys.argv[2])
+with app.app_context():
+    init_database("admin", "bench-password")
+    for i in range(lots):
+        lot = ParkingLot(prime_location_name=f"Lot {i}", price=10, address="x", pin_code="0",
+                         number_of_spots=spots, available_count=spots, occupied_count=0)
+        db.session.add(lot)
+        db.session.flush()
+        insert_spot_range(lot.id, 1, spots)
+    db.session.commit()
+"""
+
+CHILD_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+from src.main import app
+built = time.perf_counter()
+from flask_jwt_extended import create_access_token
+with app.app_context():
+    token = create_access_token(identity="admin", additional_claims={"role": "admin", "user_id": 1})
+response = app.test_client().get("/api/admin/dashboard/summary", headers={"Authorization": "Bearer " + token})
+done = time.perf_counter()
+print(json.dumps({"started_at": time.time() - (done - started), "app": built - started, "first_request": done - built, "status": response.status_code}))
+"""
+
+
+def _environment(workdir):
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'startup.db')}",
+        "EXPORT_DIR": os.path.join(workdir, "exports"),
+        "CELERY_BROKER_URL": "memory://",
+        "CELERY_RESULT_BACKEND": "cache+memory://",
+        "PYTHONPATH": REPO_ROOT + os.pathsep + env.get("PYTHONPATH", ""),
+    })
+    return env
+
+
+def _spawn(env):
+    return subprocess.Popen(
+        [sys.executable, "-W", "ignore", "-c", CHILD_SCRIPT],
+        cwd=REPO_ROOT, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+    ), time.time()
+
+
+def _collect(process, spawned_at):
+    stdout, stderr = process.communicate()
+    finished_at = time.time()
+    if process.returncode != 0 or not stdout.strip():
+        return {"error": (stderr.strip().splitlines() or ["exited with status %d" % process.returncode])[-1]}
+    timings = json.loads(stdout.strip().splitlines()[-1])
+    return {
+        "interpreter": timings["started_at"] - spawned_at,
+        "app": timings["app"],
+        "first_request": timings["first_request"],
+        "total": finished_at - spawned_at,
+        "status": timings["status"]
+    }
+
+
+def _summary(samples):
+    ok = [sample for sample in samples if "error" not in sample and sample["status"] == 200]
+    summary = {"runs": len(samples), "errors": len(samples) - len(ok)}
+    for phase in ("interpreter", "app", "first_request", "total"):
+        values = sorted(sample[phase] * 1000 for sample in ok)
+        if values:
+            summary[phase] = {
+                "median_ms": round(statistics.median(values), 2),
+                "max_ms": round(values[-1], 2)
+            }
+    failures = [sample["error"] for sample in samples if "error" in sample]
+    if failures:
+        summary["first_error"] = failures[0]
+    return summary
+
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix="vp-startup-")
+    env = _environment(workdir)
+    setup = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", SETUP_SCRIPT, str(args.lots), str(args.spots)],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True
+    )
+    if setup.returncode != 0:
+        raise RuntimeError(f"Database set-up failed: {setup.stderr.strip()[-500:]}")
+
+    sequential = [_collect(*_spawn(env)) for _ in range(args.runs)]
+    concurrent = [_collect(*started) for started in [_spawn(env) for _ in range(args.workers)]]
+    return {
+        "meta": {
+            "scale": {"lots": args.lots, "spots_per_lot": args.spots},
+            "runs": args.runs,
+            "workers": args.workers,
+            "python": platform.python_version()
+        },
+        "sequential": _summary(sequential),
+        "concurrent": _summary(concurrent)
+    }
+
+
+def print_table(results, stream):
+    print(f"{'phase':24} {'median ms':>10} {'max ms':>10}", file=stream)
+    for mode in ("sequential", "concurrent"):
+        summary = results[mode]
+        for phase in ("interpreter", "app", "first_request", "total"):
+            if phase in summary:
+                print(f"{mode + '.' + phase:24} {summary[phase]['median_ms']:10.1f} {summary[phase]['max_ms']:10.1f}", file=stream)
+        if summary["errors"]:
+            print(f"{mode}: {summary['errors']} failed start(s): {summary.get('first_error')}", file=stream)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--lots", type=int, default=20, help="Seeded parking lots (N).")
+    parser.add_argument("--spots", type=int, default=500, help="Spots per seeded lot (M).")
+    parser.add_argument("--runs", type=int, default=5, help="Sequential cold starts.")
+    parser.add_argument("--workers", type=int, default=4, help="Cold starts launched at the same time.")
+    parser.add_argument("--output", help="Write the JSON results here instead of stdout.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = run(args)
+    print_table(results, sys.stderr)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump(results, output_file, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,23 @@
+def celery_init_app(app):
+    """Create the Celery app from ``app.config["CELERY"]`` and run every task in an app context."""
+    from celery import Celery, Task
+
+    class FlaskTask(Task):
+        def __call__(self, *args, **kwargs):
+            with app.app_context():
+                return self.run(*args, **kwargs)
+
+    celery_app = Celery(app.name, task_cls=FlaskTask)
+    celery_app.config_from_object(app.config["CELERY"])
+    celery_app.set_default()
+    app.extensions["celery"] = celery_app
+    return celery_app
+
+
+def get_celery(app):
+    """Return the app's Celery instance, creating it on first use.
+
+    Web workers only load Celery once they queue a task, which keeps it out of startup.
+    """
+    celery_app = app.extensions.get("celery")
+    return celery_app if celery_app is not None else celery_init_app(app)
@@ -0,0 +1,185 @@
+import datetime
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from src.extensions import db
+from src.utils.analytics import reset_occupancy_rollup, rollup_occupancy
+from src.utils.archive import archive_reservations
+from src.utils.cache import cache, SPOT_STATUS_KEYS
+from src.utils.cache_check import check_cache_backends
+from src.utils.data_versions import bump_versions
+from src.utils.gate_events import purge_idempotency_keys
+from src.utils.holds import sweep_expired_holds
+from src.utils.migrations import init_database, run_migrations
+from src.utils.occupancy import repair_lot_counters
+from src.utils.provisioning import import_lots
+from src.utils.query_plans import check_query_plans
+from src.utils.spot_allocator import spot_allocator
+from src.utils.token_blocklist import token_blocklist
+from src.utils.user_stats import rebuild_user_stats
+
+
+@click.command("reconcile-spots")
+@with_appcontext
+def reconcile_spots():
+    """Rebuild the free-spot index from the database and report drift."""
+    drift = spot_allocator.reconcile()
+    print(f"Free-spot index rebuilt ({drift} spot(s) corrected).")
+
+
+@click.command("repair-occupancy")
+@with_appcontext
+def repair_occupancy():
+    """Recompute per-lot occupancy counters from the spots table."""
+    drifted = repair_lot_counters()
+    if drifted:
+        bump_versions(*SPOT_STATUS_KEYS)
+    db.session.commit()
+    for entry in drifted:
+        print(f"Lot {entry['lot_id']}: available {entry['available_count'][0]} -> {entry['available_count'][1]}, occupied {entry['occupied_count'][0]} -> {entry['occupied_count'][1]}")
+    print(f"Occupancy counters checked ({len(drifted)} lot(s) repaired).")
+    cache.invalidate(*SPOT_STATUS_KEYS)
+
+
+@click.command("init-db")
+@click.option("--admin-username", envvar="ADMIN_USERNAME", default="admin", show_default=True)
+@click.option("--admin-password", envvar="ADMIN_PASSWORD", default="admin123", show_default=True)
+@with_appcontext
+def init_db_command(admin_username, admin_password):
+    """Create the schema, apply migrations and seed the admin account (run once per deployment)."""
+    report = init_database(admin_username, admin_password)
+    print(f"Applied migrations: {report['migrations']}" if report["migrations"] else "Database schema is up to date.")
+    print(f"Admin user '{admin_username}' {'created' if report['admin_created'] else 'already exists'}.")
+
+
+@click.command("migrate")
+@with_appcontext
+def migrate():
+    """Apply pending schema migrations to the configured database."""
+    applied = run_migrations()
+    print(f"Applied migrations: {applied}" if applied else "Database schema is up to date.")
+
+
+@click.command("check-query-plans")
+@with_appcontext
+def check_plans():
+    """Fail if any hot query is planned as a table scan."""
+    regressions = check_query_plans()
+    for name, plan in regressions.items():
+        print(f"{name}: {' | '.join(plan)}")
+    if regressions:
+        raise SystemExit(1)
+    print("All hot queries use an index.")
+
+
+@click.command("check-cache-backends")
+def check_cache():
+    """Fail if the memory or Redis cache backend misbehaves (Redis runs against a stand-in client)."""
+    failures = check_cache_backends()
+    for backend, failed in failures.items():
+        for scenario in failed:
+            print(f"{backend}: {scenario}")
+    if failures:
+        raise SystemExit(1)
+    print("Both cache backends behave as expected.")
+
+
+@click.command("import-lots")
+@with_appcontext
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "fmt", type=click.Choice(["csv", "jsonl"]), help="Defaults to the file extension.")
+@click.option("--chunk-size", default=100, show_default=True, help="Lots inserted per transaction.")
+@click.option("--dry-run", is_flag=True, help="Only validate the file.")
+def import_lots_command(path, fmt, chunk_size, dry_run):
+    """Bulk-create parking lots and their spots from a CSV or JSON-lines file."""
+    fmt = fmt or ("jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv")
+
+    def progress(report):
+        print(f"... {report['processed_rows']} rows read, {report['created_lots']} lots / {report['created_spots']} spots created, {report['failed_rows']} failed")
+
+    with open(path, encoding="utf-8-sig", newline="") as import_file:
+        report = import_lots(import_file, fmt, chunk_size=chunk_size, dry_run=dry_run, progress=progress)
+    for error in report["errors"]:
+        print(f"line {error['line']}: {error['message']}")
+    print(f"{'Validated' if dry_run else 'Imported'} {report['created_lots']} lots ({report['created_spots']} spots), {report['failed_rows']} row(s) failed.")
+    if report["created_lots"] and not dry_run:
+        cache.invalidate(*SPOT_STATUS_KEYS)
+
+
+@click.command("purge-revoked-tokens")
+@with_appcontext
+def purge_revoked_tokens():
+    """Delete blocklist entries whose tokens have already expired."""
+    purged = token_blocklist.purge_expired()
+    print(f"Purged {purged} expired revoked token(s).")
+
+
+@click.command("purge-idempotency-keys")
+@with_appcontext
+@click.option("--older-than-hours", type=float, help="Defaults to IDEMPOTENCY_KEY_TTL_HOURS.")
+def purge_idempotency_keys_command(older_than_hours):
+    """Delete stored gate event results that are too old to be replayed."""
+    if older_than_hours is None:
+        older_than_hours = current_app.config["IDEMPOTENCY_KEY_TTL_HOURS"]
+    purged = purge_idempotency_keys(datetime.timedelta(hours=older_than_hours))
+    print(f"Purged {purged} idempotency key(s) older than {older_than_hours} hour(s).")
+
+
+@click.command("expire-holds")
+@with_appcontext
+def expire_holds_command():
+    """Release the spots of reservation holds that have lapsed."""
+    expired = sweep_expired_holds()
+    print(f"Expired {expired} reservation hold(s).")
+
+
+@click.command("archive-reservations")
+@with_appcontext
+@click.option("--older-than-days", type=float, help="Defaults to RESERVATION_ARCHIVE_AFTER_DAYS.")
+@click.option("--batch-size", type=int, help="Reservations moved per transaction. Defaults to RESERVATION_ARCHIVE_BATCH_SIZE.")
+@click.option("--max-batches", type=int, help="Stop after this many batches; the next run carries on.")
+def archive_reservations_command(older_than_days, batch_size, max_batches):
+    """Move long-closed reservations to the reservation_history table."""
+    if older_than_days is None:
+        older_than_days = current_app.config["RESERVATION_ARCHIVE_AFTER_DAYS"]
+    if batch_size is None:
+        batch_size = current_app.config["RESERVATION_ARCHIVE_BATCH_SIZE"]
+
+    def progress(report):
+        print(f"... {report['archived']} reservation(s) archived in {report['batches']} batch(es)")
+
+    report = archive_reservations(datetime.timedelta(days=older_than_days), batch_size=batch_size, max_batches=max_batches, progress=progress)
+    print(f"Archived {report['archived']} reservation(s) that left before {report['cutoff']}.")
+
+
+@click.command("rebuild-user-stats")
+@with_appcontext
+@click.option("--user-id", type=int, help="Only rebuild this user's stats.")
+def rebuild_user_stats_command(user_id):
+    """Recompute the per-user dashboard stats from the reservations table."""
+    rebuilt = rebuild_user_stats(user_id)
+    print(f"Rebuilt stats for {rebuilt} user(s).")
+
+
+@click.command("rollup-occupancy")
+@with_appcontext
+@click.option("--lag-seconds", type=int, help="Stay this far behind now. Defaults to ANALYTICS_ROLLUP_LAG_SECONDS.")
+@click.option("--window-days", default=7, show_default=True, help="Closing-time window folded per transaction.")
+@click.option("--rebuild", is_flag=True, help="Discard the buckets and refold all history, e.g. after importing old reservations.")
+def rollup_occupancy_command(lag_seconds, window_days, rebuild):
+    """Fold newly closed reservations into the hourly occupancy buckets."""
+    if rebuild:
+        reset_occupancy_rollup()
+    if lag_seconds is None:
+        lag_seconds = current_app.config["ANALYTICS_ROLLUP_LAG_SECONDS"]
+    report = rollup_occupancy(lag_seconds=lag_seconds, window=datetime.timedelta(days=window_days))
+    print(f"Folded {report['reservations']} reservation(s) into {report['buckets']} bucket update(s) over {report['windows']} window(s); watermark {report['watermark']}.")
+    if report["conflict"]:
+        print("Another rollup moved the watermark concurrently; stopped early.")
+
+
+def register_commands(app):
+    for command in (init_db_command, reconcile_spots, repair_occupancy, migrate, check_plans, check_cache, import_lots_command, purge_revoked_tokens, purge_idempotency_keys_command, expire_holds_command, archive_reservations_command, rebuild_user_stats_command, rollup_occupancy_command):
+        app.cli.add_command(command)
@@ -6,7 +6,6 @@ from datetime import timedelta
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
 from flask import Flask, send_from_directory
-from werkzeug.security import generate_password_hash # For admin password
 from dotenv import load_dotenv
 
 from src.extensions import db, jwt # Import db and jwt from extensions
@@ -18,19 +17,134 @@ def create_app():
 
     # Configuration
     app.config["SECRET_KEY"] = os.getenv("SECRET_KEY", "a_default_secret_key_for_development_12345")
-    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///vehicle_parking.db"
+    app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv("DATABASE_URL", "sqlite:///vehicle_parking.db")
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
+    # Connection pools; read endpoints use a separate read-only pool (DATABASE_READ_URL defaults to the primary database)
+    app.config["DATABASE_READ_URL"] = os.getenv("DATABASE_READ_URL")
+    app.config["DATABASE_POOL_SIZE"] = int(os.getenv("DATABASE_POOL_SIZE", "5"))
+    app.config["DATABASE_READ_POOL_SIZE"] = int(os.getenv("DATABASE_READ_POOL_SIZE", "10"))
+    app.config["DATABASE_MAX_OVERFLOW"] = int(os.getenv("DATABASE_MAX_OVERFLOW", "10"))
+    app.config["DATABASE_POOL_TIMEOUT"] = float(os.getenv("DATABASE_POOL_TIMEOUT", "30"))
+    app.config["DATABASE_POOL_RECYCLE"] = int(os.getenv("DATABASE_POOL_RECYCLE", "-1"))
+    app.config["DATABASE_POOL_PRE_PING"] = os.getenv("DATABASE_POOL_PRE_PING", "false").lower() == "true"
+
+    # SQLite pragmas applied to every connection
+    app.config["SQLITE_WAL"] = os.getenv("SQLITE_WAL", "true").lower() == "true"
+    app.config["SQLITE_BUSY_TIMEOUT_MS"] = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    app.config["SQLITE_SYNCHRONOUS"] = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    app.config["SQLITE_CACHE_SIZE_KB"] = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+    app.config["SQLITE_MMAP_SIZE_MB"] = int(os.getenv("SQLITE_MMAP_SIZE_MB", "256"))
+
     # JWT Configuration
     app.config["JWT_SECRET_KEY"] = os.getenv("JWT_SECRET_KEY", "a_default_jwt_secret_key_12345") # Change this in production!
     app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(hours=1)
     app.config["JWT_TOKEN_LOCATION"] = ["headers"]
 
+    # Revoked tokens are shared through "database" (default) or "redis"; "memory" is per process
+    app.config["JWT_BLOCKLIST_BACKEND"] = os.getenv("JWT_BLOCKLIST_BACKEND", "database")
+    app.config["JWT_BLOCKLIST_REDIS_URL"] = os.getenv("JWT_BLOCKLIST_REDIS_URL", "redis://localhost:6379/0")
+    app.config["JWT_BLOCKLIST_NEGATIVE_TTL"] = float(os.getenv("JWT_BLOCKLIST_NEGATIVE_TTL", "5"))
+
+    # Request instrumentation, exposed on /metrics (can be switched at runtime via PUT /api/admin/metrics)
+    app.config["METRICS_ENABLED"] = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    app.config["METRICS_SLOW_REQUEST_MS"] = float(os.getenv("METRICS_SLOW_REQUEST_MS", "500"))
+    app.config["METRICS_SLOW_SAMPLE_RATE"] = float(os.getenv("METRICS_SLOW_SAMPLE_RATE", "1.0"))
+    app.config["METRICS_TOKEN"] = os.getenv("METRICS_TOKEN") # Bearer token scrapers send to /metrics; unset keeps it disabled
+
+    # Group commit for book/park/vacate: one writer thread applies queued transitions in batched transactions
+    app.config["WRITE_QUEUE_ENABLED"] = os.getenv("WRITE_QUEUE_ENABLED", "false").lower() == "true"
+    app.config["WRITE_QUEUE_MAX_BATCH"] = int(os.getenv("WRITE_QUEUE_MAX_BATCH", "64"))
+    app.config["WRITE_QUEUE_MAX_WAIT_MS"] = float(os.getenv("WRITE_QUEUE_MAX_WAIT_MS", "2"))
+    app.config["WRITE_QUEUE_TIMEOUT"] = float(os.getenv("WRITE_QUEUE_TIMEOUT", "30"))
+
+    # Results of batched gate events are kept this long so replays stay idempotent (flask purge-idempotency-keys)
+    app.config["IDEMPOTENCY_KEY_TTL_HOURS"] = float(os.getenv("IDEMPOTENCY_KEY_TTL_HOURS", "72"))
+
+    # Cache Configuration ("memory", "redis" or "none")
+    app.config["CACHE_BACKEND"] = os.getenv("CACHE_BACKEND", "memory")
+    app.config["CACHE_REDIS_URL"] = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+    app.config["CACHE_DEFAULT_TTL"] = int(os.getenv("CACHE_DEFAULT_TTL", "30"))
+
+    # gzip/deflate for JSON and CSV responses; buffered bodies smaller than this are sent as they are
+    app.config["COMPRESSION_ENABLED"] = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"
+    app.config["COMPRESSION_MIN_SIZE"] = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+    app.config["COMPRESSION_LEVEL"] = int(os.getenv("COMPRESSION_LEVEL", "6"))
+
+    # A booked spot is held this long for the vehicle to park, then released (0 keeps holds until parked)
+    app.config["RESERVATION_HOLD_TTL_SECONDS"] = int(os.getenv("RESERVATION_HOLD_TTL_SECONDS", "900"))
+
+    # Recent spot-status vectors kept per worker so spot_map requests with since= can be answered with a diff
+    app.config["SPOT_MAP_HISTORY_SIZE"] = int(os.getenv("SPOT_MAP_HISTORY_SIZE", "1024"))
+
+    # Lot availability pushed over Server-Sent Events ("memory", "redis" for several workers, or "none")
+    app.config["AVAILABILITY_BACKEND"] = os.getenv("AVAILABILITY_BACKEND", "memory")
+    app.config["AVAILABILITY_REDIS_URL"] = os.getenv("AVAILABILITY_REDIS_URL", "redis://localhost:6379/0")
+    app.config["AVAILABILITY_COALESCE_MS"] = float(os.getenv("AVAILABILITY_COALESCE_MS", "250"))
+    app.config["AVAILABILITY_HISTORY_SIZE"] = int(os.getenv("AVAILABILITY_HISTORY_SIZE", "1024")) # Events kept for Last-Event-ID resumes
+    app.config["AVAILABILITY_KEEPALIVE_SECONDS"] = float(os.getenv("AVAILABILITY_KEEPALIVE_SECONDS", "15"))
+    app.config["AVAILABILITY_STREAM_MAX_SECONDS"] = float(os.getenv("AVAILABILITY_STREAM_MAX_SECONDS", "300")) # Clients reconnect and resume after this
+
+    # Celery Configuration (Redis as broker and result backend)
+    app.config["CELERY"] = {
+        "broker_url": os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0"),
+        "result_backend": os.getenv("CELERY_RESULT_BACKEND", "redis://localhost:6379/0"),
+        "task_ignore_result": True,
+        "task_always_eager": os.getenv("CELERY_TASK_ALWAYS_EAGER", "false").lower() == "true",
+        "imports": ["src.tasks.analytics", "src.tasks.exports", "src.tasks.holds", "src.tasks.archive"],
+        "beat_schedule": {
+            "rollup-occupancy": {
+                "task": "src.tasks.analytics.rollup_occupancy_task",
+                "schedule": float(os.getenv("ANALYTICS_ROLLUP_INTERVAL", "300")),
+            },
+            "expire-holds": {
+                "task": "src.tasks.holds.expire_holds_task",
+                "schedule": float(os.getenv("HOLD_SWEEP_INTERVAL", "60")),
+            },
+            "archive-reservations": {
+                "task": "src.tasks.archive.archive_reservations_task",
+                "schedule": float(os.getenv("RESERVATION_ARCHIVE_INTERVAL", "3600")),
+            },
+        },
+    }
+
+    # Hourly occupancy rollup: reservations closed less than this long ago are left for the next run
+    app.config["ANALYTICS_ROLLUP_LAG_SECONDS"] = int(os.getenv("ANALYTICS_ROLLUP_LAG_SECONDS", "60"))
+
+    # Reservations closed longer ago than this are moved to reservation_history, in batches of this many rows
+    app.config["RESERVATION_ARCHIVE_AFTER_DAYS"] = float(os.getenv("RESERVATION_ARCHIVE_AFTER_DAYS", "90"))
+    app.config["RESERVATION_ARCHIVE_BATCH_SIZE"] = int(os.getenv("RESERVATION_ARCHIVE_BATCH_SIZE", "1000"))
+
+    # CSV exports up to this many reservations are streamed inline, larger ones run as a Celery job
+    app.config["CSV_EXPORT_INLINE_LIMIT"] = int(os.getenv("CSV_EXPORT_INLINE_LIMIT", "5000"))
+    app.config["EXPORT_DIR"] = os.getenv("EXPORT_DIR", os.path.join(app.instance_path, "exports"))
+
+    from src.utils import database
+    database.configure_engines(app)
     db.init_app(app)
+    database.init_app(app)
     jwt.init_app(app)
 
-    # This import is now safe here because db is initialized above
-    from src.models.models import User, ParkingLot, ParkingSpot, Reservation
+    from src.utils.spot_allocator import spot_allocator
+    from src.utils.cache import cache
+    from src.utils.token_blocklist import token_blocklist
+    from src.utils.metrics import metrics
+    from src.utils.write_queue import write_queue
+    from src.utils.availability import availability_feed
+    from src.utils.http_cache import compressor
+    from src.utils.spot_maps import spot_maps
+    from src.utils.holds import hold_sweeper
+    from src.cli import register_commands
+    spot_allocator.init_app(app)
+    cache.init_app(app)
+    token_blocklist.init_app(app)
+    metrics.init_app(app)
+    write_queue.init_app(app)
+    availability_feed.init_app(app)
+    compressor.init_app(app)
+    spot_maps.init_app(app)
+    hold_sweeper.init_app(app)
+
     from src.routes.auth import auth_bp
     from src.routes.admin import admin_bp
     from src.routes.user_routes import user_routes_bp
@@ -39,23 +153,10 @@ def create_app():
     app.register_blueprint(admin_bp, url_prefix="/api/admin")
     app.register_blueprint(user_routes_bp, url_prefix="/api/user")
 
-    with app.app_context():
-        # Create database tables if they don"t exist
-        # This check ensures it runs only once per app start or when needed
-        if not app.config.get("_database_initialized", False):
-            db.create_all()
-            admin_username = os.getenv("ADMIN_USERNAME", "admin")
-            admin_password = os.getenv("ADMIN_PASSWORD", "admin123")
-            admin_user = User.query.filter_by(username=admin_username).first()
-            if not admin_user:
-                hashed_password = generate_password_hash(admin_password)
-                new_admin = User(username=admin_username, password_hash=hashed_password, role="admin")
-                db.session.add(new_admin)
-                db.session.commit()
-                print(f"Admin user \'{admin_username}\' created.")
-            else:
-                print(f"Admin user \'{admin_username}\' already exists.")
-            app.config["_database_initialized"] = True
+    # Nothing here touches the database: tables and the admin account are created by
+    # "flask init-db", and the free-spot index loads each lot on its first booking
+
+    register_commands(app)
 
     @app.route("/", defaults={"path": ""})
     @app.route("/<path:path>")
@@ -75,8 +176,20 @@ def create_app():
     
     return app
 
-app = create_app()
+def __getattr__(name):
+    # The default app is built on first access (gunicorn src.main:app, flask --app src.main,
+    # celery -A src.main:celery_app), so importing this module has no side effects
+    if name == "app":
+        globals()["app"] = create_app()
+        return globals()["app"]
+    if name == "celery_app":
+        from src.celery_app import get_celery
+        return get_celery(globals().get("app") or __getattr__("app"))
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 if __name__ == "__main__":
+    from src.utils.migrations import init_database
+    app = create_app()
+    with app.app_context():
+        init_database(os.getenv("ADMIN_USERNAME", "admin"), os.getenv("ADMIN_PASSWORD", "admin123")) # Development server only
     app.run(host="0.0.0.0", port=5000, debug=True)
-
@@ -27,8 +27,13 @@ class ParkingLot(db.Model):
     address = db.Column(db.String(200), nullable=False)
     pin_code = db.Column(db.String(10), nullable=False)
     number_of_spots = db.Column(db.Integer, nullable=False)
+    # Maintained alongside every spot status change (see src/utils/occupancy.py)
+    available_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    occupied_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     parking_spots = db.relationship('ParkingSpot', backref='parking_lot', lazy=True, cascade="all, delete-orphan")
 
+    __table_args__ = (db.Index('ix_parking_lots_pin_code', 'pin_code'),)
+
     def __repr__(self):
         return f'<ParkingLot {self.prime_location_name}>'
 
@@ -40,12 +45,18 @@ class ParkingSpot(db.Model):
     status = db.Column(db.String(1), nullable=False, default='A')  # 'A' for Available, 'O' for Occupied
     reservations = db.relationship('Reservation', backref='parking_spot', lazy=True)
 
-    # Ensure unique spot_number within a lot
-    __table_args__ = (db.UniqueConstraint('lot_id', 'spot_number', name='_lot_spot_uc'),)
+    # Ensure unique spot_number within a lot; the index serves "first free spot in lot" lookups
+    __table_args__ = (
+        db.UniqueConstraint('lot_id', 'spot_number', name='_lot_spot_uc'),
+        db.Index('ix_parking_spots_lot_status_number', 'lot_id', 'status', 'spot_number'),
+    )
 
     def __repr__(self):
         return f'<ParkingSpot {self.id} in Lot {self.lot_id} - Status: {self.status}>'
 
+def _closed_at_default(context):
+    return context.get_current_parameters().get('leaving_timestamp')
+
 class Reservation(db.Model):
     __tablename__ = 'reservations'
     id = db.Column(db.Integer, primary_key=True)
@@ -54,7 +65,106 @@ class Reservation(db.Model):
     parking_timestamp = db.Column(db.DateTime, nullable=True)
     leaving_timestamp = db.Column(db.DateTime, nullable=True)
     parking_cost = db.Column(db.Float, nullable=True)
+    hold_expires_at = db.Column(db.DateTime, nullable=True) # Set while booked but not parked; the spot is released when it lapses
+    # Server time the reservation was closed, which the occupancy rollup advances on; rows inserted closed default to their leaving time
+    closed_at = db.Column(db.DateTime, nullable=True, default=_closed_at_default)
+
+    __table_args__ = (
+        db.Index('ix_reservations_user_parking', 'user_id', 'parking_timestamp'),
+        db.Index('ix_reservations_spot_leaving', 'spot_id', 'leaving_timestamp'),
+        db.Index('ix_reservations_user_id', 'user_id', 'id'),
+        db.Index('ix_reservations_leaving', 'leaving_timestamp'),
+        db.Index('ix_reservations_hold_expires', 'hold_expires_at'), # Only pending holds have a value
+        db.Index('ix_reservations_closed', 'closed_at'),
+    )
 
     def __repr__(self):
         return f'<Reservation {self.id} for Spot {self.spot_id} by User {self.user_id}>'
 
+class ReservationHistory(db.Model):
+    __tablename__ = 'reservation_history'
+    # Closed reservations moved out of ``reservations`` by src/utils/archive.py, under their original ids
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    spot_id = db.Column(db.Integer, db.ForeignKey('parking_spots.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    parking_timestamp = db.Column(db.DateTime, nullable=True)
+    leaving_timestamp = db.Column(db.DateTime, nullable=False)
+    parking_cost = db.Column(db.Float, nullable=True)
+    closed_at = db.Column(db.DateTime, nullable=False)
+    archived_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_reservation_history_user_id', 'user_id', 'id'),
+        db.Index('ix_reservation_history_user_parking', 'user_id', 'parking_timestamp'),
+        db.Index('ix_reservation_history_spot', 'spot_id'),
+        db.Index('ix_reservation_history_closed', 'closed_at'),
+    )
+
+    def __repr__(self):
+        return f'<ReservationHistory {self.id} for Spot {self.spot_id} by User {self.user_id}>'
+
+class RevokedToken(db.Model):
+    __tablename__ = 'revoked_tokens'
+    jti = db.Column(db.String(36), primary_key=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True) # Entry can be purged once the token has expired
+
+    def __repr__(self):
+        return f'<RevokedToken {self.jti}>'
+
+class UserStats(db.Model):
+    __tablename__ = 'user_stats'
+    # Maintained by the reservation transitions (see src/utils/user_stats.py)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    total_bookings = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    total_spent = db.Column(db.Float, nullable=False, default=0, server_default='0')
+    minutes_parked = db.Column(db.Float, nullable=False, default=0, server_default='0')
+    last_visit = db.Column(db.DateTime, nullable=True) # Most recent parking time
+    active_reservation_id = db.Column(db.Integer, db.ForeignKey('reservations.id'), nullable=True) # Latest parked, not yet vacated
+
+    def __repr__(self):
+        return f'<UserStats for User {self.user_id}>'
+
+class IdempotencyKey(db.Model):
+    __tablename__ = 'idempotency_keys'
+    # Results of batched gate events, so replaying an event returns its original outcome
+    key = db.Column(db.String(100), primary_key=True)
+    action = db.Column(db.String(10), nullable=False)
+    reservation_id = db.Column(db.Integer, nullable=False)
+    status_code = db.Column(db.Integer, nullable=False)
+    response = db.Column(db.Text, nullable=False) # JSON body of the event's result
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f'<IdempotencyKey {self.key}>'
+
+class OccupancyHourly(db.Model):
+    __tablename__ = 'occupancy_hourly'
+    # Rolled up from closed reservations by src/utils/analytics.py
+    lot_id = db.Column(db.Integer, primary_key=True)
+    hour = db.Column(db.DateTime, primary_key=True) # Start of the hour (UTC)
+    day = db.Column(db.Date, nullable=False) # Date of ``hour``, so daily series group in SQL
+    occupied_minutes = db.Column(db.Float, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0) # Parking cost spread pro rata over the hours parked
+    visits = db.Column(db.Integer, nullable=False, default=0) # Reservations that started parking in this hour
+
+    __table_args__ = (db.Index('ix_occupancy_hourly_hour', 'hour'),)
+
+    def __repr__(self):
+        return f'<OccupancyHourly lot {self.lot_id} at {self.hour}>'
+
+class RollupWatermark(db.Model):
+    __tablename__ = 'rollup_watermarks'
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.DateTime, nullable=True) # Everything up to and including this point has been folded in
+
+    def __repr__(self):
+        return f'<RollupWatermark {self.name}={self.value}>'
+
+class DataVersion(db.Model):
+    __tablename__ = 'data_versions'
+    # Bumped by the transactions that change a cached view (see src/utils/data_versions.py)
+    name = db.Column(db.String(50), primary_key=True) # Cache key of the view
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<DataVersion {self.name}={self.value}>'
@@ -1,7 +1,26 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, current_app, stream_with_context
 from src.extensions import db # Import db from extensions.py
 from src.models.models import ParkingLot, ParkingSpot, User, Reservation
 from src.utils.decorators import admin_required
+from src.utils.spot_allocator import spot_allocator
+from src.utils.cache import cache, ADMIN_PARKING_LOTS, ADMIN_DASHBOARD_SUMMARY, SPOT_STATUS_KEYS, LOT_DETAILS_KEYS
+from src.utils.data_versions import bump_versions, data_version
+from src.utils.occupancy import adjust_lot_counters
+from src.utils.provisioning import delete_free_spots, import_lots, insert_spot_range
+from src.utils.metrics import metrics
+from src.utils.analytics import current_watermark, floor_hour, occupancy_series
+from src.utils.availability import availability_feed
+from src.utils.gate_events import GATE_ACTIONS, apply_gate_events
+from src.utils.reservations import TransitionError
+from src.utils.write_queue import write_queue
+from src.utils.database import read_execute
+from src.utils.http_cache import listing_etag, not_modified, parse_fields, select_fields, with_etag
+from src.utils.spot_maps import ENCODINGS as SPOT_MAP_ENCODINGS, spot_maps, version_of
+from src.utils.pagination import MAX_PAGE_SIZE, page_args, split_page, with_next_cursor
+from sqlalchemy import func, select
+import csv
+import datetime
+import io
 from sqlalchemy.exc import IntegrityError
 
 admin_bp = Blueprint("admin_bp", __name__)
@@ -25,45 +44,192 @@ def create_parking_lot():
             price=data["price"],
             address=data["address"],
             pin_code=data["pin_code"],
-            number_of_spots=data["number_of_spots"]
+            number_of_spots=data["number_of_spots"],
+            available_count=data["number_of_spots"],
+            occupied_count=0
         )
         db.session.add(new_lot)
         db.session.flush() # To get the new_lot.id for spot creation
 
-        for i in range(1, data["number_of_spots"] + 1):
-            new_spot = ParkingSpot(lot_id=new_lot.id, spot_number=i, status="A")
-            db.session.add(new_spot)
-        
+        insert_spot_range(new_lot.id, 1, data["number_of_spots"])
+        bump_versions(*SPOT_STATUS_KEYS)
         db.session.commit()
+        spot_allocator.rebuild(new_lot.id)
+        cache.invalidate(*SPOT_STATUS_KEYS)
+        availability_feed.lot_changed(new_lot.id)
         return jsonify({"message": "Parking lot and spots created successfully", "lot_id": new_lot.id}), 201
     except Exception as e:
         db.session.rollback()
         return jsonify({"message": "An error occurred", "error": str(e)}), 500
 
+@admin_bp.route("/parking_lots/import", methods=["POST"])
+@admin_required
+def import_parking_lots():
+    """Bulk-create lots from an uploaded CSV or JSON-lines file.
+
+    The file is sent as the ``file`` form field or as the raw request body; the
+    format comes from ``format`` (csv/jsonl), the file extension or the content type.
+    ``dry_run=true`` only validates.
+    """
+    upload = request.files.get("file")
+    if upload is not None:
+        stream, filename, content_type = upload.stream, upload.filename or "", upload.mimetype
+    else:
+        stream, filename, content_type = request.stream, "", request.mimetype
+
+    fmt = request.args.get("format")
+    if not fmt:
+        if filename.endswith((".jsonl", ".ndjson")) or content_type in ("application/x-ndjson", "application/jsonl"):
+            fmt = "jsonl"
+        elif filename.endswith(".csv") or content_type == "text/csv":
+            fmt = "csv"
+    if fmt not in ("csv", "jsonl"):
+        return jsonify({"message": "Import format must be csv or jsonl"}), 400
+
+    dry_run = request.args.get("dry_run", "false").lower() in ("1", "true", "yes")
+    chunk_size = request.args.get("chunk_size", 100, type=int)
+    if not 1 <= chunk_size <= MAX_PAGE_SIZE:
+        return jsonify({"message": f"chunk_size must be between 1 and {MAX_PAGE_SIZE}"}), 400
+
+    text_stream = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    try:
+        report = import_lots(text_stream, fmt, chunk_size=chunk_size, dry_run=dry_run)
+    except (UnicodeDecodeError, csv.Error) as e:
+        return jsonify({"message": "Could not read import file", "error": str(e)}), 400
+    finally:
+        text_stream.detach()
+
+    if report["created_lots"] and not dry_run:
+        cache.invalidate(*SPOT_STATUS_KEYS)
+    return jsonify(report), 200
+
+LOT_FIELDS = ("id", "prime_location_name", "price", "address", "pin_code", "number_of_spots", "available_spots", "spots")
+
 @admin_bp.route("/parking_lots", methods=["GET"])
 @admin_required
 def get_parking_lots():
-    lots = ParkingLot.query.all()
-    output = []
-    for lot in lots:
-        spots = ParkingSpot.query.filter_by(lot_id=lot.id).all()
-        spot_details = [{
-            "id": spot.id, 
-            "spot_number": spot.spot_number, 
-            "status": spot.status
-        } for spot in spots]
-        lot_data = {
-            "id": lot.id,
-            "prime_location_name": lot.prime_location_name,
-            "price": lot.price,
-            "address": lot.address,
-            "pin_code": lot.pin_code,
-            "number_of_spots": lot.number_of_spots,
-            "available_spots": len([s for s in spot_details if s["status"] == "A"]),
-            "spots": spot_details
-        }
-        output.append(lot_data)
-    return jsonify(output), 200
+    """List lots with their availability and, optionally, every spot.
+
+    Query parameters: ``limit`` (page size, all lots when omitted), ``cursor``
+    (id of the last lot of the previous page), ``include_spots`` (default true),
+    ``fields`` (the lot keys to return; spots are included only when listed) and
+    ``spot_format`` (rle or bitmap: each lot gets a compact ``spot_map`` instead
+    of the ``spots`` list). The next cursor is returned in the ``X-Next-Cursor``
+    header. Responses carry an ETag, and an unchanged page is answered with 304.
+    """
+    try:
+        limit, cursor = page_args(request.args)
+        fields = parse_fields(request.args, LOT_FIELDS)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    spot_format = request.args.get("spot_format")
+    if spot_format is not None and spot_format not in SPOT_MAP_ENCODINGS:
+        return jsonify({"message": f"spot_format must be one of: {', '.join(SPOT_MAP_ENCODINGS)}"}), 400
+    cursor = cursor or 0
+    if fields is None:
+        include_spots = request.args.get("include_spots", "true").lower() not in ("0", "false", "no")
+    else:
+        include_spots = "spots" in fields
+        fields = [name for name in fields if name != "spots"]
+
+    # Spot writes bump this key too, so its version also covers the spots
+    version = data_version(ADMIN_PARKING_LOTS)
+    etag = listing_etag(version, cursor, limit, include_spots, fields, spot_format)
+    unchanged = not_modified(etag)
+    if unchanged is not None:
+        return unchanged
+    page = cache.get_or_set(
+        ADMIN_PARKING_LOTS,
+        lambda: _lot_summaries(cursor, limit),
+        variant=f"{version}:{cursor}:{limit}"
+    )
+    response = Response(stream_with_context(_stream_lots(page["lots"], include_spots, fields, spot_format)), mimetype="application/json")
+    return with_next_cursor(with_etag(response, etag), page["next_cursor"])
+
+def _lot_summaries(cursor, limit):
+    """One query for a page of lots; availability comes from the maintained counters."""
+    query = select(ParkingLot).where(ParkingLot.id > cursor).order_by(ParkingLot.id)
+    if limit is not None:
+        query = query.limit(limit + 1)
+    lots, next_cursor = split_page(read_execute(query).scalars().all(), limit, lambda lot: lot.id)
+    summaries = [{
+        "id": lot.id,
+        "prime_location_name": lot.prime_location_name,
+        "price": lot.price,
+        "address": lot.address,
+        "pin_code": lot.pin_code,
+        "number_of_spots": lot.number_of_spots,
+        "available_spots": lot.available_count
+    } for lot in lots]
+    return {"lots": summaries, "next_cursor": next_cursor}
+
+def _with_key(summary, key):
+    # Reopen a serialized summary to append one more key
+    return summary[:-1] + (", " if summary != "{}" else "") + f'"{key}": '
+
+def _stream_lots(lots, include_spots, fields=None, spot_format=None):
+    """Yield the lot listing as a JSON array, streaming spots straight from the cursor."""
+    dumps = current_app.json.dumps
+    yield "["
+    if not include_spots:
+        for index, lot in enumerate(lots):
+            yield ("," if index else "") + dumps(select_fields(lot, fields))
+        yield "]"
+        return
+
+    if spot_format is not None:
+        vectors = spot_maps.vectors(lots[0]["id"], lots[-1]["id"]) if lots else {}
+        for index, lot in enumerate(lots):
+            spot_map = spot_maps.lot_map(lot["id"], vectors.get(lot["id"], b""), spot_format)
+            yield ("," if index else "") + _with_key(dumps(select_fields(lot, fields)), "spot_map") + dumps(spot_map) + "}"
+        yield "]"
+        return
+
+    spot_rows = iter(())
+    if lots:
+        spot_rows = iter(read_execute(
+            select(ParkingSpot.lot_id, ParkingSpot.id, ParkingSpot.spot_number, ParkingSpot.status)
+            .where(ParkingSpot.lot_id >= lots[0]["id"], ParkingSpot.lot_id <= lots[-1]["id"])
+            .order_by(ParkingSpot.lot_id, ParkingSpot.spot_number)
+            .execution_options(yield_per=1000)
+        ))
+    pending = next(spot_rows, None)
+    for index, lot in enumerate(lots):
+        # "spots" is the last key of a lot, so it is spliced onto the serialized summary
+        yield ("," if index else "") + _with_key(dumps(select_fields(lot, fields)), "spots") + "["
+        first = True
+        while pending is not None and pending.lot_id <= lot["id"]:
+            if pending.lot_id == lot["id"]:
+                yield ("" if first else ",") + dumps({"id": pending.id, "spot_number": pending.spot_number, "status": pending.status})
+                first = False
+            pending = next(spot_rows, None)
+        yield "]}"
+    yield "]"
+
+@admin_bp.route("/parking_lots/<int:lot_id>/spot_map", methods=["GET"])
+@admin_required
+def get_spot_map(lot_id):
+    """Status of every spot of a lot as one compact map (see ``src.utils.spot_maps``).
+
+    ``encoding`` is rle (default) or bitmap. With ``since``, the version of a map
+    the client already holds, only the changed spot numbers are returned; when
+    that version is no longer known the full map is sent instead.
+    """
+    encoding = request.args.get("encoding", "rle")
+    if encoding not in SPOT_MAP_ENCODINGS:
+        return jsonify({"message": f"encoding must be one of: {', '.join(SPOT_MAP_ENCODINGS)}"}), 400
+    since = request.args.get("since")
+
+    vector = spot_maps.vectors(lot_id, lot_id).get(lot_id)
+    if vector is None:
+        if read_execute(select(ParkingLot.id).where(ParkingLot.id == lot_id)).first() is None:
+            return jsonify({"message": "Parking lot not found"}), 404
+        vector = b""
+    etag = listing_etag(version_of(vector), encoding, since)
+    unchanged = not_modified(etag)
+    if unchanged is not None:
+        return unchanged
+    return with_etag(jsonify(spot_maps.lot_map(lot_id, vector, encoding, since)), etag), 200
 
 @admin_bp.route("/parking_lots/<int:lot_id>", methods=["PUT"])
 @admin_required
@@ -84,28 +250,33 @@ def update_parking_lot(lot_id):
         if not isinstance(new_total_spots, int) or new_total_spots <= 0:
             return jsonify({"message": "Number of spots must be a positive integer"}), 400
 
-        current_spots = ParkingSpot.query.filter_by(lot_id=lot.id).order_by(ParkingSpot.spot_number).all()
-        current_spot_count = len(current_spots)
+        current_spot_count, last_spot_number = db.session.execute(
+            select(func.count(ParkingSpot.id), func.coalesce(func.max(ParkingSpot.spot_number), 0)).where(ParkingSpot.lot_id == lot.id)
+        ).one()
 
         if new_total_spots > current_spot_count:
-            last_spot_number = current_spots[-1].spot_number if current_spots else 0
-            for i in range(current_spot_count + 1, new_total_spots + 1):
-                new_spot = ParkingSpot(lot_id=lot.id, spot_number=last_spot_number + (i - current_spot_count), status="A")
-                db.session.add(new_spot)
+            added = insert_spot_range(lot.id, last_spot_number + 1, last_spot_number + new_total_spots - current_spot_count)
+            adjust_lot_counters(lot.id, available=added)
         elif new_total_spots < current_spot_count:
             spots_to_delete_count = current_spot_count - new_total_spots
-            deletable_spots = [spot for spot in reversed(current_spots) if spot.status == "A"]
+            deleted = delete_free_spots(lot.id, spots_to_delete_count)
 
-            if len(deletable_spots) < spots_to_delete_count:
-                return jsonify({"message": f"Cannot reduce to {new_total_spots} spots. Not enough available spots to delete. Required to delete {spots_to_delete_count}, available for deletion: {len(deletable_spots)}."}), 400
-            
-            for i in range(spots_to_delete_count):
-                db.session.delete(deletable_spots[i])
+            if deleted < spots_to_delete_count:
+                db.session.rollback()
+                return jsonify({"message": f"Cannot reduce to {new_total_spots} spots. Not enough available spots to delete. Required to delete {spots_to_delete_count}, available for deletion: {deleted}."}), 400
+            adjust_lot_counters(lot.id, available=-deleted)
         
         lot.number_of_spots = new_total_spots
 
     try:
+        bump_versions(*(SPOT_STATUS_KEYS if "number_of_spots" in data else LOT_DETAILS_KEYS))
         db.session.commit()
+        if "number_of_spots" in data:
+            spot_allocator.rebuild(lot.id)
+            cache.invalidate(*SPOT_STATUS_KEYS)
+            availability_feed.lot_changed(lot.id)
+        else:
+            cache.invalidate(*LOT_DETAILS_KEYS)
         return jsonify({"message": "Parking lot updated successfully"}), 200
     except Exception as e:
         db.session.rollback()
@@ -121,7 +292,11 @@ def delete_parking_lot(lot_id):
     
     try:
         db.session.delete(lot)
+        bump_versions(*SPOT_STATUS_KEYS)
         db.session.commit()
+        spot_allocator.drop_lot(lot_id)
+        cache.invalidate(*SPOT_STATUS_KEYS)
+        availability_feed.lot_changed(lot_id)
         return jsonify({"message": "Parking lot deleted successfully"}), 200
     except Exception as e:
         db.session.rollback()
@@ -145,7 +320,8 @@ def get_parking_spot(spot_id):
                 "reservation_id": reservation.id,
                 "user_id": reservation.user_id,
                 "username": reservation.user.username,
-                "parking_timestamp": reservation.parking_timestamp.isoformat() if reservation.parking_timestamp else None
+                "parking_timestamp": reservation.parking_timestamp.isoformat() if reservation.parking_timestamp else None,
+                "hold_expires_at": reservation.hold_expires_at.isoformat() if reservation.hold_expires_at else None
             }
     return jsonify(spot_data), 200
 
@@ -162,7 +338,12 @@ def delete_parking_spot(spot_id):
             lot.number_of_spots = max(0, lot.number_of_spots - 1)
             
         db.session.delete(spot)
+        adjust_lot_counters(spot.lot_id, available=-1)
+        bump_versions(*SPOT_STATUS_KEYS)
         db.session.commit()
+        spot_allocator.mark_unavailable(spot.lot_id, spot.spot_number)
+        cache.invalidate(*SPOT_STATUS_KEYS)
+        availability_feed.lot_changed(spot.lot_id)
         return jsonify({"message": "Parking spot deleted successfully and lot count updated."}), 200
     except Exception as e:
         db.session.rollback()
@@ -171,20 +352,44 @@ def delete_parking_spot(spot_id):
 @admin_bp.route("/users", methods=["GET"])
 @admin_required
 def get_all_users():
-    users = User.query.all()
-    output = []
-    for user_obj in users: # Renamed user to user_obj to avoid conflict with User model
-        user_data = {"id": user_obj.id, "username": user_obj.username, "role": user_obj.role}
-        output.append(user_data)
-    return jsonify(output), 200
+    """List users by id; ``limit`` and ``cursor`` page through them (all users when ``limit`` is omitted)."""
+    try:
+        limit, cursor = page_args(request.args)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    query = select(User.id, User.username, User.role).where(User.id > (cursor or 0)).order_by(User.id)
+    if limit is not None:
+        query = query.limit(limit + 1)
+    users, next_cursor = split_page(read_execute(query).all(), limit, lambda user: user.id)
+    output = [{"id": user_obj.id, "username": user_obj.username, "role": user_obj.role} for user_obj in users]
+    return with_next_cursor(jsonify(output), next_cursor), 200
+
+SUMMARY_FIELDS = ("total_parking_lots", "total_parking_spots", "total_occupied_spots", "total_available_spots", "occupancy_rate")
 
 @admin_bp.route("/dashboard/summary", methods=["GET"])
 @admin_required
 def admin_dashboard_summary():
-    total_lots = ParkingLot.query.count()
-    total_spots = ParkingSpot.query.count()
-    occupied_spots = ParkingSpot.query.filter_by(status="O").count()
-    available_spots = total_spots - occupied_spots
+    """Totals over every lot; ``fields`` narrows the keys returned. Unchanged totals get a 304."""
+    try:
+        fields = parse_fields(request.args, SUMMARY_FIELDS)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    version = data_version(ADMIN_DASHBOARD_SUMMARY)
+    etag = listing_etag(version, fields)
+    unchanged = not_modified(etag)
+    if unchanged is not None:
+        return unchanged
+    summary = cache.get_or_set(ADMIN_DASHBOARD_SUMMARY, _dashboard_summary, variant=str(version))
+    return with_etag(jsonify(select_fields(summary, fields)), etag), 200
+
+def _dashboard_summary():
+    total_lots, available_spots, occupied_spots = read_execute(select(
+        func.count(ParkingLot.id),
+        func.coalesce(func.sum(ParkingLot.available_count), 0),
+        func.coalesce(func.sum(ParkingLot.occupied_count), 0)
+    )).one()
+    total_spots = available_spots + occupied_spots
     
     summary = {
         "total_parking_lots": total_lots,
@@ -193,5 +398,145 @@ def admin_dashboard_summary():
         "total_available_spots": available_spots,
         "occupancy_rate": (occupied_spots / total_spots * 100) if total_spots > 0 else 0
     }
-    return jsonify(summary), 200
+    return summary
 
+GATE_BATCH_MAX_EVENTS = 500 # Events accepted per gate batch
+GATE_CLOCK_SKEW = datetime.timedelta(minutes=5) # How far a gate's clock may run ahead of ours
+
+@admin_bp.route("/reservations/batch", methods=["POST"])
+@admin_required
+def apply_gate_event_batch():
+    """Apply park/vacate events buffered by gate controllers, in order, in one transaction.
+
+    The body is ``{"events": [{"idempotency_key", "action", "reservation_id", "timestamp"}]}``;
+    ``action`` is park or vacate and ``timestamp`` (ISO, UTC) defaults to now. Every
+    event gets its own result, and an event whose key was seen before returns the
+    stored result instead of being applied again.
+    """
+    data = request.get_json(silent=True) or {}
+    events = data.get("events")
+    if not isinstance(events, list) or not 1 <= len(events) <= GATE_BATCH_MAX_EVENTS:
+        return jsonify({"message": f"events must be a list of 1 to {GATE_BATCH_MAX_EVENTS} events"}), 400
+    now = datetime.datetime.utcnow()
+    parsed = []
+    for index, event in enumerate(events):
+        try:
+            parsed.append(_gate_event(event, now))
+        except ValueError as e:
+            return jsonify({"message": f"Event {index}: {e}"}), 400
+
+    try:
+        results = write_queue.run(apply_gate_events, parsed)
+    except TransitionError as e:
+        return jsonify({"message": e.message}), e.status_code
+    except IntegrityError:
+        return jsonify({"message": "A concurrent batch used the same idempotency keys; retry it"}), 409
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error applying gate events: {e}")
+        return jsonify({"message": "Error applying gate events", "error": str(e)}), 500
+
+    output = [{
+        "idempotency_key": event["key"],
+        "action": event["action"],
+        "reservation_id": event["reservation_id"],
+        "status": status_code,
+        "replayed": replayed,
+        **body
+    } for event, (status_code, body, replayed) in zip(parsed, results)]
+    return jsonify({
+        "applied": sum(1 for item in output if item["status"] == 200 and not item["replayed"]),
+        "failed": sum(1 for item in output if item["status"] != 200 and not item["replayed"]),
+        "replayed": sum(1 for item in output if item["replayed"]),
+        "results": output
+    }), 200
+
+def _gate_event(event, now):
+    if not isinstance(event, dict):
+        raise ValueError("must be an object")
+    key = event.get("idempotency_key")
+    if not isinstance(key, str) or not 1 <= len(key) <= 100:
+        raise ValueError("idempotency_key must be a string of 1 to 100 characters")
+    if event.get("action") not in GATE_ACTIONS:
+        raise ValueError(f"action must be one of {', '.join(GATE_ACTIONS)}")
+    reservation_id = event.get("reservation_id")
+    if isinstance(reservation_id, bool) or not isinstance(reservation_id, int):
+        raise ValueError("reservation_id must be an integer")
+
+    timestamp = now
+    if event.get("timestamp") is not None:
+        try:
+            timestamp = datetime.datetime.fromisoformat(event["timestamp"])
+        except (TypeError, ValueError):
+            raise ValueError("timestamp must be an ISO datetime")
+        if timestamp.tzinfo is not None:
+            timestamp = timestamp.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        if timestamp > now + GATE_CLOCK_SKEW:
+            raise ValueError("timestamp is in the future")
+    return {"key": key, "action": event["action"], "reservation_id": reservation_id, "timestamp": timestamp}
+
+ANALYTICS_DEFAULT_DAYS = 7
+ANALYTICS_MAX_DAYS = 366 # Longest range served by one analytics request
+
+@admin_bp.route("/analytics/occupancy", methods=["GET"])
+@admin_required
+def occupancy_analytics():
+    """Hourly or daily occupancy, revenue and visits per lot from the rollup buckets.
+
+    ``from``/``to`` bound the bucket start times (default: the last 7 days),
+    ``granularity`` is ``hour`` or ``day`` and ``lot_id`` narrows to one lot.
+    """
+    try:
+        granularity = request.args.get("granularity", "hour")
+        if granularity not in ("hour", "day"):
+            raise ValueError("granularity must be hour or day")
+        lot_id = request.args.get("lot_id", type=int)
+        end = _analytics_time(request.args.get("to"), "to") or floor_hour(datetime.datetime.utcnow()) + datetime.timedelta(hours=1)
+        start = _analytics_time(request.args.get("from"), "from") or end - datetime.timedelta(days=ANALYTICS_DEFAULT_DAYS)
+        if start >= end:
+            raise ValueError("from must be before to")
+        if end - start > datetime.timedelta(days=ANALYTICS_MAX_DAYS):
+            raise ValueError(f"range must not exceed {ANALYTICS_MAX_DAYS} days")
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    try:
+        watermark = current_watermark()
+        return jsonify({
+            "granularity": granularity,
+            "from": start.isoformat(),
+            "to": end.isoformat(),
+            "rolled_up_to": watermark.isoformat() if watermark else None,
+            "series": occupancy_series(start, end, lot_id, granularity)
+        }), 200
+    except Exception as e:
+        return jsonify({"message": "An error occurred", "error": str(e)}), 500
+
+def _analytics_time(value, name):
+    if not value:
+        return None
+    try:
+        return datetime.datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an ISO date or datetime")
+
+@admin_bp.route("/cache/stats", methods=["GET"])
+@admin_required
+def cache_stats():
+    return jsonify(cache.stats()), 200
+
+@admin_bp.route("/metrics", methods=["PUT"])
+@admin_required
+def toggle_metrics():
+    data = request.get_json()
+    if not isinstance(data.get("enabled"), bool):
+        return jsonify({"message": "enabled must be true or false"}), 400
+    metrics.enabled = data["enabled"]
+    if data.get("reset"):
+        metrics.reset()
+    return jsonify({"enabled": metrics.enabled}), 200
+
+@admin_bp.route("/metrics/slow_requests", methods=["GET"])
+@admin_required
+def slow_requests():
+    return jsonify(list(metrics.slow_samples)), 200
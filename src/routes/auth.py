@@ -2,12 +2,11 @@ from flask import Blueprint, request, jsonify
 from src.extensions import db, jwt # Import db and jwt from extensions.py
 from src.models.models import User
 from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required, get_jwt_identity, get_jwt
+from src.utils.token_blocklist import token_blocklist
+from src.utils.identity import identity_cache, identity_claims
 
 auth_bp = Blueprint("auth_bp", __name__)
 
-# In-memory set to store revoked tokens (for a simple blacklist)
-# For production, a more persistent solution like Redis would be better.
-revoked_tokens = set()
 
 @auth_bp.route("/register", methods=["POST"])
 def register():
@@ -40,8 +39,8 @@ def login():
     user = User.query.filter_by(username=username).first()
 
     if user and user.check_password(password):
-        # Set identity to be the username (string) and add role to additional_claims
-        additional_claims = {"role": user.role}
+        # Set identity to be the username (string) and add role and user_id to additional_claims
+        additional_claims = identity_claims(user)
         access_token = create_access_token(identity=user.username, additional_claims=additional_claims)
         refresh_token = create_refresh_token(identity=user.username, additional_claims=additional_claims)
         return jsonify(access_token=access_token, refresh_token=refresh_token), 200
@@ -52,19 +51,20 @@ def login():
 @jwt_required(refresh=True)
 def refresh():
     username = get_jwt_identity()
-    role = get_jwt().get("role")
-    user = User.query.filter_by(username=username).first()
+    user_id = get_jwt().get("user_id")
+    user = identity_cache.get(user_id) if user_id is not None else identity_cache.get_by_username(username)
     if not user:
         return jsonify({"message": "User not found for token refresh"}), 404
-    additional_claims = {"role": role}
-    new_access_token = create_access_token(identity=username, additional_claims=additional_claims)
+    additional_claims = identity_claims(user)
+    new_access_token = create_access_token(identity=user.username, additional_claims=additional_claims)
     return jsonify(access_token=new_access_token), 200
 
 @auth_bp.route("/logout", methods=["POST"])
 @jwt_required()
 def logout():
-    JWT_ID = get_jwt()["jti"] # jti is "JWT ID", a unique identifier for aś JWT.
-    revoked_tokens.add(JWT_ID)
+    jwt_payload = get_jwt()
+    # jti is "JWT ID", a unique identifier for a JWT; the entry is kept until the token expires
+    token_blocklist.revoke(jwt_payload["jti"], jwt_payload["exp"])
     return jsonify({"message": "Successfully logged out"}), 200
 
 # JWT error handlers are registered with the JWTManager instance (jwt from extensions.py)
@@ -91,8 +91,7 @@ def missing_token_callback(error):
 
 @jwt.token_in_blocklist_loader
 def check_if_token_in_blocklist(jwt_header, jwt_payload):
-    jti = jwt_payload["jti"]
-    return jti in revoked_tokens
+    return token_blocklist.is_revoked(jwt_payload["jti"])
 
 @jwt.revoked_token_loader
 def revoked_token_callback(jwt_header, jwt_payload):
@@ -1,33 +1,91 @@
-from flask import Blueprint, request, jsonify, send_file, current_app
+from flask import Blueprint, request, jsonify, send_file, current_app, Response, stream_with_context, url_for
 from src.extensions import db # Import db from extensions.py
-from src.models.models import ParkingLot, ParkingSpot, User, Reservation
+from src.models.models import ParkingLot, ParkingSpot, User, Reservation, UserStats
 from src.utils.decorators import user_required # Assuming user_required decorator
+from src.utils.cache import cache, USER_PARKING_LOTS
+from src.utils.data_versions import data_version
+from src.utils.reservations import TransitionError, book_spot, park_reservation, vacate_reservation
+from src.utils.write_queue import write_queue
+from src.utils.availability import availability_feed
+from src.utils.exports import export_error_path, export_path, iter_csv, reservation_count, reservation_history_rows
+from src.utils.identity import current_user_id
+from src.utils.database import read_execute
+from src.utils.http_cache import listing_etag, not_modified, parse_fields, select_fields, with_etag
+from src.utils.pagination import page_args, split_page, with_next_cursor
+from src.utils.archive import RESERVATION_MODELS
 from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import and_, null, or_, select
+from itertools import islice
 import datetime
-import io
-import csv
+import heapq
+import os
 
 user_routes_bp = Blueprint("user_routes_bp", __name__)
 
+HISTORY_PAGE_SIZE = 50 # Default page size of the reservation history
+HISTORY_STATUSES = ("booked", "active", "completed", "expired")
+LOT_FIELDS = ("id", "prime_location_name", "price_per_hour", "address", "pin_code", "available_spots", "total_spots") # Keys a lot listing can be narrowed to with fields=
+
 @user_routes_bp.route("/parking_lots", methods=["GET"])
 @user_required
 def get_available_parking_lots():
-    lots = ParkingLot.query.all()
+    """Lots with free spots; ``fields`` narrows the keys returned. Unchanged listings get a 304."""
+    try:
+        fields = parse_fields(request.args, LOT_FIELDS)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    version = data_version(USER_PARKING_LOTS)
+    etag = listing_etag(version, fields)
+    unchanged = not_modified(etag)
+    if unchanged is not None:
+        return unchanged
+    lots = cache.get_or_set(USER_PARKING_LOTS, _available_parking_lots, variant=str(version))
+    if fields is not None:
+        lots = [select_fields(lot, fields) for lot in lots]
+    return with_etag(jsonify(lots), etag), 200
+
+def _available_parking_lots():
+    lots = read_execute(select(ParkingLot).where(ParkingLot.available_count > 0)).scalars().all() # Only show lots with available spots
     output = []
     for lot in lots:
-        available_spots_count = ParkingSpot.query.filter_by(lot_id=lot.id, status="A").count()
-        if available_spots_count > 0: # Only show lots with available spots
-            lot_data = {
-                "id": lot.id,
-                "prime_location_name": lot.prime_location_name,
-                "price_per_hour": lot.price, # Assuming price is per hour, clarify if different
-                "address": lot.address,
-                "pin_code": lot.pin_code,
-                "available_spots": available_spots_count,
-                "total_spots": lot.number_of_spots
-            }
-            output.append(lot_data)
-    return jsonify(output), 200
+        lot_data = {
+            "id": lot.id,
+            "prime_location_name": lot.prime_location_name,
+            "price_per_hour": lot.price, # Assuming price is per hour, clarify if different
+            "address": lot.address,
+            "pin_code": lot.pin_code,
+            "available_spots": lot.available_count,
+            "total_spots": lot.number_of_spots
+        }
+        output.append(lot_data)
+    return output
+
+@user_routes_bp.route("/parking_lots/stream", methods=["GET"])
+@user_required
+def stream_lot_availability():
+    """Server-Sent Events stream of lot availability, replacing polling of ``/parking_lots``.
+
+    A ``snapshot`` event with every lot comes first, unless the ``Last-Event-ID``
+    header (or ``last_event_id`` parameter) can be resumed from; ``availability``
+    events then carry the lots changed since. ``lot_id`` (comma-separated) narrows
+    the stream to some lots.
+    """
+    if not availability_feed.enabled:
+        return jsonify({"message": "Availability stream is disabled"}), 404
+    try:
+        last_event_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+        last_event_id = int(last_event_id) if last_event_id else None
+        lot_ids = request.args.get("lot_id")
+        lot_ids = {int(lot_id) for lot_id in lot_ids.split(",") if lot_id.strip()} if lot_ids else None
+    except ValueError:
+        return jsonify({"message": "Last-Event-ID and lot_id must be integers"}), 400
+
+    # The stream can stay open for minutes; it must not keep this request's connection checked out
+    db.session.close()
+    response = Response(availability_feed.stream(last_event_id, lot_ids), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no" # Keep reverse proxies from buffering events
+    return response
 
 @user_routes_bp.route("/reservations", methods=["POST"])
 @user_required
@@ -36,184 +94,293 @@ def book_parking_spot():
     lot_id = data.get("lot_id")
     if not lot_id:
         return jsonify({"message": "lot_id is required"}), 400
+    try:
+        lot_id = int(lot_id)
+    except (TypeError, ValueError):
+        return jsonify({"message": "lot_id must be an integer"}), 400
 
-    current_user_username = get_jwt_identity() # This is now a string (username)
-    user = User.query.filter_by(username=current_user_username).first()
-    if not user:
+    user_id = current_user_id() # Taken from the token's claims, no user lookup
+    if user_id is None:
         return jsonify({"message": "User not found"}), 404
 
-    available_spot = ParkingSpot.query.filter_by(lot_id=lot_id, status="A").order_by(ParkingSpot.spot_number).first()
-
-    if not available_spot:
-        return jsonify({"message": "No available parking spots in this lot"}), 404
-
     try:
-        new_reservation = Reservation(
-            spot_id=available_spot.id,
-            user_id=user.id
-        )
-        db.session.add(new_reservation)
-        db.session.commit()
-        return jsonify({"message": "Parking spot reserved. Please proceed to park and confirm.", 
-                        "reservation_id": new_reservation.id, 
-                        "spot_id": available_spot.id,
-                        "spot_number": available_spot.spot_number,
-                        "lot_id": lot_id
-                        }), 201
+        booking = write_queue.run(book_spot, user_id, lot_id)
+    except TransitionError as e:
+        return jsonify({"message": e.message}), e.status_code
     except Exception as e:
         db.session.rollback()
         current_app.logger.error(f"Error creating reservation: {e}")
         return jsonify({"message": "Error creating reservation", "error": str(e)}), 500
+    return jsonify({"message": "Parking spot reserved. Please proceed to park and confirm.", 
+                    "reservation_id": booking["reservation_id"], 
+                    "spot_id": booking["spot_id"],
+                    "spot_number": booking["spot_number"],
+                    "lot_id": lot_id,
+                    "hold_expires_at": booking["hold_expires_at"]
+                    }), 201
+
+@user_routes_bp.route("/reservations", methods=["GET"])
+@user_required
+def get_reservation_history():
+    """Page through the user's reservations, newest first.
+
+    Query parameters: ``limit`` (default 50), ``cursor`` (id of the last
+    reservation of the previous page), ``status`` (comma-separated booked, active,
+    completed and/or expired) and ``from``/``to`` (ISO dates or datetimes bounding the
+    parking time, ``to`` exclusive). The next cursor is returned in the
+    ``X-Next-Cursor`` header.
+    """
+    user_id = current_user_id() # Taken from the token's claims, no user lookup
+    if user_id is None:
+        return jsonify({"message": "User not found"}), 404
+
+    try:
+        limit, cursor = page_args(request.args, default_limit=HISTORY_PAGE_SIZE)
+        statuses = _history_statuses(request.args.get("status"))
+        parked_from = _history_time(request.args.get("from"), "from")
+        parked_to = _history_time(request.args.get("to"), "to")
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    reservations, next_cursor = _reservation_history_page(user_id, cursor, limit, statuses, parked_from, parked_to)
+    return with_next_cursor(jsonify(reservations), next_cursor), 200
+
+def _history_statuses(value):
+    if not value:
+        return None
+    statuses = {status.strip() for status in value.split(",") if status.strip()}
+    unknown = statuses - set(HISTORY_STATUSES)
+    if unknown:
+        raise ValueError(f"status must be one of {', '.join(HISTORY_STATUSES)}")
+    return statuses
+
+def _history_time(value, name):
+    if not value:
+        return None
+    try:
+        return datetime.datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an ISO date or datetime")
+
+def _history_status(row):
+    if row.leaving_timestamp:
+        return "completed" if row.parking_timestamp else "expired"
+    return "active" if row.parking_timestamp else "booked"
+
+def _history_query(model, user_id, cursor, limit, statuses, parked_from, parked_to):
+    query = (
+        select(
+            model.id,
+            model.spot_id,
+            model.parking_timestamp,
+            model.leaving_timestamp,
+            # Archived reservations are closed, so they hold nothing
+            model.hold_expires_at if model is Reservation else null().label("hold_expires_at"),
+            model.parking_cost,
+            ParkingSpot.spot_number,
+            ParkingSpot.lot_id,
+            ParkingLot.prime_location_name
+        )
+        .outerjoin(ParkingSpot, ParkingSpot.id == model.spot_id)
+        .outerjoin(ParkingLot, ParkingLot.id == ParkingSpot.lot_id)
+        .where(model.user_id == user_id)
+        .order_by(model.id.desc())
+        .limit(limit + 1)
+    )
+    if cursor is not None:
+        query = query.where(model.id < cursor)
+    if statuses:
+        conditions = {
+            "booked": and_(model.parking_timestamp.is_(None), model.leaving_timestamp.is_(None)),
+            "active": and_(model.parking_timestamp.isnot(None), model.leaving_timestamp.is_(None)),
+            "completed": and_(model.parking_timestamp.isnot(None), model.leaving_timestamp.isnot(None)),
+            "expired": and_(model.parking_timestamp.is_(None), model.leaving_timestamp.isnot(None))
+        }
+        query = query.where(or_(*(conditions[status] for status in statuses)))
+    if parked_from is not None:
+        query = query.where(model.parking_timestamp >= parked_from)
+    if parked_to is not None:
+        query = query.where(model.parking_timestamp < parked_to)
+    return query
+
+def _reservation_history_page(user_id, cursor, limit, statuses, parked_from, parked_to):
+    """One keyset query over (user_id, id) per table; deep pages seek straight to the cursor.
+
+    Live and archived reservations are fetched a page each and merged by id.
+    """
+    pages = [read_execute(_history_query(model, user_id, cursor, limit, statuses, parked_from, parked_to)).all() for model in RESERVATION_MODELS]
+    merged = list(islice(heapq.merge(*pages, key=lambda row: row.id, reverse=True), limit + 1))
+    rows, next_cursor = split_page(merged, limit, lambda row: row.id)
+    reservations = [{
+        "id": row.id,
+        "spot_id": row.spot_id,
+        "spot_number": row.spot_number,
+        "lot_id": row.lot_id,
+        "lot_name": row.prime_location_name,
+        "parking_timestamp": row.parking_timestamp.isoformat() if row.parking_timestamp else None,
+        "leaving_timestamp": row.leaving_timestamp.isoformat() if row.leaving_timestamp else None,
+        "hold_expires_at": row.hold_expires_at.isoformat() if row.hold_expires_at else None,
+        "parking_cost": row.parking_cost,
+        "status": _history_status(row)
+    } for row in rows]
+    return reservations, next_cursor
 
 @user_routes_bp.route("/reservations/<int:reservation_id>/park", methods=["PUT"])
 @user_required
 def mark_spot_occupied(reservation_id):
-    reservation = Reservation.query.get_or_404(reservation_id)
-    current_user_username = get_jwt_identity() # This is now a string (username)
-    user = User.query.filter_by(username=current_user_username).first()
-
-    if reservation.user_id != user.id:
-        return jsonify({"message": "Unauthorized to modify this reservation"}), 403
-    
-    if reservation.parking_timestamp:
-        return jsonify({"message": "Vehicle already marked as parked for this reservation"}), 400
-
-    spot = ParkingSpot.query.get(reservation.spot_id)
-    if not spot:
-         return jsonify({"message": "Associated parking spot not found"}), 404
-    if spot.status == "O":
-        pass 
-
+    user_id = current_user_id() # Taken from the token's claims, no user lookup
     try:
-        spot.status = "O"
-        reservation.parking_timestamp = datetime.datetime.utcnow()
-        db.session.commit()
-        return jsonify({"message": "Vehicle parked successfully. Spot status updated to Occupied.", "parking_timestamp": reservation.parking_timestamp.isoformat()}), 200
+        parked = write_queue.run(park_reservation, reservation_id, user_id)
+    except TransitionError as e:
+        return jsonify({"message": e.message}), e.status_code
     except Exception as e:
         db.session.rollback()
         current_app.logger.error(f"Error marking spot as occupied: {e}")
         return jsonify({"message": "Error marking spot as occupied", "error": str(e)}), 500
+    return jsonify({"message": "Vehicle parked successfully. Spot status updated to Occupied.", "parking_timestamp": parked["parking_timestamp"]}), 200
 
 @user_routes_bp.route("/reservations/<int:reservation_id>/vacate", methods=["PUT"])
 @user_required
 def mark_spot_vacated(reservation_id):
-    reservation = Reservation.query.get_or_404(reservation_id)
-    current_user_username = get_jwt_identity() # This is now a string (username)
-    user = User.query.filter_by(username=current_user_username).first()
-
-    if reservation.user_id != user.id:
-        return jsonify({"message": "Unauthorized to modify this reservation"}), 403
-
-    if not reservation.parking_timestamp:
-        return jsonify({"message": "Vehicle was never marked as parked for this reservation"}), 400
-    
-    if reservation.leaving_timestamp:
-        return jsonify({"message": "Vehicle already marked as vacated for this reservation"}), 400
-
-    spot = ParkingSpot.query.get(reservation.spot_id)
-    if not spot:
-         return jsonify({"message": "Associated parking spot not found"}), 404
-
+    user_id = current_user_id() # Taken from the token's claims, no user lookup
     try:
-        spot.status = "A"
-        reservation.leaving_timestamp = datetime.datetime.utcnow()
-        
-        parking_duration_seconds = (reservation.leaving_timestamp - reservation.parking_timestamp).total_seconds()
-        parking_duration_hours = parking_duration_seconds / 3600
-        
-        lot = ParkingLot.query.get(spot.lot_id)
-        price_per_hour = lot.price if lot else 0
-        
-        reservation.parking_cost = parking_duration_hours * price_per_hour
-        reservation.parking_cost = round(max(0, reservation.parking_cost), 2) 
-
-        db.session.commit()
-        return jsonify({
-            "message": "Vehicle vacated successfully. Spot status updated to Available.", 
-            "leaving_timestamp": reservation.leaving_timestamp.isoformat(),
-            "parking_duration_hours": round(parking_duration_hours, 2),
-            "parking_cost": reservation.parking_cost
-        }), 200
+        vacated = write_queue.run(vacate_reservation, reservation_id, user_id)
+    except TransitionError as e:
+        return jsonify({"message": e.message}), e.status_code
     except Exception as e:
         db.session.rollback()
         current_app.logger.error(f"Error marking spot as vacated: {e}")
         return jsonify({"message": "Error marking spot as vacated", "error": str(e)}), 500
+    return jsonify({
+        "message": "Vehicle vacated successfully. Spot status updated to Available.", 
+        **vacated
+    }), 200
 
 @user_routes_bp.route("/dashboard/summary", methods=["GET"])
 @user_required
 def user_dashboard_summary():
-    current_user_username = get_jwt_identity() # This is now a string (username)
-    user = User.query.filter_by(username=current_user_username).first()
-    if not user:
+    user_id = current_user_id() # Taken from the token's claims, no user lookup
+    if user_id is None:
         return jsonify({"message": "User not found"}), 404
 
-    reservations = Reservation.query.filter_by(user_id=user.id).all()
-    total_bookings = len(reservations)
-    total_spent = sum(r.parking_cost for r in reservations if r.parking_cost is not None)
-    
-    active_reservation = Reservation.query.filter(Reservation.user_id == user.id, Reservation.leaving_timestamp.is_(None), Reservation.parking_timestamp.isnot(None)).first()
+    # One indexed read of the maintained aggregates, joined to the active reservation
+    stats = read_execute(
+        select(
+            UserStats.total_bookings,
+            UserStats.total_spent,
+            UserStats.minutes_parked,
+            UserStats.last_visit,
+            Reservation.id.label("reservation_id"),
+            Reservation.spot_id,
+            Reservation.parking_timestamp,
+            ParkingSpot.spot_number,
+            ParkingLot.prime_location_name
+        )
+        .select_from(UserStats)
+        .outerjoin(Reservation, Reservation.id == UserStats.active_reservation_id)
+        .outerjoin(ParkingSpot, ParkingSpot.id == Reservation.spot_id)
+        .outerjoin(ParkingLot, ParkingLot.id == ParkingSpot.lot_id)
+        .where(UserStats.user_id == user_id)
+    ).first()
+    if stats is None:
+        return jsonify({"total_bookings": 0, "total_amount_spent": 0, "total_minutes_parked": 0, "last_visit": None, "active_reservation": None}), 200
+
     active_reservation_details = None
-    if active_reservation:
-        spot = ParkingSpot.query.get(active_reservation.spot_id)
-        lot = ParkingLot.query.get(spot.lot_id) if spot else None
+    if stats.reservation_id is not None:
         active_reservation_details = {
-            "reservation_id": active_reservation.id,
-            "spot_id": active_reservation.spot_id,
-            "spot_number": spot.spot_number if spot else "N/A",
-            "lot_name": lot.prime_location_name if lot else "N/A",
-            "parking_timestamp": active_reservation.parking_timestamp.isoformat()
+            "reservation_id": stats.reservation_id,
+            "spot_id": stats.spot_id,
+            "spot_number": stats.spot_number if stats.spot_number is not None else "N/A",
+            "lot_name": stats.prime_location_name if stats.prime_location_name is not None else "N/A",
+            "parking_timestamp": stats.parking_timestamp.isoformat()
         }
 
     return jsonify({
-        "total_bookings": total_bookings,
-        "total_amount_spent": round(total_spent, 2),
+        "total_bookings": stats.total_bookings,
+        "total_amount_spent": round(stats.total_spent, 2),
+        "total_minutes_parked": round(stats.minutes_parked, 1),
+        "last_visit": stats.last_visit.isoformat() if stats.last_visit else None,
         "active_reservation": active_reservation_details
     }), 200
 
 @user_routes_bp.route("/export_reservations_csv", methods=["GET"])
 @user_required
 def export_reservations_csv():
-    current_user_username = get_jwt_identity() # This is now a string (username)
-    user = User.query.filter_by(username=current_user_username).first()
-    if not user:
+    user_id = current_user_id() # Taken from the token's claims, no user lookup
+    if user_id is None:
         return jsonify({"message": "User not found"}), 404
 
-    reservations = Reservation.query.filter_by(user_id=user.id).order_by(Reservation.parking_timestamp.desc()).all()
-
-    if not reservations:
+    total = reservation_count(user_id) # Archived reservations are exported too
+    if not total:
         return jsonify({"message": "No reservation history found for this user."}), 404
 
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    writer.writerow(["Reservation ID", "Lot Name", "Spot Number", "Parking Timestamp", "Leaving Timestamp", "Duration (Hours)", "Cost", "Address", "PIN Code"])
-    
-    for res in reservations:
-        spot = ParkingSpot.query.get(res.spot_id)
-        lot = ParkingLot.query.get(spot.lot_id) if spot else None
-        duration_hours = "N/A"
-        if res.parking_timestamp and res.leaving_timestamp:
-            duration_seconds = (res.leaving_timestamp - res.parking_timestamp).total_seconds()
-            duration_hours = round(duration_seconds / 3600, 2)
-
-        writer.writerow([
-            res.id,
-            lot.prime_location_name if lot else "N/A",
-            spot.spot_number if spot else "N/A",
-            res.parking_timestamp.isoformat() if res.parking_timestamp else "N/A",
-            res.leaving_timestamp.isoformat() if res.leaving_timestamp else "N/A",
-            duration_hours,
-            res.parking_cost if res.parking_cost is not None else "N/A",
-            lot.address if lot else "N/A",
-            lot.pin_code if lot else "N/A"
-        ])
-    
-    output.seek(0)
-    
+    if total > current_app.config["CSV_EXPORT_INLINE_LIMIT"]:
+        try:
+            job = _export_task().delay(user_id)
+            return jsonify({
+                "message": "Export started. Poll the status URL until it is ready.",
+                "job_id": job.id,
+                "status_url": url_for("user_routes_bp.export_status", job_id=job.id)
+            }), 202
+        except Exception as e:
+            # Without a reachable broker the export is still served, just inline
+            current_app.logger.warning(f"Could not queue CSV export, streaming it instead: {e}")
+
+    return Response(
+        stream_with_context(iter_csv(reservation_history_rows(user_id))),
+        mimetype="text/csv",
+        headers={"Content-Disposition": f"attachment; filename={get_jwt_identity()}_parking_history.csv"}
+    )
+
+def _export_task():
+    # Celery is loaded on the first queued export rather than when the worker starts
+    from src.celery_app import get_celery
+    from src.tasks.exports import export_reservations_csv_task
+    get_celery(current_app)
+    return export_reservations_csv_task
+
+@user_routes_bp.route("/exports/<job_id>", methods=["GET"])
+@user_required
+def export_status(job_id):
+    user_id = current_user_id() # Taken from the token's claims, no user lookup
+    if user_id is None:
+        return jsonify({"message": "User not found"}), 404
+
+    if os.path.exists(export_path(user_id, job_id)):
+        return jsonify({
+            "job_id": job_id,
+            "status": "SUCCESS",
+            "download_url": url_for("user_routes_bp.download_export", job_id=job_id)
+        }), 200
+
+    error_path = export_error_path(user_id, job_id)
+    if os.path.exists(error_path):
+        with open(error_path, encoding="utf-8") as error_file:
+            error = error_file.read()
+        return jsonify({"job_id": job_id, "status": "FAILURE", "message": "Export failed", "error": error}), 200
+
+    result = _export_task().AsyncResult(job_id)
+    if result.state == "SUCCESS":
+        # Finished, but the file belongs to someone else (or was cleaned up)
+        return jsonify({"message": "Export not found"}), 404
+    if result.state == "FAILURE":
+        # Failed before it could leave a marker, e.g. the worker could not write to the export directory
+        return jsonify({"job_id": job_id, "status": "FAILURE", "message": "Export failed", "error": str(result.result)}), 200
+    return jsonify({"job_id": job_id, "status": result.state}), 200
+
+@user_routes_bp.route("/exports/<job_id>/download", methods=["GET"])
+@user_required
+def download_export(job_id):
+    user_id = current_user_id() # Taken from the token's claims, no user lookup
+    if user_id is None:
+        return jsonify({"message": "User not found"}), 404
+
+    path = export_path(user_id, job_id)
+    if not os.path.exists(path):
+        return jsonify({"message": "Export not found or not ready yet"}), 404
     return send_file(
-        io.BytesIO(output.getvalue().encode("utf-8")),
+        path,
         mimetype="text/csv",
         as_attachment=True,
-        download_name=f"{user.username}_parking_history.csv"
+        download_name=f"{get_jwt_identity()}_parking_history.csv"
     )
-
@@ -0,0 +1,10 @@
+from celery import shared_task
+from flask import current_app
+
+from src.utils.analytics import rollup_occupancy
+
+
+@shared_task
+def rollup_occupancy_task():
+    """Fold reservations closed since the last run into the hourly occupancy buckets (run by celery beat)."""
+    return rollup_occupancy(lag_seconds=current_app.config["ANALYTICS_ROLLUP_LAG_SECONDS"])
@@ -0,0 +1,15 @@
+import datetime
+
+from celery import shared_task
+from flask import current_app
+
+from src.utils.archive import archive_reservations
+
+
+@shared_task
+def archive_reservations_task():
+    """Move reservations closed longer ago than RESERVATION_ARCHIVE_AFTER_DAYS to the history table (run by celery beat)."""
+    return archive_reservations(
+        datetime.timedelta(days=current_app.config["RESERVATION_ARCHIVE_AFTER_DAYS"]),
+        batch_size=current_app.config["RESERVATION_ARCHIVE_BATCH_SIZE"]
+    )
@@ -0,0 +1,30 @@
+import os
+
+from celery import shared_task
+
+from src.utils.exports import export_error_path, export_path, iter_csv, reservation_history_rows
+
+
+@shared_task(bind=True, ignore_result=False)
+def export_reservations_csv_task(self, user_id):
+    """Write a user's reservation history to disk in chunks and return the file path.
+
+    On failure an error marker holding the message is left in place of the file,
+    for the status endpoint to report.
+    """
+    path = export_path(user_id, self.request.id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial_path = path + ".part"
+    try:
+        with open(partial_path, "w", newline="", encoding="utf-8") as export_file:
+            for chunk in iter_csv(reservation_history_rows(user_id)):
+                export_file.write(chunk)
+        # Only a complete file is ever visible under the final name
+        os.replace(partial_path, path)
+    except Exception as e:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        with open(export_error_path(user_id, self.request.id), "w", encoding="utf-8") as error_file:
+            error_file.write(str(e) or type(e).__name__)
+        raise
+    return path
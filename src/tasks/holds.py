@@ -0,0 +1,9 @@
+from celery import shared_task
+
+from src.utils.holds import sweep_expired_holds
+
+
+@shared_task
+def expire_holds_task():
+    """Expire lapsed reservation holds the in-process sweeper has not handled (run by celery beat)."""
+    return sweep_expired_holds()
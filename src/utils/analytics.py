@@ -0,0 +1,222 @@
+"""Hourly per-lot occupancy rollup and the time series read from it.
+
+``rollup_occupancy`` folds reservations closed since the stored watermark into
+``occupancy_hourly`` buckets, one time window per transaction. The watermark is
+a closing time (``closed_at``, set by the server when a reservation is closed):
+every reservation closed at or before it has been counted. Gate controllers may
+replay a vacate whose leaving time is long past, but it is still closed after
+the watermark. A short lag keeps the rollup behind reservations that are still
+committing.
+"""
+import datetime
+
+from sqlalchemy import bindparam, delete, func, select, update
+
+from src.extensions import db
+from src.models.models import OccupancyHourly, ParkingLot, ParkingSpot, RollupWatermark
+from src.utils.archive import RESERVATION_MODELS, across_tables
+from src.utils.database import read_execute
+
+WATERMARK = "occupancy_hourly"
+HOUR = datetime.timedelta(hours=1)
+EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def floor_hour(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def fold_intervals(rows, buckets=None):
+    """Spread ``(lot_id, parked_at, left_at, cost)`` rows over hourly buckets.
+
+    Returns ``{(lot_id, epoch_hour): [occupied_minutes, revenue, visits]}``. Revenue
+    is split in proportion to the time parked in each hour; a zero-length stay
+    puts its whole cost in the hour it started. Times are folded as plain epoch
+    seconds, which keeps the per-hour loop free of datetime arithmetic.
+    """
+    buckets = {} if buckets is None else buckets
+    for lot_id, parked_at, left_at, cost in rows:
+        start = (parked_at - EPOCH).total_seconds()
+        end = (left_at - EPOCH).total_seconds()
+        hour = int(start // 3600)
+        entry = buckets.get((lot_id, hour))
+        if entry is None:
+            entry = buckets[(lot_id, hour)] = [0.0, 0.0, 0]
+        entry[2] += 1
+
+        if end <= start:
+            entry[1] += cost or 0.0
+            continue
+        rate = (cost or 0.0) / (end - start)
+        while True:
+            boundary = (hour + 1) * 3600
+            slice_end = boundary if boundary < end else end
+            seconds = slice_end - start
+            entry[0] += seconds / 60
+            entry[1] += seconds * rate
+            if boundary >= end:
+                break
+            hour += 1
+            start = boundary
+            entry = buckets.get((lot_id, hour))
+            if entry is None:
+                entry = buckets[(lot_id, hour)] = [0.0, 0.0, 0]
+    return buckets
+
+
+def _merge_buckets(buckets):
+    """Add folded deltas to the stored buckets: one read of the touched range, then bulk writes."""
+    if not buckets:
+        return
+    lot_ids = {lot_id for lot_id, _ in buckets}
+    hours = [hour for _, hour in buckets]
+    first_hour, last_hour = min(hours), max(hours)
+    existing = {
+        (row.lot_id, int((row.hour - EPOCH).total_seconds()) // 3600): row
+        for row in db.session.execute(
+            select(OccupancyHourly.lot_id, OccupancyHourly.hour, OccupancyHourly.occupied_minutes, OccupancyHourly.revenue, OccupancyHourly.visits)
+            .where(
+                OccupancyHourly.lot_id.in_(lot_ids),
+                OccupancyHourly.hour >= EPOCH + first_hour * HOUR,
+                OccupancyHourly.hour <= EPOCH + last_hour * HOUR
+            )
+        )
+    }
+    inserts, updates = [], []
+    for (lot_id, hour), (minutes, revenue, visits) in buckets.items():
+        current = existing.get((lot_id, hour))
+        if current is None:
+            start = EPOCH + hour * HOUR
+            inserts.append({"lot_id": lot_id, "hour": start, "day": start.date(), "occupied_minutes": minutes, "revenue": revenue, "visits": visits})
+        else:
+            updates.append({
+                "b_lot_id": lot_id, "b_hour": current.hour,
+                "occupied_minutes": current.occupied_minutes + minutes,
+                "revenue": current.revenue + revenue,
+                "visits": current.visits + visits
+            })
+    table = OccupancyHourly.__table__
+    if inserts:
+        db.session.execute(table.insert(), inserts)
+    if updates:
+        db.session.execute(
+            table.update().where(table.c.lot_id == bindparam("b_lot_id"), table.c.hour == bindparam("b_hour")),
+            updates
+        )
+
+
+def current_watermark():
+    return db.session.execute(select(RollupWatermark.value).where(RollupWatermark.name == WATERMARK)).scalar()
+
+
+def reset_occupancy_rollup():
+    """Drop every bucket and the watermark so the next rollup refolds all history."""
+    db.session.execute(delete(OccupancyHourly))
+    db.session.execute(delete(RollupWatermark).where(RollupWatermark.name == WATERMARK))
+    db.session.commit()
+
+
+def rollup_occupancy(lag_seconds=60, window=datetime.timedelta(days=7), now=None, batch_size=5000):
+    """Fold newly closed reservations into the hourly buckets and return a report.
+
+    Each window of closing times is merged and the watermark moved in the same
+    transaction, guarded by a compare-and-swap so concurrent runs cannot count a
+    reservation twice (the loser stops and reports ``conflict``).
+    """
+    upper = (now or datetime.datetime.utcnow()) - datetime.timedelta(seconds=lag_seconds)
+    if db.session.execute(select(RollupWatermark.name).where(RollupWatermark.name == WATERMARK)).first() is None:
+        db.session.add(RollupWatermark(name=WATERMARK, value=None))
+        db.session.commit()
+
+    report = {"reservations": 0, "buckets": 0, "windows": 0, "watermark": None, "conflict": False}
+    watermark = current_watermark()
+    window_start = watermark or datetime.datetime.min
+
+    while window_start < upper:
+        # Skip straight over stretches without closings instead of scanning them window by window
+        next_closed = min((
+            closed for closed in (
+                db.session.execute(select(func.min(model.closed_at)).where(model.closed_at > window_start)).scalar()
+                for model in RESERVATION_MODELS
+            ) if closed is not None
+        ), default=None)
+        if next_closed is None:
+            window_end = upper
+        else:
+            window_end = min(next_closed - datetime.timedelta(microseconds=1) + window, upper)
+        # Archived reservations are folded too, in case they were moved before the rollup caught up
+        rows = db.session.execute(
+            across_tables(lambda model: (
+                select(ParkingSpot.lot_id, model.parking_timestamp, model.leaving_timestamp, model.parking_cost)
+                .join(ParkingSpot, ParkingSpot.id == model.spot_id)
+                .where(
+                    model.closed_at > window_start,
+                    model.closed_at <= window_end,
+                    model.parking_timestamp.isnot(None)
+                )
+            ))
+            .execution_options(yield_per=batch_size)
+        )
+        buckets = {}
+        folded = 0
+        for partition in rows.partitions():
+            fold_intervals(partition, buckets)
+            folded += len(partition)
+        _merge_buckets(buckets)
+
+        moved = db.session.execute(
+            update(RollupWatermark)
+            .where(RollupWatermark.name == WATERMARK, RollupWatermark.value.is_(None) if watermark is None else RollupWatermark.value == watermark)
+            .values(value=window_end)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not moved:
+            db.session.rollback()
+            report["conflict"] = True
+            break
+        db.session.commit()
+        watermark = window_start = window_end
+        report["reservations"] += folded
+        report["buckets"] += len(buckets)
+        report["windows"] += 1
+
+    report["watermark"] = watermark.isoformat() if watermark else None
+    return report
+
+
+def occupancy_series(start, end, lot_id=None, granularity="hour"):
+    """Occupancy, revenue and visits per lot and hour (or day) in ``[start, end)``.
+
+    The occupancy rate relates occupied minutes to the lot's current number of spots.
+    """
+    bucket = OccupancyHourly.hour if granularity == "hour" else OccupancyHourly.day
+    query = (
+        select(
+            OccupancyHourly.lot_id,
+            bucket.label("bucket"),
+            func.sum(OccupancyHourly.occupied_minutes).label("occupied_minutes"),
+            func.sum(OccupancyHourly.revenue).label("revenue"),
+            func.sum(OccupancyHourly.visits).label("visits"),
+            ParkingLot.number_of_spots
+        )
+        .outerjoin(ParkingLot, ParkingLot.id == OccupancyHourly.lot_id)
+        .where(OccupancyHourly.hour >= start, OccupancyHourly.hour < end)
+        .group_by(OccupancyHourly.lot_id, bucket, ParkingLot.number_of_spots)
+        .order_by(OccupancyHourly.lot_id, bucket)
+    )
+    if lot_id is not None:
+        query = query.where(OccupancyHourly.lot_id == lot_id)
+
+    bucket_minutes = 60 if granularity == "hour" else 24 * 60
+    points = []
+    for row in read_execute(query):
+        capacity = (row.number_of_spots or 0) * bucket_minutes
+        points.append({
+            "lot_id": row.lot_id,
+            "bucket": row.bucket.isoformat(),
+            "occupied_minutes": round(row.occupied_minutes, 2),
+            "occupancy_rate": round(row.occupied_minutes / capacity * 100, 2) if capacity else None,
+            "revenue": round(row.revenue, 2),
+            "visits": row.visits
+        })
+    return points
@@ -0,0 +1,75 @@
+"""Hot/cold split of reservations.
+
+Closed reservations that left more than a configurable age ago are moved from
+``reservations`` to ``reservation_history`` under their original ids, so the
+lookups of open reservations stay on a table that only grows with current
+activity. Each batch is copied and deleted in one transaction, so an
+interrupted run leaves nothing half moved and the next run carries on from
+where it stopped.
+
+Paths that read history (exports, the occupancy rollup, the stats rebuild) go
+through ``across_tables``, which reads both tables as one.
+"""
+import datetime
+
+from sqlalchemy import delete, func, insert, literal, select, union_all
+
+from src.extensions import db
+from src.models.models import Reservation, ReservationHistory
+
+RESERVATION_MODELS = (Reservation, ReservationHistory)
+ARCHIVED_COLUMNS = ("id", "spot_id", "user_id", "parking_timestamp", "leaving_timestamp", "parking_cost", "closed_at")
+
+
+def across_tables(build):
+    """UNION ALL of ``build(model)`` over the live and the archived reservations.
+
+    ``build`` returns the same select for either model, so each branch keeps
+    its own filters and indexes.
+    """
+    return union_all(*(build(model) for model in RESERVATION_MODELS))
+
+
+def _archivable(cutoff, batch_size):
+    return (
+        select(Reservation.id)
+        .where(
+            Reservation.leaving_timestamp < cutoff,
+            # The newest id stays, so SQLite never hands an archived id out again
+            Reservation.id < select(func.max(Reservation.id)).scalar_subquery()
+        )
+        .order_by(Reservation.leaving_timestamp)
+        .limit(batch_size)
+    )
+
+
+def archive_reservations(older_than, batch_size=1000, max_batches=None, now=None, progress=None):
+    """Move reservations that left before ``now - older_than`` to the history table.
+
+    One batch per transaction, oldest departures first, until none are left or
+    ``max_batches`` have been moved. ``progress`` is called with the report after
+    every batch. Returns ``{"archived", "batches", "cutoff"}``.
+    """
+    now = now or datetime.datetime.utcnow()
+    cutoff = now - older_than
+    report = {"archived": 0, "batches": 0, "cutoff": cutoff.isoformat()}
+    while max_batches is None or report["batches"] < max_batches:
+        ids = db.session.execute(_archivable(cutoff, batch_size)).scalars().all()
+        if not ids:
+            break
+        db.session.execute(
+            insert(ReservationHistory).from_select(
+                ARCHIVED_COLUMNS + ("archived_at",),
+                select(*(getattr(Reservation, name) for name in ARCHIVED_COLUMNS), literal(now, ReservationHistory.archived_at.type))
+                .where(Reservation.id.in_(ids))
+            )
+        )
+        db.session.execute(delete(Reservation).where(Reservation.id.in_(ids)).execution_options(synchronize_session=False))
+        db.session.commit()
+        report["archived"] += len(ids)
+        report["batches"] += 1
+        if progress:
+            progress(report)
+        if len(ids) < batch_size:
+            break
+    return report
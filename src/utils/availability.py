@@ -0,0 +1,296 @@
+"""Push feed of per-lot availability behind the Server-Sent Events stream.
+
+Writers report the lots they changed with ``lot_changed`` once their transaction
+has committed. A flusher thread lets reports accumulate for ``coalesce`` seconds,
+reads the counters of every reported lot in one query and publishes a single
+event for all of them. Events go to an in-process ring buffer that every open
+stream follows, so the database cost depends on the rate of changes, not on the
+number of clients.
+
+With the Redis backend an event is published on a channel and each worker's
+listener copies it into its own buffer. Event ids come from a shared counter,
+so a client can resume on any worker.
+"""
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+from sqlalchemy import select
+
+from src.extensions import db
+from src.models.models import ParkingLot
+
+RETRY_MS = 3000 # Reconnect delay suggested to EventSource clients
+SNAPSHOT_MAX_AGE = 5.0 # Seconds a loaded snapshot is reused for new streams
+
+
+class EventLog:
+    """Bounded, ordered buffer of published events that streams wait on.
+
+    Events carry absolute counter values, so replaying one a client has already
+    seen is harmless; only gaps have to be avoided. ``_floor`` is the newest id
+    whose successors are all still buffered (None until that is known); it starts
+    at ``last_id``, the id before the first event this log will see.
+    """
+
+    def __init__(self, size=1024, last_id=0):
+        self._events = deque(maxlen=size)
+        self._condition = threading.Condition()
+        self._floor = last_id
+        self.last_id = last_id
+
+    def append(self, event):
+        with self._condition:
+            if event["id"] <= self.last_id:
+                return  # Already seen (e.g. redelivered after a resubscribe)
+            if self._floor is None:
+                self._floor = event["id"] - 1
+            elif len(self._events) == self._events.maxlen:
+                self._floor = self._events[0]["id"]  # About to be evicted
+            self._events.append(event)
+            self.last_id = event["id"]
+            self._condition.notify_all()
+
+    def reset(self):
+        """Forget buffered events, e.g. when some may have been missed; resumes fall back to snapshots."""
+        with self._condition:
+            self._events.clear()
+            self._floor = None
+
+    def since(self, last_id):
+        """Events after ``last_id``, or None when they cannot all be replayed from the buffer."""
+        with self._condition:
+            return self._since_locked(last_id)
+
+    def wait(self, last_id, timeout):
+        """Block until there are events after ``last_id`` or ``timeout`` passes; see ``since``."""
+        with self._condition:
+            self._condition.wait_for(lambda: self.last_id != last_id, timeout)
+            return self._since_locked(last_id)
+
+    def _since_locked(self, last_id):
+        if last_id == self.last_id:
+            return []
+        if last_id > self.last_id or self._floor is None or last_id < self._floor:
+            return None
+        return [event for event in self._events if event["id"] > last_id]
+
+
+class MemoryAvailabilityBroker:
+    """Publishes straight into the local buffer; only suitable for a single worker.
+
+    Ids start from the current time in milliseconds, so ids handed out before a
+    restart are older than every new one and lead to a snapshot, not a bogus resume.
+    """
+
+    def __init__(self):
+        self.first_id = int(time.time() * 1000)
+        self._ids = itertools.count(self.first_id)
+
+    def publish(self, log, lots):
+        log.append({"id": next(self._ids), "lots": lots})
+
+    def start(self, log):
+        pass
+
+
+class RedisAvailabilityBroker:
+    """Fans events out to every worker through Redis pub/sub.
+
+    The id is taken and the event published in one Lua script, so events reach
+    subscribers in id order even when several workers publish at once.
+    """
+
+    PUBLISH_SCRIPT = """
+    local id = redis.call('INCR', KEYS[1])
+    redis.call('PUBLISH', ARGV[1], cjson.encode({id = id, lots = cjson.decode(ARGV[2])}))
+    return id
+    """
+
+    def __init__(self, client=None, url="redis://localhost:6379/0", channel="vp:availability"):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.channel = channel
+
+    def publish(self, log, lots):
+        self.client.eval(self.PUBLISH_SCRIPT, 1, self.channel + ":last_id", self.channel, json.dumps(lots))
+
+    def start(self, log):
+        threading.Thread(target=self._listen, args=(log,), name="availability-listener", daemon=True).start()
+
+    def _listen(self, log):
+        while True:
+            try:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                log.reset()  # Anything published while we were not subscribed is lost
+                for message in pubsub.listen():
+                    log.append(json.loads(message["data"]))
+            except Exception:
+                time.sleep(1)
+
+
+class AvailabilityFeed:
+    """Coalesces lot changes into availability events and serves them as SSE streams."""
+
+    def __init__(self):
+        self.app = None
+        self.enabled = True
+        self.coalesce = 0.25
+        self.keepalive = 15.0
+        self.max_stream = 300.0
+        self.broker = MemoryAvailabilityBroker()
+        self.log = EventLog(last_id=self.broker.first_id - 1)
+        self.published = 0
+        self.streams = 0
+        self._dirty = set()
+        self._wake = threading.Event()
+        self._snapshot = None  # (loaded_at, last_id, lots)
+        self._snapshot_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        backend = app.config.get("AVAILABILITY_BACKEND", "memory")
+        self.enabled = backend != "none"
+        self.coalesce = app.config.get("AVAILABILITY_COALESCE_MS", 250) / 1000
+        self.keepalive = app.config.get("AVAILABILITY_KEEPALIVE_SECONDS", 15.0)
+        self.max_stream = app.config.get("AVAILABILITY_STREAM_MAX_SECONDS", 300.0)
+        history_size = app.config.get("AVAILABILITY_HISTORY_SIZE", 1024)
+        if backend == "redis":
+            self.broker = RedisAvailabilityBroker(url=app.config.get("AVAILABILITY_REDIS_URL", "redis://localhost:6379/0"))
+            self.log = EventLog(history_size)
+        else:
+            self.broker = MemoryAvailabilityBroker()
+            self.log = EventLog(history_size, last_id=self.broker.first_id - 1)
+        app.extensions["availability_feed"] = self
+
+    def lot_changed(self, *lot_ids):
+        """Report committed changes to these lots' availability or size."""
+        if not self.enabled:
+            return
+        self._ensure_started()
+        with self._lock:
+            self._dirty.update(lot_ids)
+        self._wake.set()
+
+    def _ensure_started(self):
+        # Started lazily, and again in a forked worker, where the parent's threads do not exist
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._dirty = set()
+                self._thread = threading.Thread(target=self._flusher, name="availability-flusher", daemon=True)
+                self._thread.start()
+                self.broker.start(self.log)
+
+    def _flusher(self):
+        while True:
+            self._wake.wait()
+            time.sleep(self.coalesce)  # Let the rest of the burst arrive
+            self._wake.clear()
+            with self._lock:
+                dirty, self._dirty = self._dirty, set()
+            if not dirty:
+                continue
+            try:
+                with self.app.app_context():
+                    self.broker.publish(self.log, self._lot_states(dirty))
+                self.published += 1
+            except Exception as e:
+                self.app.logger.error(f"Publishing availability for lots {sorted(dirty)} failed: {e}")
+
+    def _lot_states(self, lot_ids=None):
+        # Read from the primary: the writer has just committed and a replica may lag behind
+        query = select(ParkingLot.id, ParkingLot.available_count, ParkingLot.number_of_spots).order_by(ParkingLot.id)
+        if lot_ids is not None:
+            query = query.where(ParkingLot.id.in_(lot_ids))
+        lots = [
+            {"lot_id": lot_id, "available_spots": available, "total_spots": total}
+            for lot_id, available, total in db.session.execute(query)
+        ]
+        if lot_ids is not None:
+            found = {lot["lot_id"] for lot in lots}
+            lots += [{"lot_id": lot_id, "deleted": True} for lot_id in sorted(set(lot_ids) - found)]
+        db.session.close()
+        return lots
+
+    def snapshot(self):
+        """Return ``(last_id, lots)``: every lot's state, current as of at least event ``last_id``.
+
+        A snapshot is shared by the streams opened within ``SNAPSHOT_MAX_AGE`` of
+        loading it; they replay the events published since, which brings them up to date.
+        """
+        with self._snapshot_lock:
+            cached = self._snapshot
+            if cached is None or time.monotonic() - cached[0] > SNAPSHOT_MAX_AGE or self.log.since(cached[1]) is None:
+                last_id = self.log.last_id  # Taken first: later events are replayed on top of the snapshot
+                with self.app.app_context():
+                    lots = self._lot_states()
+                cached = self._snapshot = (time.monotonic(), last_id, lots)
+            return cached[1], cached[2]
+
+    def stream(self, last_event_id=None, lot_ids=None):
+        """Yield SSE messages for one client until ``max_stream`` seconds have passed.
+
+        Starts with the events after ``last_event_id`` or, when those cannot be
+        replayed, a ``snapshot`` event; then follows the live ``availability``
+        events, with comment lines as keepalives. ``lot_ids`` narrows both to some lots.
+        """
+        self._ensure_started()
+        deadline = time.monotonic() + self.max_stream
+        with self._lock:
+            self.streams += 1
+        try:
+            yield f"retry: {RETRY_MS}\n\n"
+            events = self.log.since(last_event_id) if last_event_id is not None else None
+            last_id = last_event_id
+            while True:
+                if events is None:
+                    last_id, lots = self.snapshot()
+                    yield _message(last_id, "snapshot", _only(lots, lot_ids))
+                    events = self.log.since(last_id)
+                    continue
+                for event in events:
+                    last_id = event["id"]
+                    lots = _only(event["lots"], lot_ids)
+                    if lots:
+                        yield _message(last_id, "availability", lots)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                events = self.log.wait(last_id, min(self.keepalive, remaining))
+                if events == []:
+                    yield ": keepalive\n\n"
+        finally:
+            with self._lock:
+                self.streams -= 1
+
+    def stats(self):
+        return {
+            "backend": type(self.broker).__name__,
+            "enabled": self.enabled,
+            "open_streams": self.streams,
+            "events_published": self.published,
+            "last_event_id": self.log.last_id
+        }
+
+
+def _only(lots, lot_ids):
+    return lots if lot_ids is None else [lot for lot in lots if lot["lot_id"] in lot_ids]
+
+
+def _message(event_id, event, data):
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+availability_feed = AvailabilityFeed()
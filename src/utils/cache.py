@@ -0,0 +1,179 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+# Cache keys of the read-heavy endpoints
+USER_PARKING_LOTS = "user:parking_lots"
+ADMIN_PARKING_LOTS = "admin:parking_lots"
+ADMIN_DASHBOARD_SUMMARY = "admin:dashboard_summary"
+
+# Which cached views each kind of write makes stale
+SPOT_STATUS_KEYS = (USER_PARKING_LOTS, ADMIN_PARKING_LOTS, ADMIN_DASHBOARD_SUMMARY)
+LOT_DETAILS_KEYS = (USER_PARKING_LOTS, ADMIN_PARKING_LOTS)
+
+
+class MemoryCacheBackend:
+    """In-process LRU cache with a per-entry TTL.
+
+    A key may hold several variants (e.g. one per page of a listing); they are
+    stored and expire independently but are always invalidated together.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # (key, variant) -> (expires_at, value)
+        self._variants = {}  # key -> set of variants
+        self._lock = threading.Lock()
+
+    def _drop(self, entry_key):
+        self._entries.pop(entry_key, None)
+        key, variant = entry_key
+        variants = self._variants.get(key)
+        if variants is not None:
+            variants.discard(variant)
+            if not variants:
+                del self._variants[key]
+
+    def get(self, key, variant=""):
+        with self._lock:
+            entry = self._entries.get((key, variant))
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                self._drop((key, variant))
+                return None
+            self._entries.move_to_end((key, variant))
+            return value
+
+    def set(self, key, value, ttl, variant=""):
+        with self._lock:
+            self._entries[(key, variant)] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end((key, variant))
+            self._variants.setdefault(key, set()).add(variant)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                for variant in list(self._variants.get(key, ())):
+                    self._drop((key, variant))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._variants.clear()
+
+
+class RedisCacheBackend:
+    """Cache shared between workers through Redis.
+
+    Each key is a hash of variants whose values are stored as JSON together with
+    their own expiry time. Any client exposing ``hget``/``hset``/``expire``/
+    ``delete``/``scan_iter`` (e.g. fakeredis) can be passed in place of a real
+    connection.
+    """
+
+    def __init__(self, client=None, url="redis://localhost:6379/0", prefix="vp:cache:"):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key, variant=""):
+        raw = self.client.hget(self.prefix + key, variant)
+        if raw is None:
+            return None
+        entry = json.loads(raw)
+        if entry["expires_at"] < time.time():
+            return None
+        return entry["value"]
+
+    def set(self, key, value, ttl, variant=""):
+        entry = {"expires_at": time.time() + ttl, "value": value}
+        self.client.hset(self.prefix + key, variant, json.dumps(entry))
+        self.client.expire(self.prefix + key, max(1, int(ttl)))
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*(self.prefix + key for key in keys))
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self.prefix + "*"))
+        if keys:
+            self.client.delete(*keys)
+
+
+class ResponseCache:
+    """Read-through cache for computed endpoint payloads.
+
+    Writes invalidate the affected keys explicitly; the TTL only bounds staleness
+    for changes made by other processes when the in-memory backend is used.
+    """
+
+    def __init__(self):
+        self.backend = MemoryCacheBackend()
+        self.default_ttl = 30
+        self.enabled = True
+        self.hits = 0
+        self.misses = 0
+        self._key_stats = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        backend = app.config.get("CACHE_BACKEND", "memory")
+        self.enabled = backend != "none"
+        self.default_ttl = app.config.get("CACHE_DEFAULT_TTL", 30)
+        if backend == "redis":
+            self.backend = RedisCacheBackend(url=app.config.get("CACHE_REDIS_URL", "redis://localhost:6379/0"))
+        else:
+            self.backend = MemoryCacheBackend(app.config.get("CACHE_MAX_ENTRIES", 256))
+        app.extensions["response_cache"] = self
+
+    def _count(self, key, hit):
+        with self._lock:
+            stats = self._key_stats.setdefault(key, {"hits": 0, "misses": 0})
+            if hit:
+                self.hits += 1
+                stats["hits"] += 1
+            else:
+                self.misses += 1
+                stats["misses"] += 1
+
+    def get_or_set(self, key, compute, ttl=None, variant=""):
+        """Return the cached value for ``key``, computing and storing it on a miss."""
+        if not self.enabled:
+            return compute()
+        value = self.backend.get(key, variant)
+        if value is not None:
+            self._count(key, True)
+            return value
+        self._count(key, False)
+        value = compute()
+        self.backend.set(key, value, ttl or self.default_ttl, variant)
+        return value
+
+    def invalidate(self, *keys):
+        if self.enabled:
+            self.backend.delete(*keys)
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": type(self.backend).__name__,
+                "enabled": self.enabled,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0,
+                "keys": {key: dict(stats) for key, stats in self._key_stats.items()}
+            }
+
+
+cache = ResponseCache()
@@ -0,0 +1,113 @@
+"""Behavioural check of the response cache backends.
+
+Runs the in-memory and the Redis backend through the same scenarios: read-through
+get/set, variants, invalidation, TTL expiry, clearing and the hit/miss counters.
+The Redis backend is given a fakeredis client when that package is installed and
+``DictRedis``, a minimal in-process stand-in, otherwise, so no server is needed.
+"""
+import fnmatch
+import time
+
+from src.utils.cache import MemoryCacheBackend, RedisCacheBackend, ResponseCache
+
+TTL_SECONDS = 0.05 # Short enough for the expiry scenario to only sleep briefly
+
+
+class DictRedis:
+    """The subset of the redis client used by ``RedisCacheBackend``, kept in dicts."""
+
+    def __init__(self):
+        self._hashes = {}
+        self._expires_at = {}
+
+    def _live(self, name):
+        expires_at = self._expires_at.get(name)
+        if expires_at is not None and expires_at <= time.time():
+            self._hashes.pop(name, None)
+            self._expires_at.pop(name, None)
+        return self._hashes.get(name)
+
+    def hget(self, name, field):
+        value = (self._live(name) or {}).get(field)
+        return value.encode() if value is not None else None
+
+    def hset(self, name, field, value):
+        self._live(name)
+        self._hashes.setdefault(name, {})[field] = value
+
+    def expire(self, name, seconds):
+        if self._live(name) is not None:
+            self._expires_at[name] = time.time() + seconds
+
+    def delete(self, *names):
+        for name in names:
+            self._hashes.pop(name, None)
+            self._expires_at.pop(name, None)
+
+    def scan_iter(self, match="*"):
+        return [name for name in list(self._hashes) if self._live(name) is not None and fnmatch.fnmatchcase(name, match)]
+
+
+def _redis_client():
+    try:
+        import fakeredis
+    except ImportError:
+        return DictRedis()
+    return fakeredis.FakeRedis()
+
+
+def _response_cache(backend):
+    cache = ResponseCache()
+    cache.backend = backend
+    cache.default_ttl = 30
+    return cache
+
+
+def _scenarios(cache):
+    """Yield ``(name, passed)`` for each behaviour of ``cache``."""
+    calls = []
+
+    def compute(value):
+        def run():
+            calls.append(value)
+            return value
+        return run
+
+    first = cache.get_or_set("lots", compute({"page": 1}))
+    again = cache.get_or_set("lots", compute({"page": 99}))
+    yield "miss computes, hit returns the stored value", first == again == {"page": 1} and len(calls) == 1
+    yield "hit/miss counters", (cache.hits, cache.misses) == (1, 1) and cache.stats()["keys"]["lots"] == {"hits": 1, "misses": 1}
+
+    cache.get_or_set("lots", compute(["second page"]), variant="2")
+    cache.get_or_set("summary", compute({"total": 3}))
+    yield "variants are stored apart", cache.get_or_set("lots", compute(None), variant="2") == ["second page"]
+
+    cache.invalidate("lots")
+    yield "invalidate drops every variant of the key", cache.backend.get("lots") is None and cache.backend.get("lots", "2") is None
+    yield "invalidate leaves other keys", cache.backend.get("summary") == {"total": 3}
+
+    cache.get_or_set("short", compute("old"), ttl=TTL_SECONDS)
+    time.sleep(TTL_SECONDS * 3)
+    yield "entries expire after their TTL", cache.get_or_set("short", compute("new"), ttl=TTL_SECONDS) == "new"
+
+    cache.clear()
+    yield "clear drops everything", cache.backend.get("summary") is None
+
+    cache.enabled = False
+    misses = cache.misses
+    cache.get_or_set("lots", compute("a"))
+    yield "a disabled cache always computes", cache.get_or_set("lots", compute("b")) == "b" and cache.misses == misses
+
+
+def check_cache_backends():
+    """Run every scenario on both backends and return ``{backend: [failed scenario, ...]}``."""
+    backends = {
+        "memory": MemoryCacheBackend(max_entries=16),
+        "redis": RedisCacheBackend(client=_redis_client(), prefix="vp:cache-check:")
+    }
+    failures = {}
+    for name, backend in backends.items():
+        failed = [scenario for scenario, passed in _scenarios(_response_cache(backend)) if not passed]
+        if failed:
+            failures[name] = failed
+    return failures
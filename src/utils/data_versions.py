@@ -0,0 +1,34 @@
+"""Data versions of the cached views, kept in the database.
+
+A write that makes a cached view stale bumps the view's version inside its own
+transaction, next to invalidating the cache once it has committed. A version
+therefore only moves when the data it describes is committed, and every worker
+reads the same value. Listings derive their ETags from it and cache their
+payloads per version, so a payload is never served under a newer version than
+the one it was computed at.
+"""
+from sqlalchemy import insert, select, update
+
+from src.extensions import db
+from src.models.models import DataVersion
+from src.utils.database import read_execute
+
+
+def bump_versions(*names):
+    """Increment the versions of ``names`` inside the current transaction; the caller commits."""
+    bumped = db.session.execute(
+        update(DataVersion)
+        .where(DataVersion.name.in_(names))
+        .values(value=DataVersion.value + 1)
+        .returning(DataVersion.name)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    missing = set(names) - set(bumped)
+    if missing:
+        # Seeded by the migration; only a view added since then starts here
+        db.session.execute(insert(DataVersion), [{"name": name, "value": 1} for name in sorted(missing)])
+
+
+def data_version(name):
+    """Committed version of ``name``, 0 if it was never bumped."""
+    return read_execute(select(DataVersion.value).where(DataVersion.name == name)).scalar() or 0
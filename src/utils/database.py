@@ -0,0 +1,105 @@
+"""Database engine profile: URI and pool options from the config, SQLite pragmas
+and a separate read-only pool for the read endpoints.
+
+``configure_engines`` must run before ``db.init_app`` (it fills the Flask-SQLAlchemy
+engine options), ``init_app`` after it (it hooks the connect events of the engines).
+"""
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+from src.extensions import db
+
+READ_BIND = "readonly"
+SYNCHRONOUS_MODES = ("OFF", "NORMAL", "FULL", "EXTRA")
+
+
+def _is_memory_sqlite(url):
+    url = make_url(url)
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+def _pool_options(config, pool_size):
+    return {
+        "pool_size": pool_size,
+        "max_overflow": config.get("DATABASE_MAX_OVERFLOW", 10),
+        "pool_timeout": config.get("DATABASE_POOL_TIMEOUT", 30),
+        "pool_recycle": config.get("DATABASE_POOL_RECYCLE", -1),
+        "pool_pre_ping": config.get("DATABASE_POOL_PRE_PING", False)
+    }
+
+
+def configure_engines(app):
+    """Fill ``SQLALCHEMY_ENGINE_OPTIONS`` and the read-only bind from the DATABASE_* settings."""
+    config = app.config
+    url = config["SQLALCHEMY_DATABASE_URI"]
+    if _is_memory_sqlite(url):
+        # One shared in-memory connection: there is no pool to size and nothing to read from separately
+        return
+
+    options = dict(config.get("SQLALCHEMY_ENGINE_OPTIONS", {}))
+    options.update(_pool_options(config, config.get("DATABASE_POOL_SIZE", 5)))
+    if make_url(url).get_backend_name() == "sqlite":
+        # The driver-level timeout is pysqlite's busy handler for the connect itself
+        options["connect_args"] = {"timeout": config.get("SQLITE_BUSY_TIMEOUT_MS", 5000) / 1000}
+    config["SQLALCHEMY_ENGINE_OPTIONS"] = options
+
+    read_options = dict(options)
+    read_options.update(_pool_options(config, config.get("DATABASE_READ_POOL_SIZE", 10)))
+    read_options["url"] = config.get("DATABASE_READ_URL") or url
+    binds = dict(config.get("SQLALCHEMY_BINDS") or {})
+    binds[READ_BIND] = read_options
+    config["SQLALCHEMY_BINDS"] = binds
+
+
+def sqlite_pragmas(config, read_only=False):
+    """PRAGMA statements run on every new SQLite connection."""
+    synchronous = str(config.get("SQLITE_SYNCHRONOUS", "NORMAL")).upper()
+    if synchronous not in SYNCHRONOUS_MODES:
+        raise ValueError(f"SQLITE_SYNCHRONOUS must be one of {', '.join(SYNCHRONOUS_MODES)}")
+    pragmas = [
+        f"PRAGMA busy_timeout = {int(config.get('SQLITE_BUSY_TIMEOUT_MS', 5000))}",
+        f"PRAGMA synchronous = {synchronous}",
+        f"PRAGMA cache_size = -{int(config.get('SQLITE_CACHE_SIZE_KB', 65536))}",  # negative means KiB
+        f"PRAGMA mmap_size = {int(config.get('SQLITE_MMAP_SIZE_MB', 256)) * 1024 * 1024}",
+        "PRAGMA temp_store = MEMORY"
+    ]
+    if read_only:
+        pragmas.append("PRAGMA query_only = ON")
+    elif config.get("SQLITE_WAL", True):
+        # WAL lets readers run alongside the single writer; the mode is stored in the file
+        pragmas.insert(0, "PRAGMA journal_mode = WAL")
+    return pragmas
+
+
+def _install_pragmas(engine, pragmas):
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+
+def init_app(app):
+    """Apply the SQLite pragmas to the primary and read-only engines."""
+    with app.app_context():
+        engines = db.engines
+        for bind_key, engine in engines.items():
+            if engine.dialect.name == "sqlite" and not _is_memory_sqlite(engine.url):
+                _install_pragmas(engine, sqlite_pragmas(app.config, read_only=bind_key == READ_BIND))
+
+
+def read_engine():
+    """Engine for read-only queries; the primary engine when no read pool is configured."""
+    return db.engines.get(READ_BIND, db.engine)
+
+
+def read_execute(statement):
+    """Execute a SELECT on the read-only pool within the request's session.
+
+    Reads served this way never wait for a connection held by a writer, and with
+    WAL they see the last committed state without blocking on the write lock.
+    """
+    return db.session.execute(statement, bind_arguments={"bind": read_engine()})
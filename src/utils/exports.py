@@ -0,0 +1,82 @@
+import csv
+import io
+import os
+
+from flask import current_app
+
+from sqlalchemy import func, select
+
+from src.extensions import db
+from src.models.models import ParkingLot, ParkingSpot
+from src.utils.archive import across_tables
+
+CSV_HEADER = ["Reservation ID", "Lot Name", "Spot Number", "Parking Timestamp", "Leaving Timestamp", "Duration (Hours)", "Cost", "Address", "PIN Code"]
+
+
+def export_path(user_id, job_id):
+    return os.path.join(current_app.config["EXPORT_DIR"], str(user_id), f"{job_id}.csv")
+
+
+def export_error_path(user_id, job_id):
+    # Written instead of the CSV when the export fails, so the failure is visible without a result backend
+    return export_path(user_id, job_id) + ".error"
+
+
+def reservation_count(user_id):
+    """Number of the user's reservations, live and archived."""
+    counts = across_tables(lambda model: select(func.count(model.id).label("count")).where(model.user_id == user_id))
+    return db.session.execute(select(func.sum(counts.subquery().c.count))).scalar() or 0
+
+
+def reservation_history_rows(user_id, batch_size=500):
+    """Yield a user's reservations, live and archived, as CSV rows from a single joined, batched query."""
+    query = across_tables(lambda model: (
+        select(
+            model.id,
+            model.parking_timestamp,
+            model.leaving_timestamp,
+            model.parking_cost,
+            ParkingSpot.spot_number,
+            ParkingLot.prime_location_name,
+            ParkingLot.address,
+            ParkingLot.pin_code
+        )
+        .outerjoin(ParkingSpot, ParkingSpot.id == model.spot_id)
+        .outerjoin(ParkingLot, ParkingLot.id == ParkingSpot.lot_id)
+        .where(model.user_id == user_id)
+    ))
+    query = query.order_by(query.selected_columns.parking_timestamp.desc())
+    for row in db.session.execute(query.execution_options(yield_per=batch_size)):
+        duration_hours = "N/A"
+        if row.parking_timestamp and row.leaving_timestamp:
+            duration_seconds = (row.leaving_timestamp - row.parking_timestamp).total_seconds()
+            duration_hours = round(duration_seconds / 3600, 2)
+        yield [
+            row.id,
+            row.prime_location_name if row.prime_location_name is not None else "N/A",
+            row.spot_number if row.spot_number is not None else "N/A",
+            row.parking_timestamp.isoformat() if row.parking_timestamp else "N/A",
+            row.leaving_timestamp.isoformat() if row.leaving_timestamp else "N/A",
+            duration_hours,
+            row.parking_cost if row.parking_cost is not None else "N/A",
+            row.address if row.address is not None else "N/A",
+            row.pin_code if row.pin_code is not None else "N/A"
+        ]
+
+
+def iter_csv(rows, rows_per_chunk=200):
+    """Render rows (header first) as CSV text, one chunk of rows at a time."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_HEADER)
+    pending = 1
+    for row in rows:
+        writer.writerow(row)
+        pending += 1
+        if pending >= rows_per_chunk:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    if pending:
+        yield buffer.getvalue()
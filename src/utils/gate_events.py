@@ -0,0 +1,220 @@
+"""Batched park/vacate events replayed by entry and exit gate controllers.
+
+A batch is one write-queue operation, so it commits (or fails) as a whole. The
+reservations, spots, lot prices and open reservations it touches are read with a
+few ``IN`` queries; the events are then checked against that state in order,
+exactly like the single park/vacate transitions, and only the net changes are
+written: two guarded spot status UPDATEs, one counter UPDATE per lot, one stats
+UPDATE per user and an executemany for the reservations. Every event carries an
+idempotency key under which its result is stored, so a replayed event returns
+its original result instead of being applied twice.
+"""
+import datetime
+import json
+
+from sqlalchemy import delete, insert, select, update
+
+from src.extensions import db
+from src.models.models import IdempotencyKey, ParkingLot, ParkingSpot, Reservation
+from src.utils.availability import availability_feed
+from src.utils.cache import cache, SPOT_STATUS_KEYS
+from src.utils.data_versions import bump_versions
+from src.utils.occupancy import adjust_lot_counters
+from src.utils.reservations import TransitionError
+from src.utils.spot_allocator import spot_allocator
+from src.utils.user_stats import record_gate_batch
+from src.utils.write_queue import write_queue
+
+GATE_ACTIONS = ("park", "vacate")
+
+
+class _BatchState:
+    """What the batch has read, updated in memory as events are applied in order."""
+
+    def __init__(self, reservation_ids):
+        self.reservations = {
+            reservation.id: reservation
+            for reservation in db.session.execute(select(Reservation).where(Reservation.id.in_(reservation_ids))).scalars()
+        }
+        spot_ids = {reservation.spot_id for reservation in self.reservations.values()}
+        self.spots = {
+            row.id: {"status": row.status, "lot_id": row.lot_id, "spot_number": row.spot_number, "price": row.price or 0}
+            for row in db.session.execute(
+                select(ParkingSpot.id, ParkingSpot.status, ParkingSpot.lot_id, ParkingSpot.spot_number, ParkingLot.price)
+                .outerjoin(ParkingLot, ParkingLot.id == ParkingSpot.lot_id)
+                .where(ParkingSpot.id.in_(spot_ids))
+            )
+        }
+        self.initial_status = {spot_id: spot["status"] for spot_id, spot in self.spots.items()}
+        self.holders = {}  # spot_id -> ids of reservations not yet vacated
+        for spot_id, reservation_id in db.session.execute(
+            select(Reservation.spot_id, Reservation.id).where(Reservation.spot_id.in_(spot_ids), Reservation.leaving_timestamp.is_(None))
+        ):
+            self.holders.setdefault(spot_id, set()).add(reservation_id)
+        self.users = {}  # user_id -> [spent, minutes, last_visit]
+        self.now = datetime.datetime.utcnow()
+
+    def _reservation_and_spot(self, reservation_id):
+        reservation = self.reservations.get(reservation_id)
+        if reservation is None:
+            raise TransitionError("Reservation not found", 404)
+        spot = self.spots.get(reservation.spot_id)
+        if spot is None:
+            raise TransitionError("Associated parking spot not found", 404)
+        return reservation, spot
+
+    def _user(self, user_id):
+        return self.users.setdefault(user_id, [0.0, 0.0, None])
+
+    def park(self, reservation_id, timestamp):
+        reservation, spot = self._reservation_and_spot(reservation_id)
+        if reservation.parking_timestamp:
+            raise TransitionError("Vehicle already marked as parked for this reservation")
+        # A hold not swept yet still covers a gate event from before it lapsed
+        if reservation.leaving_timestamp or (reservation.hold_expires_at and reservation.hold_expires_at < timestamp):
+            raise TransitionError("Reservation hold has expired; book again", 409)
+        if spot["status"] != "A" and self.holders.get(reservation.spot_id, set()) - {reservation.id}:
+            raise TransitionError("Associated parking spot is held by another reservation", 409)
+
+        spot["status"] = "O"
+        reservation.parking_timestamp = timestamp
+        reservation.hold_expires_at = None
+        stats = self._user(reservation.user_id)
+        stats[2] = timestamp if stats[2] is None else max(stats[2], timestamp)
+        return {"message": "Vehicle parked successfully.", "parking_timestamp": timestamp.isoformat()}
+
+    def vacate(self, reservation_id, timestamp):
+        reservation, spot = self._reservation_and_spot(reservation_id)
+        if not reservation.parking_timestamp:
+            raise TransitionError("Vehicle was never marked as parked for this reservation")
+        if reservation.leaving_timestamp:
+            raise TransitionError("Vehicle already marked as vacated for this reservation")
+        if timestamp < reservation.parking_timestamp:
+            raise TransitionError("Vacate timestamp is before the parking timestamp")
+
+        spot["status"] = "A"
+        self.holders.get(reservation.spot_id, set()).discard(reservation.id)
+        hours = (timestamp - reservation.parking_timestamp).total_seconds() / 3600
+        reservation.leaving_timestamp = timestamp
+        # The rollup advances on closed_at, so a vacate replayed from before its watermark is still folded
+        reservation.closed_at = self.now
+        reservation.parking_cost = round(max(0, hours * spot["price"]), 2)
+        stats = self._user(reservation.user_id)
+        stats[0] += reservation.parking_cost
+        stats[1] += hours * 60
+        return {
+            "message": "Vehicle vacated successfully.",
+            "leaving_timestamp": timestamp.isoformat(),
+            "parking_duration_hours": round(hours, 2),
+            "parking_cost": reservation.parking_cost
+        }
+
+    def changed_spots(self, old_status, new_status):
+        return [
+            spot_id for spot_id, spot in self.spots.items()
+            if self.initial_status[spot_id] == old_status and spot["status"] == new_status
+        ]
+
+
+def _set_spot_status(spot_ids, old_status, new_status):
+    if not spot_ids:
+        return
+    changed = db.session.execute(
+        update(ParkingSpot)
+        .where(ParkingSpot.id.in_(spot_ids), ParkingSpot.status == old_status)
+        .values(status=new_status)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if changed != len(spot_ids):
+        raise TransitionError("Parking spots changed while the batch was applied; retry it", 409)
+
+
+def _replayed(recorded, event):
+    action, reservation_id, status_code, body = recorded
+    if action != event["action"] or reservation_id != event["reservation_id"]:
+        return 409, {"message": "Idempotency key was already used for a different event"}, True
+    return status_code, body, True
+
+
+def apply_gate_events(events):
+    """Apply ``events`` in order and return one ``(status_code, body, replayed)`` per event.
+
+    Each event is a dict with ``key``, ``action`` (park or vacate),
+    ``reservation_id`` and ``timestamp`` (naive UTC). Events rejected by the usual
+    transition rules get their error as the result and do not affect the others.
+    """
+    results = [None] * len(events)
+    recorded = {
+        row.key: (row.action, row.reservation_id, row.status_code, json.loads(row.response))
+        for row in db.session.execute(
+            select(IdempotencyKey).where(IdempotencyKey.key.in_({event["key"] for event in events}))
+        ).scalars()
+    }
+    pending, repeated = [], []
+    first_use = set()
+    for index, event in enumerate(events):
+        if event["key"] in recorded:
+            results[index] = _replayed(recorded[event["key"]], event)
+        elif event["key"] in first_use:
+            repeated.append(index)  # Answered once the first event with this key is applied
+        else:
+            first_use.add(event["key"])
+            pending.append(index)
+
+    state = _BatchState({events[index]["reservation_id"] for index in pending})
+    for index in pending:
+        event = events[index]
+        try:
+            body = getattr(state, event["action"])(event["reservation_id"], event["timestamp"])
+            results[index] = (200, body, False)
+        except TransitionError as e:
+            results[index] = (e.status_code, {"message": e.message}, False)
+
+    claimed = state.changed_spots("A", "O")
+    released = state.changed_spots("O", "A")
+    _set_spot_status(claimed, "A", "O")
+    _set_spot_status(released, "O", "A")
+    lot_deltas = {}
+    for spot_id in claimed:
+        lot_deltas[state.spots[spot_id]["lot_id"]] = lot_deltas.get(state.spots[spot_id]["lot_id"], 0) - 1
+    for spot_id in released:
+        lot_deltas[state.spots[spot_id]["lot_id"]] = lot_deltas.get(state.spots[spot_id]["lot_id"], 0) + 1
+    for lot_id, available in lot_deltas.items():
+        adjust_lot_counters(lot_id, available=available, occupied=-available)
+
+    db.session.flush()  # Reservation timestamps and costs, before the stats look up open reservations
+    for user_id, (spent, minutes, last_visit) in state.users.items():
+        record_gate_batch(user_id, spent, minutes, last_visit)
+
+    now = datetime.datetime.utcnow()
+    rows = []
+    for index in pending:
+        event, (status_code, body, _) = events[index], results[index]
+        recorded[event["key"]] = (event["action"], event["reservation_id"], status_code, body)
+        rows.append({
+            "key": event["key"], "action": event["action"], "reservation_id": event["reservation_id"],
+            "status_code": status_code, "response": json.dumps(body), "created_at": now
+        })
+    if rows:
+        db.session.execute(insert(IdempotencyKey), rows)
+    for index in repeated:
+        results[index] = _replayed(recorded[events[index]["key"]], events[index])
+
+    for spot_id in claimed:
+        write_queue.after_commit(spot_allocator.mark_unavailable, state.spots[spot_id]["lot_id"], state.spots[spot_id]["spot_number"])
+    for spot_id in released:
+        write_queue.after_commit(spot_allocator.mark_available, state.spots[spot_id]["lot_id"], spot_id, state.spots[spot_id]["spot_number"])
+    if any(result[0] == 200 and not result[2] for result in results):
+        bump_versions(*SPOT_STATUS_KEYS)
+        write_queue.after_commit(cache.invalidate, *SPOT_STATUS_KEYS)
+    if lot_deltas:
+        write_queue.after_commit(availability_feed.lot_changed, *lot_deltas)
+    return results
+
+
+def purge_idempotency_keys(max_age):
+    """Delete stored event results older than ``max_age`` and return how many were removed."""
+    cutoff = datetime.datetime.utcnow() - max_age
+    purged = db.session.execute(delete(IdempotencyKey).where(IdempotencyKey.created_at < cutoff)).rowcount
+    db.session.commit()
+    return purged
@@ -0,0 +1,193 @@
+"""Expiring holds on booked spots.
+
+A booking claims its spot and holds it until ``hold_expires_at``; parking clears
+the hold. A hold that lapses is closed (``leaving_timestamp`` set to the expiry
+time, no parking time, no cost) and its spot is released.
+
+Holds are expired on time by ``HoldSweeper``, which keeps the deadlines in an
+in-process min-heap, so finding what is due never scans the reservations table.
+``sweep_expired_holds`` is the fallback run by Celery beat. It picks up holds
+whose worker went away, through the index on ``hold_expires_at``, which only
+pending holds have a value in.
+"""
+import datetime
+import heapq
+import os
+import threading
+
+from sqlalchemy import select, update
+
+from src.extensions import db
+from src.models.models import ParkingSpot, Reservation
+from src.utils.availability import availability_feed
+from src.utils.cache import cache, SPOT_STATUS_KEYS
+from src.utils.data_versions import bump_versions
+from src.utils.occupancy import adjust_lot_counters
+from src.utils.spot_allocator import spot_allocator
+from src.utils.write_queue import write_queue
+
+RETRY_SECONDS = 5 # Delay before due holds are tried again after a failed expiry
+
+
+def _pending(now):
+    return (
+        Reservation.hold_expires_at <= now,
+        Reservation.parking_timestamp.is_(None),
+        Reservation.leaving_timestamp.is_(None)
+    )
+
+
+def expire_holds(now, reservation_ids=None, limit=1000):
+    """Close holds that lapsed by ``now`` and release their spots, inside the current transaction.
+
+    Only ``reservation_ids`` are considered when given, otherwise the ``limit``
+    oldest lapsed holds. The UPDATE re-checks that each hold is still pending, so
+    one parked or expired elsewhere in the meantime is left alone. Returns the ids
+    of the reservations expired.
+    """
+    candidates = select(Reservation.id).where(*_pending(now))
+    if reservation_ids is not None:
+        candidates = candidates.where(Reservation.id.in_(reservation_ids))
+    else:
+        candidates = candidates.order_by(Reservation.hold_expires_at).limit(limit)
+    expired = db.session.execute(
+        update(Reservation)
+        .where(Reservation.id.in_(candidates), *_pending(now))
+        .values(leaving_timestamp=Reservation.hold_expires_at, closed_at=now, hold_expires_at=None, parking_cost=0)
+        .returning(Reservation.id, Reservation.spot_id)
+        .execution_options(synchronize_session=False)
+    ).all()
+    if not expired:
+        return []
+
+    # The spot was claimed for the hold when it was booked, so nobody else can have parked on it
+    released = db.session.execute(
+        update(ParkingSpot)
+        .where(ParkingSpot.id.in_({spot_id for _, spot_id in expired}), ParkingSpot.status == "O")
+        .values(status="A")
+        .returning(ParkingSpot.id, ParkingSpot.lot_id, ParkingSpot.spot_number)
+        .execution_options(synchronize_session=False)
+    ).all()
+    lot_deltas = {}
+    for spot_id, lot_id, spot_number in released:
+        lot_deltas[lot_id] = lot_deltas.get(lot_id, 0) + 1
+        write_queue.after_commit(spot_allocator.mark_available, lot_id, spot_id, spot_number)
+    for lot_id, count in lot_deltas.items():
+        adjust_lot_counters(lot_id, available=count, occupied=-count)
+    if lot_deltas:
+        bump_versions(*SPOT_STATUS_KEYS)
+        write_queue.after_commit(cache.invalidate, *SPOT_STATUS_KEYS)
+        write_queue.after_commit(availability_feed.lot_changed, *lot_deltas)
+    return [reservation_id for reservation_id, _ in expired]
+
+
+def sweep_expired_holds(now=None, batch_size=1000):
+    """Expire every hold that lapsed by ``now``, in batches, and return how many were expired."""
+    now = now or datetime.datetime.utcnow()
+    total = 0
+    while True:
+        expired = write_queue.run(expire_holds, now, None, batch_size)
+        total += len(expired)
+        if len(expired) < batch_size:
+            return total
+
+
+class HoldSweeper:
+    """Expires holds when they lapse, from an in-process min-heap of ``(expires_at, reservation_id)``.
+
+    Bookings push their deadline once committed. One thread sleeps until the
+    earliest deadline and expires everything due in one write-queue operation.
+    Entries are never removed: a hold that was parked in the meantime is skipped
+    by ``expire_holds``. When the thread starts, on the first request or booking
+    of a worker, the heap is loaded with every pending hold, so holds from before
+    a restart still lapse.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.ttl = 900
+        self.batch_size = 500
+        self.expired = 0
+        self._heap = []
+        self._condition = threading.Condition()
+        self._thread = None
+        self._pid = None
+
+    def init_app(self, app):
+        self.app = app
+        self.ttl = app.config.get("RESERVATION_HOLD_TTL_SECONDS", 900)
+        if self.ttl > 0:
+            app.before_request(self._ensure_started)
+        app.extensions["hold_sweeper"] = self
+
+    def deadline(self, now):
+        """When a hold booked at ``now`` lapses, or None when holds do not expire."""
+        return now + datetime.timedelta(seconds=self.ttl) if self.ttl > 0 else None
+
+    def schedule(self, reservation_id, expires_at):
+        if expires_at is None:
+            return
+        self._ensure_started()
+        with self._condition:
+            heapq.heappush(self._heap, (expires_at, reservation_id))
+            if self._heap[0][1] == reservation_id:
+                self._condition.notify()  # New earliest deadline
+
+    def _ensure_started(self):
+        # Started lazily, and again in a forked worker, where the parent's thread does not exist
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._condition:
+            if self._thread is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._heap = []
+                self._thread = threading.Thread(target=self._run, name="hold-sweeper", daemon=True)
+                self._thread.start()
+
+    def _recover(self):
+        with self.app.app_context():
+            pending = db.session.execute(
+                select(Reservation.hold_expires_at, Reservation.id).where(Reservation.hold_expires_at.isnot(None))
+            ).all()
+            db.session.close()
+        with self._condition:
+            self._heap.extend((expires_at, reservation_id) for expires_at, reservation_id in pending)
+            heapq.heapify(self._heap)
+            self._condition.notify()
+
+    def _due(self):
+        """Wait until holds are due and pop up to ``batch_size`` of them."""
+        with self._condition:
+            while True:
+                now = datetime.datetime.utcnow()
+                if self._heap and self._heap[0][0] <= now:
+                    break
+                self._condition.wait((self._heap[0][0] - now).total_seconds() if self._heap else None)
+            due = []
+            while self._heap and self._heap[0][0] <= now and len(due) < self.batch_size:
+                due.append(heapq.heappop(self._heap))
+            return now, due
+
+    def _run(self):
+        try:
+            self._recover()
+        except Exception as e:
+            self.app.logger.error(f"Loading pending reservation holds failed: {e}")
+        while True:
+            now, due = self._due()
+            try:
+                with self.app.app_context():
+                    self.expired += len(write_queue.run(expire_holds, now, [reservation_id for _, reservation_id in due]))
+            except Exception as e:
+                self.app.logger.error(f"Expiring {len(due)} reservation hold(s) failed: {e}")
+                retry_at = now + datetime.timedelta(seconds=RETRY_SECONDS)
+                with self._condition:
+                    for _, reservation_id in due:
+                        heapq.heappush(self._heap, (retry_at, reservation_id))
+
+    def stats(self):
+        with self._condition:
+            return {"ttl_seconds": self.ttl, "scheduled": len(self._heap), "expired": self.expired}
+
+
+hold_sweeper = HoldSweeper()
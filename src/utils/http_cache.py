@@ -0,0 +1,135 @@
+"""Conditional GET, sparse fieldsets and response compression for the listings.
+
+A listing's ETag is derived from the committed data version of its cache key
+(see ``src.utils.data_versions``) and the request parameters that shape the
+body, so it is known before anything is read or serialized and is the same on
+every worker. A request whose
+``If-None-Match`` matches is answered with an empty 304 straight away.
+
+``ResponseCompressor`` gzips or deflates JSON and CSV responses for clients that
+accept it: buffered bodies above a size threshold, and streamed bodies chunk by
+chunk as they are produced.
+"""
+import hashlib
+import zlib
+
+from flask import Response, request
+
+ENCODINGS = ("gzip", "deflate")
+COMPRESSIBLE_TYPES = ("application/json", "text/csv")
+GZIP_WBITS = 16 + zlib.MAX_WBITS # zlib stream with a gzip header and trailer
+
+
+def listing_etag(version, *parts):
+    """Strong ETag for the body built from data ``version`` with ``parts`` (page, fields...)."""
+    return hashlib.blake2b(repr((version,) + parts).encode(), digest_size=12).hexdigest()
+
+
+def not_modified(etag):
+    """Return a 304 response when the request's ``If-None-Match`` matches ``etag``, else None.
+
+    A tag we sent for a compressed body carries an encoding suffix; it matches too,
+    and is echoed back so the client keeps the representation it has.
+    """
+    if etag is None or not request.if_none_match:
+        return None
+    for tag in [etag] + [f"{etag}-{encoding}" for encoding in ENCODINGS]:
+        if request.if_none_match.contains(tag):
+            response = Response(status=304)
+            response.set_etag(tag)
+            return _revalidate(response)
+    return None
+
+
+def with_etag(response, etag):
+    if etag is not None:
+        response.set_etag(etag)
+        _revalidate(response)
+    return response
+
+
+def _revalidate(response):
+    # Clients may keep the body but must check it with the ETag before every reuse
+    response.headers["Cache-Control"] = "private, no-cache"
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def parse_fields(args, allowed):
+    """Parse ``fields`` (comma separated) from the query string.
+
+    Returns the requested names in order, or None when the parameter is absent.
+    Raises ValueError with a client-facing message for unknown or missing names.
+    """
+    value = args.get("fields")
+    if value is None:
+        return None
+    fields = list(dict.fromkeys(name.strip() for name in value.split(",") if name.strip()))
+    if not fields or any(name not in allowed for name in fields):
+        raise ValueError(f"fields must be a comma-separated list of: {', '.join(allowed)}")
+    return fields
+
+
+def select_fields(item, fields):
+    return item if fields is None else {name: item[name] for name in fields if name in item}
+
+
+class ResponseCompressor:
+    """Compresses JSON and CSV responses according to the request's ``Accept-Encoding``."""
+
+    def __init__(self):
+        self.enabled = True
+        self.min_size = 1024
+        self.level = 6
+
+    def init_app(self, app):
+        self.enabled = app.config.get("COMPRESSION_ENABLED", True)
+        self.min_size = app.config.get("COMPRESSION_MIN_SIZE", 1024)
+        self.level = app.config.get("COMPRESSION_LEVEL", 6)
+        app.after_request(self._compress)
+        app.extensions["response_compressor"] = self
+
+    def _compress(self, response):
+        if (
+            not self.enabled
+            or response.status_code != 200
+            or response.direct_passthrough  # Files sent as they are
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE_TYPES
+        ):
+            return response
+        response.vary.add("Accept-Encoding")
+        encoding = request.accept_encodings.best_match(ENCODINGS)
+        if encoding is None:
+            return response
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, GZIP_WBITS if encoding == "gzip" else zlib.MAX_WBITS)
+
+        if response.is_streamed:
+            response.response = _compress_chunks(response.response, compressor)
+            response.headers.pop("Content-Length", None)
+        else:
+            data = response.get_data()
+            if len(data) < self.min_size:
+                return response
+            response.set_data(compressor.compress(data) + compressor.flush())
+
+        response.headers["Content-Encoding"] = encoding
+        etag, weak = response.get_etag()
+        if etag:
+            response.set_etag(f"{etag}-{encoding}", weak)  # A different representation needs its own tag
+        return response
+
+
+def _compress_chunks(chunks, compressor):
+    try:
+        for chunk in chunks:
+            data = compressor.compress(chunk.encode() if isinstance(chunk, str) else chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+    finally:
+        if hasattr(chunks, "close"):
+            chunks.close()
+
+
+compressor = ResponseCompressor()
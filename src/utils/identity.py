@@ -0,0 +1,106 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from flask_jwt_extended import get_jwt, get_jwt_identity
+from sqlalchemy import event, inspect
+
+from src.models.models import User
+
+CachedUser = namedtuple("CachedUser", ["id", "username", "role"])
+
+
+def identity_claims(user):
+    """Claims embedded in every token; user_id and role never change for a user."""
+    return {"role": user.role, "user_id": user.id}
+
+
+class IdentityCache:
+    """Bounded LRU of user identities, keyed by id and by username.
+
+    Entries are plain tuples rather than ORM rows so they can be shared between
+    requests. Updates and deletes of ``User`` rows evict the affected entries; the
+    TTL bounds staleness for changes made by other processes.
+    """
+
+    def __init__(self, max_entries=10000, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._by_id = OrderedDict()  # id -> (expires_at, CachedUser)
+        self._id_by_username = {}
+        self._lock = threading.Lock()
+
+    def _lookup(self, user_id):
+        entry = self._by_id.get(user_id)
+        if entry is None:
+            return None
+        expires_at, user = entry
+        if expires_at < time.monotonic():
+            self._evict_locked(user_id)
+            return None
+        self._by_id.move_to_end(user_id)
+        return user
+
+    def _store(self, user):
+        if user is None:
+            return None
+        cached = CachedUser(user.id, user.username, user.role)
+        with self._lock:
+            self._by_id[cached.id] = (time.monotonic() + self.ttl, cached)
+            self._by_id.move_to_end(cached.id)
+            self._id_by_username[cached.username] = cached.id
+            while len(self._by_id) > self.max_entries:
+                self._evict_locked(next(iter(self._by_id)))
+        return cached
+
+    def _evict_locked(self, user_id):
+        entry = self._by_id.pop(user_id, None)
+        if entry is not None:
+            self._id_by_username.pop(entry[1].username, None)
+
+    def get(self, user_id):
+        with self._lock:
+            cached = self._lookup(user_id)
+        return cached or self._store(User.query.get(user_id))
+
+    def get_by_username(self, username):
+        with self._lock:
+            user_id = self._id_by_username.get(username)
+            cached = self._lookup(user_id) if user_id is not None else None
+        return cached or self._store(User.query.filter_by(username=username).first())
+
+    def invalidate(self, user_id=None, username=None):
+        with self._lock:
+            if username is not None and user_id is None:
+                user_id = self._id_by_username.get(username)
+            if user_id is not None:
+                self._evict_locked(user_id)
+
+    def clear(self):
+        with self._lock:
+            self._by_id.clear()
+            self._id_by_username.clear()
+
+
+identity_cache = IdentityCache()
+
+
+def current_user_id():
+    """Id of the user behind the current JWT.
+
+    Tokens carry a ``user_id`` claim; tokens issued before the claim existed fall
+    back to the identity cache.
+    """
+    user_id = get_jwt().get("user_id")
+    if user_id is not None:
+        return user_id
+    cached = identity_cache.get_by_username(get_jwt_identity())
+    return cached.id if cached else None
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _evict_changed_user(mapper, connection, target):
+    identity_cache.invalidate(user_id=target.id)
+    for old_username in inspect(target).attrs.username.history.deleted:
+        identity_cache.invalidate(username=old_username)
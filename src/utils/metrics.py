@@ -0,0 +1,229 @@
+"""Low-overhead request instrumentation exposed in the Prometheus text format.
+
+Metrics are kept per process; with several gunicorn workers each worker reports
+its own series. ``/metrics`` is only served when ``METRICS_TOKEN`` is set, to
+scrapers sending it as a bearer token, since the series name every endpoint and
+its latencies.
+"""
+import bisect
+import hmac
+import random
+import threading
+import time
+from collections import deque
+
+from flask import Blueprint, Response, current_app, g, has_request_context, jsonify, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Upper bounds (seconds) of the latency histogram buckets; the last bucket is +Inf
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class _Histogram:
+    __slots__ = ("buckets", "total", "count")
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Estimate a quantile by interpolating inside the bucket that contains it."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for index, bucket_count in enumerate(self.buckets):
+            if cumulative + bucket_count >= rank and bucket_count:
+                lower = LATENCY_BUCKETS[index - 1] if index else 0.0
+                if index == len(LATENCY_BUCKETS):
+                    return lower
+                upper = LATENCY_BUCKETS[index]
+                return lower + (upper - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return LATENCY_BUCKETS[-1]
+
+
+class _EndpointStats:
+    __slots__ = ("latency", "responses", "queries", "query_seconds", "slow")
+
+    def __init__(self):
+        self.latency = _Histogram()
+        self.responses = {}  # status code -> count
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.slow = 0
+
+
+class RequestMetrics:
+    """Per-endpoint latency histograms, SQL query counts and slow-request samples."""
+
+    def __init__(self):
+        self.enabled = True
+        self.slow_request_seconds = 0.5
+        self.slow_sample_rate = 1.0
+        self.token = None # Bearer token required on /metrics; None disables the endpoint
+        self.slow_samples = deque(maxlen=100)
+        self._endpoints = {}
+        self._lock = threading.Lock()
+        self._sql_listening = False
+
+    def init_app(self, app):
+        self.enabled = app.config.get("METRICS_ENABLED", True)
+        self.slow_request_seconds = app.config.get("METRICS_SLOW_REQUEST_MS", 500) / 1000
+        self.slow_sample_rate = app.config.get("METRICS_SLOW_SAMPLE_RATE", 1.0)
+        self.token = app.config.get("METRICS_TOKEN")
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.register_blueprint(metrics_bp)
+        if not self._sql_listening:
+            event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+            self._sql_listening = True
+        app.extensions["request_metrics"] = self
+
+    def _start_request(self):
+        if self.enabled:
+            g._metrics_started = time.perf_counter()
+            g._metrics_queries = 0
+            g._metrics_query_seconds = 0.0
+
+    def _finish_request(self, response):
+        started = g.pop("_metrics_started", None)
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        endpoint = request.endpoint or "unmatched"
+        queries = g.get("_metrics_queries", 0)
+        query_seconds = g.get("_metrics_query_seconds", 0.0)
+        slow = elapsed >= self.slow_request_seconds
+
+        with self._lock:
+            stats = self._endpoints.get(endpoint)
+            if stats is None:
+                stats = self._endpoints[endpoint] = _EndpointStats()
+            stats.latency.observe(elapsed)
+            stats.responses[response.status_code] = stats.responses.get(response.status_code, 0) + 1
+            stats.queries += queries
+            stats.query_seconds += query_seconds
+            if slow:
+                stats.slow += 1
+
+        if slow and random.random() < self.slow_sample_rate:
+            sample = {
+                "endpoint": endpoint,
+                "method": request.method,
+                "path": request.path,
+                "status": response.status_code,
+                "duration_ms": round(elapsed * 1000, 2),
+                "sql_queries": queries,
+                "sql_ms": round(query_seconds * 1000, 2),
+                "at": time.time()
+            }
+            self.slow_samples.append(sample)
+            current_app.logger.warning(f"Slow request: {sample}")
+        return response
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+        self.slow_samples.clear()
+
+    def render_prometheus(self):
+        with self._lock:
+            endpoints = sorted(self._endpoints.items())
+            lines = [
+                "# HELP vp_http_request_duration_seconds Request latency per endpoint.",
+                "# TYPE vp_http_request_duration_seconds histogram"
+            ]
+            for endpoint, stats in endpoints:
+                cumulative = 0
+                for bound, bucket_count in zip(LATENCY_BUCKETS + ("+Inf",), stats.latency.buckets):
+                    cumulative += bucket_count
+                    lines.append(f'vp_http_request_duration_seconds_bucket{{endpoint="{endpoint}",le="{bound}"}} {cumulative}')
+                lines.append(f'vp_http_request_duration_seconds_sum{{endpoint="{endpoint}"}} {stats.latency.total:.6f}')
+                lines.append(f'vp_http_request_duration_seconds_count{{endpoint="{endpoint}"}} {stats.latency.count}')
+
+            lines += [
+                "# HELP vp_http_request_duration_quantile_seconds Latency quantiles estimated from the histogram.",
+                "# TYPE vp_http_request_duration_quantile_seconds gauge"
+            ]
+            for endpoint, stats in endpoints:
+                for q in QUANTILES:
+                    lines.append(f'vp_http_request_duration_quantile_seconds{{endpoint="{endpoint}",quantile="{q}"}} {stats.latency.quantile(q):.6f}')
+
+            lines += ["# HELP vp_http_responses_total Responses per endpoint and status code.", "# TYPE vp_http_responses_total counter"]
+            for endpoint, stats in endpoints:
+                for status, count in sorted(stats.responses.items()):
+                    lines.append(f'vp_http_responses_total{{endpoint="{endpoint}",status="{status}"}} {count}')
+
+            lines += ["# HELP vp_db_queries_total SQL statements executed while serving requests.", "# TYPE vp_db_queries_total counter"]
+            lines += [f'vp_db_queries_total{{endpoint="{endpoint}"}} {stats.queries}' for endpoint, stats in endpoints]
+            lines += ["# HELP vp_db_query_seconds_total Time spent in SQL while serving requests.", "# TYPE vp_db_query_seconds_total counter"]
+            lines += [f'vp_db_query_seconds_total{{endpoint="{endpoint}"}} {stats.query_seconds:.6f}' for endpoint, stats in endpoints]
+            lines += ["# HELP vp_slow_requests_total Requests slower than the slow-request threshold.", "# TYPE vp_slow_requests_total counter"]
+            lines += [f'vp_slow_requests_total{{endpoint="{endpoint}"}} {stats.slow}' for endpoint, stats in endpoints]
+
+        response_cache = current_app.extensions.get("response_cache")
+        if response_cache is not None:
+            cache_stats = response_cache.stats()
+            lines += [
+                "# HELP vp_cache_hits_total Response cache hits.", "# TYPE vp_cache_hits_total counter",
+                f"vp_cache_hits_total {cache_stats['hits']}",
+                "# HELP vp_cache_misses_total Response cache misses.", "# TYPE vp_cache_misses_total counter",
+                f"vp_cache_misses_total {cache_stats['misses']}"
+            ]
+        write_queue = current_app.extensions.get("write_queue")
+        if write_queue is not None and write_queue.enabled:
+            queue_stats = write_queue.stats()
+            lines += [
+                "# HELP vp_write_queue_batches_total Transactions committed by the group-commit writer.", "# TYPE vp_write_queue_batches_total counter",
+                f"vp_write_queue_batches_total {queue_stats['batches']}",
+                "# HELP vp_write_queue_operations_total Transitions applied by the group-commit writer.", "# TYPE vp_write_queue_operations_total counter",
+                f"vp_write_queue_operations_total {queue_stats['operations']}",
+                "# HELP vp_write_queue_depth Transitions waiting for the writer.", "# TYPE vp_write_queue_depth gauge",
+                f"vp_write_queue_depth {queue_stats['queued']}"
+            ]
+        feed = current_app.extensions.get("availability_feed")
+        if feed is not None and feed.enabled:
+            feed_stats = feed.stats()
+            lines += [
+                "# HELP vp_availability_streams Open availability event streams.", "# TYPE vp_availability_streams gauge",
+                f"vp_availability_streams {feed_stats['open_streams']}",
+                "# HELP vp_availability_events_total Availability events published by this worker.", "# TYPE vp_availability_events_total counter",
+                f"vp_availability_events_total {feed_stats['events_published']}"
+            ]
+        lines += ["# HELP vp_metrics_enabled Whether request instrumentation is on.", "# TYPE vp_metrics_enabled gauge", f"vp_metrics_enabled {int(self.enabled)}"]
+        return "\n".join(lines) + "\n"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and "_metrics_started" in g:
+        conn.info.setdefault("_metrics_query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("_metrics_query_started")
+    if started and has_request_context() and "_metrics_started" in g:
+        g._metrics_queries += 1
+        g._metrics_query_seconds += time.perf_counter() - started.pop()
+
+
+metrics = RequestMetrics()
+metrics_bp = Blueprint("metrics_bp", __name__)
+
+
+@metrics_bp.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    if not metrics.token:
+        return jsonify({"message": "Metrics endpoint is disabled"}), 404
+    if not hmac.compare_digest(request.headers.get("Authorization", "").encode(), f"Bearer {metrics.token}".encode()):
+        return jsonify({"message": "Invalid or missing metrics token"}), 401
+    return Response(metrics.render_prometheus(), mimetype="text/plain; version=0.0.4")
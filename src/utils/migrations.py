@@ -0,0 +1,159 @@
+"""Versioned schema migrations for databases created by earlier releases.
+
+``db.create_all()`` only creates missing tables, so changes to existing tables are
+applied here. Each migration is idempotent, which lets a freshly created database
+run through the same steps and simply record the current version.
+"""
+from sqlalchemy import insert, inspect, select, text
+
+from src.extensions import db
+from src.models.models import DataVersion, IdempotencyKey, OccupancyHourly, ParkingLot, ParkingSpot, Reservation, ReservationHistory, RevokedToken, RollupWatermark, User, UserStats
+from src.utils.cache import SPOT_STATUS_KEYS, LOT_DETAILS_KEYS
+from src.utils.occupancy import repair_lot_counters
+from src.utils.user_stats import rebuild_user_stats
+
+VERSION_TABLE = "schema_version"
+
+
+def _add_lot_counters():
+    columns = {column["name"] for column in inspect(db.engine).get_columns("parking_lots")}
+    missing = [name for name in ("available_count", "occupied_count") if name not in columns]
+    for name in missing:
+        db.session.execute(text(f"ALTER TABLE parking_lots ADD COLUMN {name} INTEGER NOT NULL DEFAULT 0"))
+    db.session.commit()
+    if missing:
+        repair_lot_counters()
+        db.session.commit()
+
+
+def _create_indexes(model, *names):
+    # By name: the model may declare indexes on columns a later migration adds
+    indexes = {index.name: index for index in model.__table__.indexes}
+    for name in names:
+        indexes[name].create(db.engine, checkfirst=True)
+
+
+def _add_hot_path_indexes():
+    _create_indexes(ParkingLot, "ix_parking_lots_pin_code")
+    _create_indexes(ParkingSpot, "ix_parking_spots_lot_status_number")
+    _create_indexes(Reservation, "ix_reservations_user_parking", "ix_reservations_spot_leaving")
+
+
+def _add_revoked_tokens():
+    RevokedToken.__table__.create(db.engine, checkfirst=True)
+
+
+def _add_reservation_keyset_index():
+    _create_indexes(Reservation, "ix_reservations_user_id")
+
+
+def _add_user_stats():
+    UserStats.__table__.create(db.engine, checkfirst=True)
+    # reservation_history only exists from migration 9 on, and starts out empty
+    rebuild_user_stats(models=(Reservation,))
+
+
+def _add_occupancy_rollup():
+    for model in (OccupancyHourly, RollupWatermark):
+        model.__table__.create(db.engine, checkfirst=True)
+    _create_indexes(Reservation, "ix_reservations_leaving")
+
+
+def _add_idempotency_keys():
+    IdempotencyKey.__table__.create(db.engine, checkfirst=True)
+
+
+def _add_reservation_holds():
+    columns = {column["name"] for column in inspect(db.engine).get_columns("reservations")}
+    if "hold_expires_at" not in columns:
+        # Bookings made before holds existed keep no expiry
+        db.session.execute(text("ALTER TABLE reservations ADD COLUMN hold_expires_at DATETIME"))
+        db.session.commit()
+    _create_indexes(Reservation, "ix_reservations_hold_expires")
+
+
+def _add_reservation_history():
+    ReservationHistory.__table__.create(db.engine, checkfirst=True)
+
+
+def _add_reservation_closed_at():
+    for table, index in (("reservations", "ix_reservations_closed"), ("reservation_history", "ix_reservation_history_closed")):
+        columns = {column["name"] for column in inspect(db.engine).get_columns(table)}
+        if "closed_at" not in columns:
+            db.session.execute(text(f"ALTER TABLE {table} ADD COLUMN closed_at DATETIME"))
+        # Rows closed so far were rolled up by leaving time, which keeps the watermark valid
+        db.session.execute(text(f"UPDATE {table} SET closed_at = leaving_timestamp WHERE closed_at IS NULL AND leaving_timestamp IS NOT NULL"))
+        db.session.commit()
+    _create_indexes(Reservation, "ix_reservations_closed")
+    _create_indexes(ReservationHistory, "ix_reservation_history_closed")
+    db.session.execute(text("DROP INDEX IF EXISTS ix_reservation_history_leaving")) # Superseded by the closed_at index
+    db.session.commit()
+
+
+def _add_data_versions():
+    DataVersion.__table__.create(db.engine, checkfirst=True)
+    seeded = set(db.session.execute(select(DataVersion.name)).scalars())
+    names = sorted(set(SPOT_STATUS_KEYS + LOT_DETAILS_KEYS) - seeded)
+    if names:
+        db.session.execute(insert(DataVersion), [{"name": name, "value": 0} for name in names])
+        db.session.commit()
+
+
+MIGRATIONS = [
+    (1, "Add maintained occupancy counters to parking_lots", _add_lot_counters),
+    (2, "Add composite indexes for hot lookups", _add_hot_path_indexes),
+    (3, "Add shared JWT revocation table", _add_revoked_tokens),
+    (4, "Add keyset index for reservation history pages", _add_reservation_keyset_index),
+    (5, "Add maintained per-user reservation stats", _add_user_stats),
+    (6, "Add hourly occupancy rollup tables", _add_occupancy_rollup),
+    (7, "Add idempotency keys for batched gate events", _add_idempotency_keys),
+    (8, "Add expiring holds to reservations", _add_reservation_holds),
+    (9, "Add reservation_history for archived reservations", _add_reservation_history),
+    (10, "Roll occupancy up by server-set closing time", _add_reservation_closed_at),
+    (11, "Add data versions for the cached listings' ETags", _add_data_versions),
+]
+
+
+def current_version():
+    if not inspect(db.engine).has_table(VERSION_TABLE):
+        return 0
+    version = db.session.execute(text(f"SELECT MAX(version) FROM {VERSION_TABLE}")).scalar()
+    return version or 0
+
+
+def run_migrations():
+    """Apply every pending migration in order and return the versions applied."""
+    db.session.execute(text(f"CREATE TABLE IF NOT EXISTS {VERSION_TABLE} (version INTEGER PRIMARY KEY, description VARCHAR(200) NOT NULL)"))
+    db.session.commit()
+
+    applied = []
+    version = current_version()
+    for migration_version, description, migrate in MIGRATIONS:
+        if migration_version <= version:
+            continue
+        migrate()
+        db.session.execute(
+            text(f"INSERT INTO {VERSION_TABLE} (version, description) VALUES (:version, :description)"),
+            {"version": migration_version, "description": description}
+        )
+        db.session.commit()
+        applied.append(migration_version)
+    return applied
+
+
+def init_database(admin_username, admin_password):
+    """Create missing tables, apply pending migrations and make sure the admin account exists.
+
+    This is what ``flask init-db`` runs once per deployment; workers never do it
+    while booting. Returns the migrations applied and whether the admin was created.
+    """
+    from werkzeug.security import generate_password_hash
+
+    db.create_all()
+    applied = run_migrations()
+    admin_created = False
+    if db.session.execute(select(User.id).where(User.username == admin_username)).first() is None:
+        db.session.add(User(username=admin_username, password_hash=generate_password_hash(admin_password), role="admin"))
+        db.session.commit()
+        admin_created = True
+    return {"migrations": applied, "admin_created": admin_created}
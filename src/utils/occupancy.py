@@ -0,0 +1,51 @@
+from sqlalchemy import case, func, update
+
+from src.extensions import db
+from src.models.models import ParkingLot, ParkingSpot
+
+
+def adjust_lot_counters(lot_id, available=0, occupied=0):
+    """Apply a delta to a lot's occupancy counters inside the current transaction."""
+    if not available and not occupied:
+        return
+    db.session.execute(
+        update(ParkingLot)
+        .where(ParkingLot.id == lot_id)
+        .values(
+            available_count=ParkingLot.available_count + available,
+            occupied_count=ParkingLot.occupied_count + occupied
+        )
+        .execution_options(synchronize_session=False) # Counters are never read back inside the transaction
+    )
+
+
+def repair_lot_counters(lot_id=None):
+    """Recompute the occupancy counters from parking_spots and fix any drift, inside the current transaction.
+
+    Returns one entry per lot whose stored counters did not match its spots; the caller commits.
+    """
+    available = func.coalesce(func.sum(case((ParkingSpot.status == "A", 1), else_=0)), 0)
+    occupied = func.coalesce(func.sum(case((ParkingSpot.status == "O", 1), else_=0)), 0)
+    query = (
+        db.session.query(ParkingLot.id, ParkingLot.available_count, ParkingLot.occupied_count, available, occupied)
+        .outerjoin(ParkingSpot, ParkingSpot.lot_id == ParkingLot.id)
+        .group_by(ParkingLot.id)
+    )
+    if lot_id is not None:
+        query = query.filter(ParkingLot.id == lot_id)
+
+    drifted = []
+    for lid, stored_available, stored_occupied, actual_available, actual_occupied in query.all():
+        if (stored_available, stored_occupied) != (actual_available, actual_occupied):
+            drifted.append({
+                "lot_id": lid,
+                "available_count": [stored_available, actual_available],
+                "occupied_count": [stored_occupied, actual_occupied]
+            })
+            db.session.execute(
+                update(ParkingLot)
+                .where(ParkingLot.id == lid)
+                .values(available_count=actual_available, occupied_count=actual_occupied)
+            )
+    return drifted
+
@@ -0,0 +1,51 @@
+"""Keyset pagination helpers shared by the listing endpoints.
+
+A page is requested with ``limit`` and ``cursor``, the sort key of the last row
+of the previous page. The next cursor is returned in the ``X-Next-Cursor``
+header. Pages are read with ``WHERE key > cursor ... LIMIT limit + 1`` on an
+indexed key, so a deep page costs the same as the first one.
+"""
+MAX_PAGE_SIZE = 1000 # Upper bound for paginated listings
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def _non_negative_int(value):
+    if value is None:
+        return None
+    value = int(value)
+    if value < 0:
+        raise ValueError(value)
+    return value
+
+
+def page_args(args, default_limit=None):
+    """Parse ``limit`` and ``cursor`` from the query string.
+
+    Returns ``(limit, cursor)``; ``cursor`` is None on the first page and ``limit``
+    is ``default_limit`` when omitted (None meaning unpaginated). Raises ValueError
+    with a client-facing message for invalid values.
+    """
+    try:
+        limit = _non_negative_int(args.get("limit"))
+        cursor = _non_negative_int(args.get("cursor"))
+    except ValueError:
+        raise ValueError("limit and cursor must be non-negative integers")
+    if limit is None:
+        limit = default_limit
+    if limit is not None and not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    return limit, cursor
+
+
+def split_page(rows, limit, key):
+    """Trim the ``limit + 1`` rows read for a page and return ``(rows, next_cursor)``."""
+    if limit is None or len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, key(rows[-1])
+
+
+def with_next_cursor(response, next_cursor):
+    if next_cursor is not None:
+        response.headers[NEXT_CURSOR_HEADER] = str(next_cursor)
+    return response
@@ -0,0 +1,178 @@
+import csv
+import json
+
+from sqlalchemy import delete, exists, insert, literal, select
+
+from src.extensions import db
+from src.models.models import ParkingLot, ParkingSpot, Reservation, ReservationHistory
+from src.utils.availability import availability_feed
+from src.utils.cache import SPOT_STATUS_KEYS
+from src.utils.data_versions import bump_versions
+
+LOT_FIELDS = ["prime_location_name", "price", "address", "pin_code", "number_of_spots"]
+MAX_REPORTED_ERRORS = 1000
+
+
+def insert_spot_range(lot_id, first_number, last_number):
+    """Insert available spots ``first_number..last_number`` of a lot with one INSERT ... SELECT.
+
+    The spot numbers come from a recursive CTE, so no per-spot objects or parameter
+    sets are built in Python.
+    """
+    if last_number < first_number:
+        return 0
+    seq = select(literal(first_number).label("n")).cte("spot_numbers", recursive=True)
+    seq = seq.union_all(select(seq.c.n + 1).where(seq.c.n < last_number))
+    db.session.execute(
+        insert(ParkingSpot).from_select(
+            ["lot_id", "spot_number", "status"],
+            select(literal(lot_id), seq.c.n, literal("A"))
+        )
+    )
+    return last_number - first_number + 1
+
+
+def delete_free_spots(lot_id, count):
+    """Delete up to ``count`` of a lot's highest-numbered available spots with one DELETE.
+
+    Spots that reservations still point at are kept. Returns the number deleted;
+    when it falls short of ``count`` the caller should roll back.
+    """
+    doomed = (
+        select(ParkingSpot.id)
+        .where(
+            ParkingSpot.lot_id == lot_id,
+            ParkingSpot.status == "A",
+            ~exists().where(Reservation.spot_id == ParkingSpot.id),
+            ~exists().where(ReservationHistory.spot_id == ParkingSpot.id)
+        )
+        .order_by(ParkingSpot.spot_number.desc())
+        .limit(count)
+    )
+    return db.session.execute(
+        delete(ParkingSpot).where(ParkingSpot.id.in_(doomed)).execution_options(synchronize_session=False)
+    ).rowcount
+
+
+def validate_lot(record):
+    """Check one import record with the same rules as create_parking_lot.
+
+    Returns ``(values, None)`` for a valid record or ``(None, message)``.
+    """
+    missing = [field for field in LOT_FIELDS if record.get(field) in (None, "")]
+    if missing:
+        return None, f"Missing required fields: {', '.join(missing)}"
+
+    number_of_spots = record["number_of_spots"]
+    price = record["price"]
+    if isinstance(number_of_spots, str):
+        try:
+            number_of_spots = int(number_of_spots)
+        except ValueError:
+            pass
+    if isinstance(price, str):
+        try:
+            price = float(price)
+        except ValueError:
+            pass
+
+    if isinstance(number_of_spots, bool) or not isinstance(number_of_spots, int) or number_of_spots <= 0:
+        return None, "Number of spots must be a positive integer"
+    if isinstance(price, bool) or not isinstance(price, (int, float)) or price < 0:
+        return None, "Price must be a non-negative number"
+
+    return {
+        "prime_location_name": str(record["prime_location_name"]),
+        "price": price,
+        "address": str(record["address"]),
+        "pin_code": str(record["pin_code"]),
+        "number_of_spots": number_of_spots,
+        "available_count": number_of_spots,
+        "occupied_count": 0
+    }, None
+
+
+def read_records(text_stream, fmt):
+    """Yield ``(line_number, record, error)`` from a CSV or JSON-lines text stream."""
+    if fmt == "csv":
+        reader = csv.DictReader(text_stream)
+        for record in reader:
+            yield reader.line_num, record, None
+    elif fmt == "jsonl":
+        for line_number, line in enumerate(text_stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield line_number, None, f"Invalid JSON: {e}"
+                continue
+            if not isinstance(record, dict):
+                yield line_number, None, "Each line must be a JSON object"
+                continue
+            yield line_number, record, None
+    else:
+        raise ValueError(f"Unsupported import format: {fmt}")
+
+
+def _insert_chunk(chunk):
+    """Insert a chunk of validated lots and their spots in one transaction."""
+    lot_ids = db.session.execute(
+        insert(ParkingLot).returning(ParkingLot.id, sort_by_parameter_order=True),
+        [values for _, values in chunk]
+    ).scalars().all()
+    spots = 0
+    for lot_id, (_, values) in zip(lot_ids, chunk):
+        spots += insert_spot_range(lot_id, 1, values["number_of_spots"])
+    bump_versions(*SPOT_STATUS_KEYS)
+    db.session.commit()
+    availability_feed.lot_changed(*lot_ids)
+    return lot_ids, spots
+
+
+def import_lots(text_stream, fmt, chunk_size=100, dry_run=False, progress=None):
+    """Validate and import lots from a CSV or JSON-lines stream in chunked transactions.
+
+    Invalid rows are skipped and reported; a chunk that fails to insert is rolled
+    back and its rows are reported as failed. ``progress`` is called with the running
+    report after every chunk.
+    """
+    report = {"processed_rows": 0, "created_lots": 0, "created_spots": 0, "failed_rows": 0, "errors": [], "dry_run": dry_run}
+
+    def record_error(line_number, message):
+        report["failed_rows"] += 1
+        if len(report["errors"]) < MAX_REPORTED_ERRORS:
+            report["errors"].append({"line": line_number, "message": message})
+
+    def flush(chunk):
+        if not chunk:
+            return
+        if dry_run:
+            report["created_lots"] += len(chunk)
+            report["created_spots"] += sum(values["number_of_spots"] for _, values in chunk)
+        else:
+            try:
+                lot_ids, spots = _insert_chunk(chunk)
+                report["created_lots"] += len(lot_ids)
+                report["created_spots"] += spots
+            except Exception as e:
+                db.session.rollback()
+                for line_number, _ in chunk:
+                    record_error(line_number, f"Insert failed: {e}")
+        if progress:
+            progress(report)
+
+    chunk = []
+    for line_number, record, error in read_records(text_stream, fmt):
+        report["processed_rows"] += 1
+        if error is None:
+            values, error = validate_lot(record)
+        if error is not None:
+            record_error(line_number, error)
+            continue
+        chunk.append((line_number, values))
+        if len(chunk) >= chunk_size:
+            flush(chunk)
+            chunk = []
+    flush(chunk)
+    return report
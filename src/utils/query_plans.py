@@ -0,0 +1,66 @@
+"""EXPLAIN QUERY PLAN guard for the hot lookups (SQLite only)."""
+from sqlalchemy import select
+
+from src.extensions import db
+from src.models.models import ParkingLot, ParkingSpot, Reservation, ReservationHistory
+
+# Tables the hot lookups must reach through an index
+HOT_TABLES = ("parking_lots", "parking_spots", "reservations", "reservation_history")
+
+
+def hot_queries():
+    return {
+        "first free spot in lot": select(ParkingSpot.id, ParkingSpot.spot_number)
+            .where(ParkingSpot.lot_id == 1, ParkingSpot.status == "A")
+            .order_by(ParkingSpot.spot_number),
+        "reservation history of user": select(Reservation.id)
+            .where(Reservation.user_id == 1)
+            .order_by(Reservation.parking_timestamp.desc()),
+        "reservation history page": select(Reservation.id)
+            .where(Reservation.user_id == 1, Reservation.id < 1000)
+            .order_by(Reservation.id.desc())
+            .limit(50),
+        "open reservation of spot": select(Reservation.id)
+            .where(Reservation.spot_id == 1, Reservation.leaving_timestamp.is_(None)),
+        "lapsed reservation holds": select(Reservation.id)
+            .where(Reservation.hold_expires_at <= "2000-01-01 00:00:00")
+            .order_by(Reservation.hold_expires_at)
+            .limit(1000),
+        "reservations closed since the rollup": select(Reservation.id)
+            .where(Reservation.closed_at > "2000-01-01 00:00:00", Reservation.closed_at <= "2000-01-08 00:00:00"),
+        "archivable reservations": select(Reservation.id)
+            .where(Reservation.leaving_timestamp < "2000-01-01 00:00:00")
+            .order_by(Reservation.leaving_timestamp)
+            .limit(1000),
+        "archived history page": select(ReservationHistory.id)
+            .where(ReservationHistory.user_id == 1, ReservationHistory.id < 1000)
+            .order_by(ReservationHistory.id.desc())
+            .limit(50),
+        "lots by pin code": select(ParkingLot.id).where(ParkingLot.pin_code == "000000"),
+    }
+
+
+def explain(statement):
+    compiled = statement.compile(db.engine, compile_kwargs={"literal_binds": True})
+    rows = db.session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}")
+    return [row[-1] for row in rows]
+
+
+def _is_regression(detail):
+    # Older SQLite releases print "SCAN TABLE <name>"
+    words = detail.replace("SCAN TABLE ", "SCAN ").split()
+    if words[:1] == ["SCAN"] and words[1] in HOT_TABLES and "INDEX" not in words:
+        return True
+    return detail.startswith("USE TEMP B-TREE")
+
+
+def check_query_plans():
+    """Return ``{name: plan}`` for every hot query that needs a table scan or a sort."""
+    if db.engine.dialect.name != "sqlite":
+        return {}
+    regressions = {}
+    for name, statement in hot_queries().items():
+        plan = explain(statement)
+        if any(_is_regression(detail) for detail in plan):
+            regressions[name] = plan
+    return regressions
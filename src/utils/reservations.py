@@ -0,0 +1,146 @@
+"""Reservation state transitions (book, park, vacate).
+
+Each transition runs inside a transaction owned by the write queue: it may be
+batched with other transitions by the writer thread or applied inline, so it
+never commits itself, returns plain data and defers in-memory side effects
+(allocator, cache) to ``write_queue.after_commit``.
+"""
+import datetime
+
+from sqlalchemy import update
+
+from src.extensions import db
+from src.models.models import ParkingLot, ParkingSpot, Reservation
+from src.utils.availability import availability_feed
+from src.utils.cache import cache, SPOT_STATUS_KEYS
+from src.utils.data_versions import bump_versions
+from src.utils.holds import hold_sweeper
+from src.utils.occupancy import adjust_lot_counters
+from src.utils.spot_allocator import spot_allocator
+from src.utils.user_stats import record_booking, record_parked, record_vacated
+from src.utils.write_queue import write_queue
+
+
+class TransitionError(Exception):
+    """A transition that is not allowed in the reservation's current state."""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def _owned_reservation(reservation_id, user_id):
+    reservation = db.session.get(Reservation, reservation_id)
+    if reservation is None:
+        raise TransitionError("Reservation not found", 404)
+    if reservation.user_id != user_id:
+        raise TransitionError("Unauthorized to modify this reservation", 403)
+    return reservation
+
+
+def book_spot(user_id, lot_id):
+    """Claim the lowest free spot of a lot and open a reservation holding it until the hold lapses."""
+    claimed_spot = spot_allocator.claim(lot_id)
+    if not claimed_spot:
+        raise TransitionError("No available parking spots in this lot", 404)
+    spot_id, spot_number = claimed_spot
+    write_queue.on_rollback(spot_allocator.mark_available, lot_id, spot_id, spot_number)
+    adjust_lot_counters(lot_id, available=-1, occupied=1)
+
+    hold_expires_at = hold_sweeper.deadline(datetime.datetime.utcnow())
+    reservation = Reservation(spot_id=spot_id, user_id=user_id, hold_expires_at=hold_expires_at)
+    db.session.add(reservation)
+    db.session.flush()
+    record_booking(user_id)
+    bump_versions(*SPOT_STATUS_KEYS)
+    write_queue.after_commit(cache.invalidate, *SPOT_STATUS_KEYS)
+    write_queue.after_commit(availability_feed.lot_changed, lot_id)
+    write_queue.after_commit(hold_sweeper.schedule, reservation.id, hold_expires_at)
+    return {
+        "reservation_id": reservation.id,
+        "spot_id": spot_id,
+        "spot_number": spot_number,
+        "lot_id": lot_id,
+        "hold_expires_at": hold_expires_at.isoformat() if hold_expires_at else None
+    }
+
+
+def park_reservation(reservation_id, user_id):
+    """Mark the reservation's vehicle as parked."""
+    reservation = _owned_reservation(reservation_id, user_id)
+    if reservation.parking_timestamp:
+        raise TransitionError("Vehicle already marked as parked for this reservation")
+    now = datetime.datetime.utcnow()
+    if reservation.leaving_timestamp or (reservation.hold_expires_at and reservation.hold_expires_at <= now):
+        raise TransitionError("Reservation hold has expired; book again", 409)
+
+    spot = db.session.get(ParkingSpot, reservation.spot_id)
+    if not spot:
+        raise TransitionError("Associated parking spot not found", 404)
+
+    # Bookings claim their spot up front; older reservations still have to win it here
+    claimed = db.session.execute(
+        update(ParkingSpot)
+        .where(ParkingSpot.id == spot.id, ParkingSpot.status == "A")
+        .values(status="O")
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if claimed:
+        adjust_lot_counters(spot.lot_id, available=-1, occupied=1)
+        write_queue.after_commit(availability_feed.lot_changed, spot.lot_id)
+    else:
+        holder = Reservation.query.filter(
+            Reservation.spot_id == spot.id,
+            Reservation.leaving_timestamp.is_(None),
+            Reservation.id != reservation.id
+        ).first()
+        if holder:
+            raise TransitionError("Associated parking spot is held by another reservation", 409)
+
+    reservation.parking_timestamp = now
+    reservation.hold_expires_at = None
+    record_parked(user_id, reservation.id, reservation.parking_timestamp)
+    write_queue.after_commit(spot_allocator.mark_unavailable, spot.lot_id, spot.spot_number)
+    bump_versions(*SPOT_STATUS_KEYS)
+    write_queue.after_commit(cache.invalidate, *SPOT_STATUS_KEYS)
+    return {"parking_timestamp": reservation.parking_timestamp.isoformat()}
+
+
+def vacate_reservation(reservation_id, user_id):
+    """Close the reservation, free its spot and compute the parking cost."""
+    reservation = _owned_reservation(reservation_id, user_id)
+    if not reservation.parking_timestamp:
+        raise TransitionError("Vehicle was never marked as parked for this reservation")
+    if reservation.leaving_timestamp:
+        raise TransitionError("Vehicle already marked as vacated for this reservation")
+
+    spot = db.session.get(ParkingSpot, reservation.spot_id)
+    if not spot:
+        raise TransitionError("Associated parking spot not found", 404)
+
+    released = db.session.execute(
+        update(ParkingSpot)
+        .where(ParkingSpot.id == spot.id, ParkingSpot.status == "O")
+        .values(status="A")
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if released:
+        adjust_lot_counters(spot.lot_id, available=1, occupied=-1)
+    reservation.leaving_timestamp = reservation.closed_at = datetime.datetime.utcnow()
+
+    parking_duration_hours = (reservation.leaving_timestamp - reservation.parking_timestamp).total_seconds() / 3600
+    lot = db.session.get(ParkingLot, spot.lot_id)
+    price_per_hour = lot.price if lot else 0
+    reservation.parking_cost = round(max(0, parking_duration_hours * price_per_hour), 2)
+    record_vacated(user_id, reservation.id, reservation.parking_cost, parking_duration_hours * 60)
+
+    write_queue.after_commit(spot_allocator.mark_available, spot.lot_id, spot.id, spot.spot_number)
+    bump_versions(*SPOT_STATUS_KEYS)
+    write_queue.after_commit(cache.invalidate, *SPOT_STATUS_KEYS)
+    write_queue.after_commit(availability_feed.lot_changed, spot.lot_id)
+    return {
+        "leaving_timestamp": reservation.leaving_timestamp.isoformat(),
+        "parking_duration_hours": round(parking_duration_hours, 2),
+        "parking_cost": reservation.parking_cost
+    }
@@ -0,0 +1,169 @@
+import heapq
+import threading
+
+from sqlalchemy import update
+
+from src.extensions import db
+from src.models.models import ParkingSpot
+
+
+class _LotFreeSpots:
+    """Min-heap of available spot numbers for a single lot.
+
+    Removals are lazy: a spot number stays in the heap until it reaches the top,
+    and is only considered free while it is present in ``members``.
+    """
+
+    def __init__(self):
+        self.heap = []
+        self.members = {}  # spot_number -> spot_id
+
+    def add(self, spot_number, spot_id):
+        if spot_number not in self.members:
+            self.members[spot_number] = spot_id
+            heapq.heappush(self.heap, spot_number)
+
+    def remove(self, spot_number):
+        self.members.pop(spot_number, None)
+        # Compact once stale entries dominate the heap
+        if len(self.heap) > 2 * len(self.members) + 64:
+            self.heap = list(self.members)
+            heapq.heapify(self.heap)
+
+    def pop(self):
+        candidate = self.peek()
+        if candidate is not None:
+            heapq.heappop(self.heap)
+            del self.members[candidate[1]]
+        return candidate
+
+    def peek(self):
+        while self.heap and self.heap[0] not in self.members:
+            heapq.heappop(self.heap)
+        if not self.heap:
+            return None
+        spot_number = self.heap[0]
+        return self.members[spot_number], spot_number
+
+
+class SpotAllocator:
+    """Per-lot index of available parking spots.
+
+    The index mirrors ``parking_spots.status == "A"`` so that the lowest-numbered
+    free spot of a lot can be found without a filtered, sorted scan. Each lot is
+    loaded on first use, kept in sync by the routes after each successful commit and can be
+    rebuilt from the database at any time with ``reconcile``.
+    """
+
+    def __init__(self):
+        self._lots = {}
+        self._lock = threading.RLock()
+
+    def init_app(self, app):
+        app.extensions["spot_allocator"] = self
+
+    def rebuild(self, lot_id=None):
+        """(Re)load the index from the database, for one lot or for all lots."""
+        query = db.session.query(ParkingSpot.lot_id, ParkingSpot.id, ParkingSpot.spot_number).filter(ParkingSpot.status == "A")
+        if lot_id is not None:
+            query = query.filter(ParkingSpot.lot_id == lot_id)
+
+        fresh = {}
+        for spot_lot_id, spot_id, spot_number in query:
+            fresh.setdefault(spot_lot_id, _LotFreeSpots()).add(spot_number, spot_id)
+
+        with self._lock:
+            if lot_id is None:
+                self._lots = fresh
+            else:
+                self._lots[lot_id] = fresh.get(lot_id, _LotFreeSpots())
+
+    def reconcile(self, lot_id=None):
+        """Rebuild the index from the database and return how many spots had drifted."""
+        with self._lock:
+            if lot_id is None:
+                before = {lid: dict(free.members) for lid, free in self._lots.items()}
+            else:
+                free = self._lots.get(lot_id)
+                before = {lot_id: dict(free.members)} if free else {}
+
+        self.rebuild(lot_id)
+
+        with self._lock:
+            drift = 0
+            for lid in before:  # Lots that were never loaded cannot have drifted
+                old = before[lid]
+                free = self._lots.get(lid)
+                new = free.members if free else {}
+                drift += len(set(old.items()) ^ set(new.items()))
+            return drift
+
+    def _lot(self, lot_id):
+        free = self._lots.get(lot_id)
+        if free is None:
+            # Lot created by another worker or never loaded: fall back to the database
+            self.rebuild(lot_id)
+            free = self._lots[lot_id]
+        return free
+
+    def first_available(self, lot_id):
+        """Return ``(spot_id, spot_number)`` of the lowest free spot in a lot, or None."""
+        with self._lock:
+            return self._lot(lot_id).peek()
+
+    def acquire(self, lot_id):
+        """Remove and return ``(spot_id, spot_number)`` of the lowest free spot, or None."""
+        with self._lock:
+            return self._lot(lot_id).pop()
+
+    def claim(self, lot_id, status="O"):
+        """Claim the lowest free spot of a lot inside the current transaction.
+
+        Each candidate from the index is taken with a compare-and-swap UPDATE that
+        only succeeds while the spot is still available, so concurrent bookings can
+        never end up with the same spot. A lost race moves on to the next candidate,
+        and an exhausted index is reloaded from the database once before giving up.
+        Returns ``(spot_id, spot_number)`` or None; the caller commits.
+        """
+        reloaded = False
+        while True:
+            candidate = self.acquire(lot_id)
+            if candidate is None:
+                if reloaded:
+                    return None
+                self.rebuild(lot_id)
+                reloaded = True
+                continue
+
+            spot_id, spot_number = candidate
+            result = db.session.execute(
+                update(ParkingSpot)
+                .where(ParkingSpot.id == spot_id, ParkingSpot.status == "A")
+                .values(status=status)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount == 1:
+                return candidate
+
+    def available_count(self, lot_id):
+        with self._lock:
+            return len(self._lot(lot_id).members)
+
+    def mark_available(self, lot_id, spot_id, spot_number):
+        with self._lock:
+            free = self._lots.get(lot_id)
+            if free is not None:
+                free.add(spot_number, spot_id)
+
+    def mark_unavailable(self, lot_id, spot_number):
+        with self._lock:
+            free = self._lots.get(lot_id)
+            if free is not None:
+                free.remove(spot_number)
+
+    def drop_lot(self, lot_id):
+        with self._lock:
+            self._lots.pop(lot_id, None)
+
+
+spot_allocator = SpotAllocator()
@@ -0,0 +1,120 @@
+"""Compact spot-status maps: a lot's spots as one run-length or bitmap string.
+
+A lot's statuses are read into a status vector, one byte per spot number
+(position ``n - 1`` holds spot ``n``, and ``-`` marks a number without a spot,
+e.g. after a deletion). Maps are encoded from the vector without building a
+dict per spot:
+
+- ``rle``: runs of ``<count><status>``, e.g. ``"12A3O1-4A"``;
+- ``bitmap``: base64 of one bit per spot number, most significant bit first,
+  set when the spot is available.
+
+A map's ``version`` is a digest of its vector. It changes only when a status
+does, and every worker derives the same one. Recent vectors are kept by
+version, so a client that sends the version it holds gets only the spot numbers
+that changed since.
+"""
+import base64
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+from sqlalchemy import select
+
+from src.models.models import ParkingSpot
+from src.utils.database import read_execute
+
+ENCODINGS = ("rle", "bitmap")
+GAP = ord("-")
+_RUNS = re.compile(rb"(.)\1*", re.S)
+_BITS = bytes(ord("1") if byte == ord("A") else ord("0") for byte in range(256))  # translate() table: available -> "1"
+
+
+def version_of(vector):
+    return hashlib.blake2b(vector, digest_size=8).hexdigest()
+
+
+def encode(vector, encoding="rle"):
+    if encoding == "bitmap":
+        if not vector:
+            return ""
+        bits = vector.translate(_BITS) + b"0" * (-len(vector) % 8)
+        return base64.b64encode(int(bits, 2).to_bytes(len(bits) // 8, "big")).decode()
+    return "".join(f"{match.end() - match.start()}{chr(match.group()[0])}" for match in _RUNS.finditer(vector))
+
+
+def diff(old, new):
+    """Spot numbers whose status differs between two vectors, as ``[[first_number, statuses], ...]``.
+
+    Each entry is a run of consecutive changed numbers with their new statuses;
+    numbers past the end of the shorter vector count as gaps.
+    """
+    length = max(len(old), len(new))
+    old = old + bytes([GAP]) * (length - len(old))
+    new = new + bytes([GAP]) * (length - len(new))
+    changes = []
+    start = None
+    for index in range(length + 1):
+        changed = index < length and old[index] != new[index]
+        if changed and start is None:
+            start = index
+        elif not changed and start is not None:
+            changes.append([start + 1, new[start:index].decode()])
+            start = None
+    return changes
+
+
+class SpotMaps:
+    """Loads status vectors and serves maps and diffs, keeping recent vectors by version."""
+
+    def __init__(self):
+        self.history_size = 1024
+        self._history = OrderedDict()  # (lot_id, version) -> vector
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.history_size = app.config.get("SPOT_MAP_HISTORY_SIZE", 1024)
+        app.extensions["spot_maps"] = self
+
+    def vectors(self, first_lot_id, last_lot_id):
+        """Status vectors of the lots with ids in ``[first_lot_id, last_lot_id]``, by lot id, in one query."""
+        vectors = {}
+        rows = read_execute(
+            select(ParkingSpot.lot_id, ParkingSpot.spot_number, ParkingSpot.status)
+            .where(ParkingSpot.lot_id >= first_lot_id, ParkingSpot.lot_id <= last_lot_id)
+            .execution_options(yield_per=5000)
+        )
+        for lot_id, spot_number, status in rows:
+            vector = vectors.get(lot_id)
+            if vector is None:
+                vector = vectors[lot_id] = bytearray()
+            if spot_number > len(vector):
+                vector.extend(bytes([GAP]) * (spot_number - len(vector)))
+            vector[spot_number - 1] = ord(status)
+        return {lot_id: bytes(vector) for lot_id, vector in vectors.items()}
+
+    def remember(self, lot_id, vector):
+        """Keep ``vector`` for later diffs and return its version."""
+        version = version_of(vector)
+        with self._lock:
+            self._history[(lot_id, version)] = vector
+            self._history.move_to_end((lot_id, version))
+            while len(self._history) > self.history_size:
+                self._history.popitem(last=False)
+        return version
+
+    def recall(self, lot_id, version):
+        with self._lock:
+            return self._history.get((lot_id, version))
+
+    def lot_map(self, lot_id, vector, encoding="rle", since=None):
+        """The map of one lot or, when the vector of version ``since`` is known, the diff from it."""
+        version = self.remember(lot_id, vector)
+        old = self.recall(lot_id, since) if since is not None else None
+        if old is not None:
+            return {"lot_id": lot_id, "version": version, "since": since, "length": len(vector), "changes": diff(old, vector)}
+        return {"lot_id": lot_id, "version": version, "length": len(vector), "encoding": encoding, "map": encode(vector, encoding)}
+
+
+spot_maps = SpotMaps()
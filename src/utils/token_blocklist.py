@@ -0,0 +1,146 @@
+import datetime
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import delete
+
+from src.extensions import db
+from src.models.models import RevokedToken
+
+
+def _utc_from_timestamp(timestamp):
+    return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).replace(tzinfo=None)
+
+
+class MemoryBlocklist:
+    """Process-local blocklist; only suitable for a single worker."""
+
+    def __init__(self):
+        self._entries = {}  # jti -> exp (unix timestamp)
+        self._lock = threading.Lock()
+
+    def add(self, jti, exp):
+        with self._lock:
+            self._entries[jti] = exp
+            if len(self._entries) % 256 == 0:
+                self._purge_locked()
+
+    def contains(self, jti):
+        exp = self._entries.get(jti)
+        return exp is not None and exp > time.time()
+
+    def purge(self):
+        with self._lock:
+            return self._purge_locked()
+
+    def _purge_locked(self):
+        now = time.time()
+        expired = [jti for jti, exp in self._entries.items() if exp <= now]
+        for jti in expired:
+            del self._entries[jti]
+        return len(expired)
+
+
+class DatabaseBlocklist:
+    """Blocklist in the ``revoked_tokens`` table, shared by every worker on the database.
+
+    Expired rows are ignored by lookups and deleted every ``purge_every`` revocations.
+    """
+
+    def __init__(self, purge_every=100):
+        self.purge_every = purge_every
+        self._adds = 0
+
+    def add(self, jti, exp):
+        db.session.merge(RevokedToken(jti=jti, expires_at=_utc_from_timestamp(exp)))
+        db.session.commit()
+        self._adds += 1
+        if self._adds % self.purge_every == 0:
+            self.purge()
+
+    def contains(self, jti):
+        token = db.session.get(RevokedToken, jti)
+        return token is not None and token.expires_at > datetime.datetime.utcnow()
+
+    def purge(self):
+        result = db.session.execute(delete(RevokedToken).where(RevokedToken.expires_at <= datetime.datetime.utcnow()))
+        db.session.commit()
+        return result.rowcount
+
+
+class RedisBlocklist:
+    """Blocklist in Redis; each entry expires on its own when the token does."""
+
+    def __init__(self, client=None, url="redis://localhost:6379/0", prefix="vp:revoked:"):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+
+    def add(self, jti, exp):
+        ttl = int(exp - time.time()) + 1
+        if ttl > 0:
+            self.client.set(self.prefix + jti, 1, ex=ttl)
+
+    def contains(self, jti):
+        return bool(self.client.exists(self.prefix + jti))
+
+    def purge(self):
+        return 0  # Redis expires entries itself
+
+
+class TokenBlocklist:
+    """Revoked-token store with a short-lived cache of tokens known not to be revoked.
+
+    Every authenticated request checks its token, and almost all of them are not
+    revoked, so negative answers are remembered for ``negative_ttl`` seconds. A
+    revocation made by this process drops the entry at once; one made by another
+    worker is seen once the cached answer expires.
+    """
+
+    def __init__(self):
+        self.backend = MemoryBlocklist()
+        self.negative_ttl = 5
+        self.negative_cache_size = 10000
+        self._not_revoked = OrderedDict()  # jti -> monotonic expiry
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        backend = app.config.get("JWT_BLOCKLIST_BACKEND", "database")
+        if backend == "redis":
+            self.backend = RedisBlocklist(url=app.config.get("JWT_BLOCKLIST_REDIS_URL", "redis://localhost:6379/0"))
+        elif backend == "memory":
+            self.backend = MemoryBlocklist()
+        else:
+            self.backend = DatabaseBlocklist()
+        self.negative_ttl = app.config.get("JWT_BLOCKLIST_NEGATIVE_TTL", 5)
+        app.extensions["token_blocklist"] = self
+
+    def revoke(self, jti, exp):
+        self.backend.add(jti, exp)
+        with self._lock:
+            self._not_revoked.pop(jti, None)
+
+    def is_revoked(self, jti):
+        now = time.monotonic()
+        with self._lock:
+            expires_at = self._not_revoked.get(jti)
+            if expires_at is not None and expires_at > now:
+                return False
+
+        revoked = self.backend.contains(jti)
+        if not revoked and self.negative_ttl > 0:
+            with self._lock:
+                self._not_revoked[jti] = now + self.negative_ttl
+                self._not_revoked.move_to_end(jti)
+                while len(self._not_revoked) > self.negative_cache_size:
+                    self._not_revoked.popitem(last=False)
+        return revoked
+
+    def purge_expired(self):
+        return self.backend.purge()
+
+
+token_blocklist = TokenBlocklist()
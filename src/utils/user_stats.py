@@ -0,0 +1,135 @@
+"""Per-user reservation aggregates behind the user dashboard.
+
+The ``record_*`` helpers apply deltas inside the transaction of the reservation
+transition that caused them, so the stats commit or roll back together with it.
+``rebuild_user_stats`` recomputes everything from the live and archived reservations.
+"""
+from sqlalchemy import case, delete, func, insert, or_, select, update
+
+from src.extensions import db
+from src.models.models import Reservation, UserStats
+from src.utils.archive import RESERVATION_MODELS
+
+
+def _apply(user_id, **values):
+    """UPDATE the user's stats row, creating it first when the user has none yet."""
+    updated = db.session.execute(
+        update(UserStats)
+        .where(UserStats.user_id == user_id)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not updated:
+        db.session.execute(insert(UserStats).values(user_id=user_id))
+        db.session.execute(
+            update(UserStats)
+            .where(UserStats.user_id == user_id)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+
+
+def _latest_open_reservation(user_id, excluding=None):
+    query = select(func.max(Reservation.id)).where(
+        Reservation.user_id == user_id,
+        Reservation.parking_timestamp.isnot(None),
+        Reservation.leaving_timestamp.is_(None)
+    )
+    if excluding is not None:
+        query = query.where(Reservation.id != excluding)
+    return query.scalar_subquery()
+
+
+def record_booking(user_id):
+    _apply(user_id, total_bookings=UserStats.total_bookings + 1)
+
+
+def record_parked(user_id, reservation_id, parked_at):
+    _apply(user_id, active_reservation_id=reservation_id, last_visit=parked_at)
+
+
+def record_vacated(user_id, reservation_id, cost, minutes):
+    # Another reservation may still be parked; it becomes the active one
+    _apply(
+        user_id,
+        total_spent=UserStats.total_spent + (cost or 0),
+        minutes_parked=UserStats.minutes_parked + minutes,
+        active_reservation_id=_latest_open_reservation(user_id, excluding=reservation_id)
+    )
+
+
+def record_gate_batch(user_id, spent, minutes, last_visit):
+    """Apply the net effect of a batch of park/vacate events on one user's stats.
+
+    Must run after the batch's reservation changes are flushed, since the active
+    reservation is looked up afresh.
+    """
+    values = {
+        "total_spent": UserStats.total_spent + spent,
+        "minutes_parked": UserStats.minutes_parked + minutes,
+        "active_reservation_id": _latest_open_reservation(user_id)
+    }
+    if last_visit is not None:
+        # Gate events may be replayed out of order; keep the latest visit
+        values["last_visit"] = case(
+            (or_(UserStats.last_visit.is_(None), UserStats.last_visit < last_visit), last_visit),
+            else_=UserStats.last_visit
+        )
+    _apply(user_id, **values)
+
+
+def rebuild_user_stats(user_id=None, batch_size=1000, models=RESERVATION_MODELS):
+    """Recompute the stats rows from reservations and return how many were written.
+
+    Counts and sums are aggregated in SQL, per table of ``models`` (the live and
+    archived reservations by default); parked minutes are accumulated from a
+    batched scan of the completed reservations, since date arithmetic differs
+    between databases.
+    """
+    stats = {}
+    for model in models:
+        scope = [model.user_id == user_id] if user_id is not None else []
+        totals = db.session.execute(
+            select(
+                model.user_id,
+                func.count(model.id),
+                func.coalesce(func.sum(model.parking_cost), 0),
+                func.max(model.parking_timestamp)
+            ).where(*scope).group_by(model.user_id)
+        )
+        for row_user_id, bookings, spent, last_visit in totals:
+            entry = stats.setdefault(row_user_id, {
+                "user_id": row_user_id, "total_bookings": 0, "total_spent": 0.0,
+                "minutes_parked": 0.0, "last_visit": None, "active_reservation_id": None
+            })
+            entry["total_bookings"] += bookings
+            entry["total_spent"] += spent
+            if last_visit is not None and (entry["last_visit"] is None or last_visit > entry["last_visit"]):
+                entry["last_visit"] = last_visit
+
+        completed = db.session.execute(
+            select(model.user_id, model.parking_timestamp, model.leaving_timestamp)
+            .where(*scope, model.parking_timestamp.isnot(None), model.leaving_timestamp.isnot(None))
+            .execution_options(yield_per=batch_size)
+        )
+        for row_user_id, parked_at, left_at in completed:
+            stats[row_user_id]["minutes_parked"] += (left_at - parked_at).total_seconds() / 60
+
+    scope = [Reservation.user_id == user_id] if user_id is not None else [] # Open reservations are never archived
+    open_reservations = db.session.execute(
+        select(Reservation.user_id, func.max(Reservation.id))
+        .where(*scope, Reservation.parking_timestamp.isnot(None), Reservation.leaving_timestamp.is_(None))
+        .group_by(Reservation.user_id)
+    )
+    for row_user_id, reservation_id in open_reservations:
+        stats[row_user_id]["active_reservation_id"] = reservation_id
+
+    stale = delete(UserStats)
+    if user_id is not None:
+        stale = stale.where(UserStats.user_id == user_id)
+    db.session.execute(stale)
+    rows = list(stats.values())
+    for start in range(0, len(rows), batch_size):
+        db.session.execute(insert(UserStats), rows[start:start + batch_size])
+    db.session.commit()
+    return len(rows)
@@ -0,0 +1,221 @@
+"""Single-writer group commit for reservation state transitions.
+
+With the queue enabled, transitions are handed to one writer thread that applies
+up to ``max_batch`` of them inside a single transaction, each in its own
+savepoint, and commits once. Callers wait on a future for their own result,
+without holding a pooled connection the writer may need. One that gives up
+waiting cancels its operation, which the writer then skips; an operation
+already being applied is waited for, so a caller never reports a failure for a
+transition that still commits.
+Disabled (the default), ``run`` applies the operation in the caller's session and
+commits it on its own, with the same hooks, so routes do not care which mode is
+active.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+
+from flask import current_app
+
+from src.extensions import db
+
+_STOP = object()
+
+
+class _Operation:
+    __slots__ = ("func", "args", "kwargs", "future", "result", "after_commit", "on_rollback")
+
+    def __init__(self, func, args, kwargs):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+        self.result = None
+        self.after_commit = []
+        self.on_rollback = []
+
+
+class GroupCommitQueue:
+    """In-process write queue drained by one writer thread in small transactions."""
+
+    def __init__(self):
+        self.app = None
+        self.enabled = False
+        self.max_batch = 64
+        self.max_wait = 0.002
+        self.timeout = 30.0
+        self.batches = 0
+        self.operations = 0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config.get("WRITE_QUEUE_ENABLED", False)
+        self.max_batch = app.config.get("WRITE_QUEUE_MAX_BATCH", 64)
+        self.max_wait = app.config.get("WRITE_QUEUE_MAX_WAIT_MS", 2) / 1000
+        self.timeout = app.config.get("WRITE_QUEUE_TIMEOUT", 30.0)
+        app.extensions["write_queue"] = self
+
+    def submit(self, func, *args, **kwargs):
+        """Queue ``func(*args, **kwargs)`` for the writer thread and return its future."""
+        operation = _Operation(func, args, kwargs)
+        self._ensure_writer()
+        self._queue.put(operation)
+        return operation.future
+
+    def run(self, func, *args, **kwargs):
+        """Apply a transition and return its result once it is committed."""
+        if not self.enabled:
+            return self._apply_inline(_Operation(func, args, kwargs))
+        # The caller's read transaction would keep a pool slot the writer may be waiting for
+        db.session.rollback()
+        future = self.submit(func, *args, **kwargs)
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            if future.cancel():
+                # Still queued: the writer skips cancelled operations, so nothing is applied
+                raise TimeoutError(f"Write queue did not apply the operation within {self.timeout} s")
+            # The writer has taken it and its outcome is decided by the batch commit
+            return future.result()
+
+    def after_commit(self, func, *args):
+        """Run ``func(*args)`` once the current operation is committed (deduplicated per batch)."""
+        self._local.operation.after_commit.append((func, args))
+
+    def on_rollback(self, func, *args):
+        """Run ``func(*args)`` if the current operation does not get committed."""
+        self._local.operation.on_rollback.append((func, args))
+
+    def stop(self):
+        """Let the writer finish what is queued and exit."""
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                self._queue.put(_STOP)
+                self._thread.join()
+            self._thread = None
+
+    def _ensure_writer(self):
+        # Started lazily, and again in a forked worker, where the parent's thread does not exist
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._writer, name="group-commit-writer", daemon=True)
+                self._thread.start()
+
+    def _writer(self):
+        with self.app.app_context():
+            while True:
+                first = self._queue.get()
+                if first is _STOP:
+                    return
+                batch = [first]
+                deadline = time.monotonic() + self.max_wait
+                stop = False
+                while len(batch) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    try:
+                        operation = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if operation is _STOP:
+                        stop = True
+                        break
+                    batch.append(operation)
+                self._apply(batch)
+                db.session.close()
+                if stop:
+                    return
+
+    def _begin(self):
+        # pysqlite only opens a transaction before DML, so a leading SAVEPOINT would
+        # become the outer transaction and commit on release; take the write lock up front
+        connection = db.session.connection()
+        if connection.dialect.name == "sqlite" and not connection.connection.dbapi_connection.in_transaction:
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+    def _apply_inline(self, operation):
+        self._local.operation = operation
+        try:
+            result = operation.func(*operation.args, **operation.kwargs)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            self._run_hooks(operation.on_rollback)
+            raise
+        finally:
+            self._local.operation = None
+        self._run_hooks(operation.after_commit)
+        return result
+
+    def _apply(self, batch):
+        # Claim each operation, dropping those whose caller gave up waiting
+        batch = [operation for operation in batch if operation.future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        applied = []
+        try:
+            self._begin()
+        except Exception as e:
+            db.session.rollback()
+            for operation in batch:
+                operation.future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.operations += len(batch)
+        for operation in batch:
+            self._local.operation = operation
+            try:
+                with db.session.begin_nested():
+                    operation.result = operation.func(*operation.args, **operation.kwargs)
+                applied.append(operation)
+            except Exception as e:
+                self._run_hooks(operation.on_rollback)
+                operation.future.set_exception(e)
+            finally:
+                self._local.operation = None
+
+        try:
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            for operation in applied:
+                self._run_hooks(operation.on_rollback)
+                operation.future.set_exception(e)
+            return
+
+        hooks = []
+        for operation in applied:
+            hooks.extend(hook for hook in operation.after_commit if hook not in hooks)
+        self._run_hooks(hooks)
+        for operation in applied:
+            operation.future.set_result(operation.result)
+
+    def _run_hooks(self, hooks):
+        for func, args in hooks:
+            try:
+                func(*args)
+            except Exception as e:
+                current_app.logger.error(f"Write queue hook {func.__name__} failed: {e}")
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "queued": self._queue.qsize(),
+            "batches": self.batches,
+            "operations": self.operations,
+            "average_batch": (self.operations / self.batches) if self.batches else 0
+        }
+
+
+write_queue = GroupCommitQueue()